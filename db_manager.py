@@ -1,10 +1,20 @@
 # db_manager.py
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Numeric, BigInteger, Index
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Numeric, BigInteger, Index, select, update, case, text, event
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.sql import func
+from decimal import Decimal, ROUND_HALF_UP
 import datetime
+import io
+import itertools
 import os
+import random
+import threading
+import time
 
 # Ranglar (agar settingsdbpro.py dan foydalanmasangiz)
 class Colors:
@@ -54,22 +64,86 @@ class UserBalance(Base):
         }
 
 
+class StatsQueuePool(QueuePool):
+    """
+    Statistika yig'uvchi QueuePool: har bir checkout uchun kutish vaqti,
+    overflow ulanishlar ochilishi, pool_timeout hodisalari va ulanish
+    (connect/autentifikatsiya) xatolari alohida hisoblanadi
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats_lock = threading.Lock()
+        self.stats = {'checkouts': 0, 'wait_total': 0.0, 'wait_max': 0.0, 'overflow_events': 0,
+                      'timeouts': 0, 'connect_errors': 0}
+    
+    def _do_get(self):
+        overflow = self.overflow()
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            with self.stats_lock:
+                self.stats['timeouts'] += 1
+            raise
+        except Exception:
+            with self.stats_lock:
+                self.stats['connect_errors'] += 1
+            raise
+        wait = time.perf_counter() - start
+        with self.stats_lock:
+            self.stats['checkouts'] += 1
+            self.stats['wait_total'] += wait
+            self.stats['wait_max'] = max(self.stats['wait_max'], wait)
+            if self.overflow() > max(overflow, 0):
+                self.stats['overflow_events'] += 1
+        return connection
+    
+    def recreate(self):
+        # dispose() yangi pool yaratadi - statistika saqlanib qoladi
+        pool = super().recreate()
+        pool.stats = self.stats
+        pool.stats_lock = self.stats_lock
+        return pool
+
+
 class DatabaseManager:
     """
     Umumiy database boshqaruvchi klass
     MySQL va PostgreSQL ni qo'llab-quvvatlaydi
     """
     
+    # Jarayon bo'yicha umumiy engine'lar: {(connection_string, pool sozlamalari): engine}
+    _engines = {}
+    _engines_lock = threading.Lock()
+    # get_statistics keshi: {connection_string: (monotonic vaqt, statistika)};
+    # avlod hisoblagichi har invalidatsiyada oshadi - so'rov paytida commit bo'lsa natija keshlanmaydi
+    _stats_cache = {}
+    _stats_generation = {}
+    _stats_lock = threading.Lock()
+    
     def __init__(self, db_type='mysql', host='localhost', port=None, 
-                 user='root', password='', database='test_db'):
+                 user='root', password='', database='test_db',
+                 pool_size=5, max_overflow=10, pool_recycle=1800, pool_pre_ping=True, pool_timeout=30,
+                 stats_ttl=0):
         """
         db_type: 'mysql' yoki 'postgresql'
+        pool_*: ulanish pooli sozlamalari (URL va sozlamalari bir xil managerlar bitta engine'ni ulashadi)
+        stats_ttl: get_statistics natijasini keshlash muddati (soniya, 0 - keshsiz)
         """
         self.db_type = db_type.lower()
         self.host = host
         self.user = user
         self.password = password
         self.database = database
+        self.stats_ttl = stats_ttl
+        self.pool_options = {
+            'pool_size': pool_size,
+            'max_overflow': max_overflow,
+            'pool_recycle': pool_recycle,
+            'pool_pre_ping': pool_pre_ping,
+            'pool_timeout': pool_timeout,
+        }
         
         # Default portlar
         if port is None:
@@ -89,19 +163,70 @@ class DatabaseManager:
         self.engine = None
         self.Session = None
     
+    @classmethod
+    def get_engine(cls, connection_string, **pool_options):
+        """URL va pool sozlamalari bo'yicha umumiy engine (yo'q bo'lsa yaratiladi)"""
+        key = (connection_string, tuple(sorted(pool_options.items())))
+        with cls._engines_lock:
+            engine = cls._engines.get(key)
+            if engine is None:
+                engine = create_engine(connection_string, echo=False, poolclass=StatsQueuePool, **pool_options)
+                cls._engines[key] = engine
+            return engine
+    
+    @classmethod
+    def dispose_engines(cls):
+        """Barcha umumiy engine'larni yopish (fork'dan keyin yoki jarayon tugaganda)"""
+        with cls._engines_lock:
+            for engine in cls._engines.values():
+                engine.dispose()
+            cls._engines.clear()
+    
     def connect(self):
-        """Database ga ulanish"""
+        """Database ga ulanish (umumiy engine va pool orqali)"""
         try:
-            self.engine = create_engine(self.connection_string, echo=False)
+            self.engine = self.get_engine(self.connection_string, **self.pool_options)
             self.Session = sessionmaker(bind=self.engine)
-            # Jadvallarni yaratish
-            Base.metadata.create_all(self.engine)
+            event.listen(self.Session, 'after_commit', self.invalidate_statistics)
+            with self.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
             print(f"{Colors.GREEN}✅ {self.db_type.upper()} ga muvaffaqiyatli ulandi{Colors.NC}")
             return True
         except Exception as e:
             print(f"{Colors.RED}❌ {self.db_type.upper()} ulanish xatosi: {e}{Colors.NC}")
             return False
     
+    def ensure_schema(self):
+        """Jadvallarni yaratish (mavjud bo'lsa o'zgarishsiz) - ilova ishga tushganda bir marta"""
+        if not self.engine:
+            return False
+        try:
+            Base.metadata.create_all(self.engine)
+            return True
+        except Exception as e:
+            print(f"{Colors.RED}❌ Jadvallarni yaratishda xatolik: {e}{Colors.NC}")
+            return False
+    
+    def pool_stats(self):
+        """Ulanish pooli holati va statistikasi"""
+        if not self.engine:
+            return {}
+        pool = self.engine.pool
+        stats = dict(getattr(pool, 'stats', {}))
+        checkouts = stats.pop('checkouts', 0)
+        wait_total = stats.pop('wait_total', 0.0)
+        wait_max = stats.pop('wait_max', 0.0)
+        return {
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'checkouts': checkouts,
+            'avg_wait_ms': wait_total / checkouts * 1000 if checkouts else 0.0,
+            'max_wait_ms': wait_max * 1000,
+            **stats,
+        }
+    
     def get_session(self):
         """Yangi session olish"""
         if self.Session:
@@ -165,28 +290,103 @@ class DatabaseManager:
         finally:
             session.close()
     
-    def update_balance(self, chat_id, amount, operation='add'):
+    BALANCE_OPERATIONS = ('add', 'subtract', 'set')
+    
+    @staticmethod
+    def to_money(amount):
+        """Miqdorni Numeric(10, 2) ustuniga mos Decimal ga aylantirish (float yaxlitlash xatosisiz)"""
+        return Decimal(str(amount)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    
+    def update_balance(self, chat_id, amount, operation='add', atomic=True):
         """
         Balansni yangilash
         operation: 'add' (qo'shish), 'subtract' (ayirish), 'set' (o'rnatish)
+        atomic=True: bitta server tomonidagi UPDATE (balans = balans + :amt), parallel
+        chaqiruvlarda yangilanish yo'qolmaydi; atomic=False: eski o'qish-yozish usuli
         """
+        if operation not in self.BALANCE_OPERATIONS:
+            raise ValueError(f"Noma'lum operatsiya: {operation!r} (add, subtract yoki set)")
+        if not atomic:
+            return self._update_balance_orm(chat_id, amount, operation)
+        
+        session = self.get_session()
+        if not session:
+            return None
+        
+        amount = self.to_money(amount)
+        table = UserBalance.__table__
+        stmt = update(table).where(table.c.chat_id == chat_id)
+        
+        if operation == 'set':
+            if amount < 0:
+                print(f"{Colors.YELLOW}⚠️ Balans manfiy bo'lishi mumkin emas{Colors.NC}")
+                session.close()
+                return None
+            stmt = stmt.values(balans=amount, updated_at=datetime.datetime.now())
+        else:
+            delta = amount if operation == 'add' else -amount
+            stmt = stmt.where(table.c.balans + delta >= 0).values(
+                balans=table.c.balans + delta, updated_at=datetime.datetime.now()
+            )
+        
+        try:
+            if self.db_type == 'postgresql':
+                # Bitta so'rov: yangilash va yangi qatorni qaytarish
+                row = session.execute(stmt.returning(*table.c)).first()
+            else:
+                # MySQL da UPDATE ... RETURNING yo'q: qator UPDATE qulfi ostida shu tranzaksiyada o'qiladi
+                result = session.execute(stmt)
+                row = None
+                if result.rowcount:
+                    row = session.execute(select(*table.c).where(table.c.chat_id == chat_id)).first()
+            
+            if row is None:
+                session.rollback()
+                exists = session.execute(select(table.c.id).where(table.c.chat_id == chat_id)).first()
+                if not exists:
+                    print(f"{Colors.YELLOW}⚠️ Foydalanuvchi topilmadi: {chat_id}{Colors.NC}")
+                else:
+                    print(f"{Colors.YELLOW}⚠️ Balans manfiy bo'lishi mumkin emas{Colors.NC}")
+                return None
+            session.commit()
+            
+            if operation == 'add':
+                print(f"{Colors.GREEN}✅ {amount:.2f} qo'shildi{Colors.NC}")
+            elif operation == 'subtract':
+                print(f"{Colors.GREEN}✅ {amount:.2f} ayirildi{Colors.NC}")
+            else:
+                print(f"{Colors.GREEN}✅ Balans o'rnatildi{Colors.NC}")
+            print(f"{Colors.CYAN}   Yangi balans: {row.balans:.2f}{Colors.NC}")
+            return UserBalance(**row._mapping)
+        except Exception as e:
+            session.rollback()
+            print(f"{Colors.RED}❌ Balans yangilashda xatolik: {e}{Colors.NC}")
+            return None
+        finally:
+            session.close()
+    
+    def _update_balance_orm(self, chat_id, amount, operation='add'):
+        """Balansni ORM orqali yangilash (o'qish -> hisoblash -> yozish)"""
+        if operation not in self.BALANCE_OPERATIONS:
+            raise ValueError(f"Noma'lum operatsiya: {operation!r} (add, subtract yoki set)")
         session = self.get_session()
         if not session:
             return None
         
+        amount = self.to_money(amount)
         try:
             user = session.query(UserBalance).filter_by(chat_id=chat_id).first()
             if not user:
                 print(f"{Colors.YELLOW}⚠️ Foydalanuvchi topilmadi: {chat_id}{Colors.NC}")
                 return None
             
-            old_balance = float(user.balans)
+            old_balance = user.balans
             
             if operation == 'add':
-                user.balans = float(user.balans) + amount
+                user.balans = user.balans + amount
                 print(f"{Colors.GREEN}✅ {amount:.2f} qo'shildi{Colors.NC}")
             elif operation == 'subtract':
-                new_balance = float(user.balans) - amount
+                new_balance = user.balans - amount
                 if new_balance < 0:
                     print(f"{Colors.YELLOW}⚠️ Balans manfiy bo'lishi mumkin emas{Colors.NC}")
                     return None
@@ -202,7 +402,7 @@ class DatabaseManager:
             user.updated_at = datetime.datetime.now()
             session.commit()
             
-            print(f"{Colors.CYAN}   Eski balans: {old_balance:.2f} -> Yangi balans: {float(user.balans):.2f}{Colors.NC}")
+            print(f"{Colors.CYAN}   Eski balans: {old_balance:.2f} -> Yangi balans: {user.balans:.2f}{Colors.NC}")
             return user
         except Exception as e:
             session.rollback()
@@ -251,32 +451,61 @@ class DatabaseManager:
     
     # ==================== QO'SHIMCHA FUNKSIYALAR ====================
     
-    def get_statistics(self):
-        """Statistika olish"""
+    def get_statistics(self, max_age=None):
+        """
+        Statistika olish (bitta agregat so'rov).
+        max_age: keshdagi natija necha soniyagacha eskirgan bo'lishi mumkin
+        (None - stats_ttl, 0 - har doim yangidan). Shu manager orqali bajarilgan
+        har qanday commit keshni bekor qiladi; boshqa jarayonlardagi o'zgarishlar
+        esa ko'pi bilan max_age soniya kechikib ko'rinadi. Natijadagi 'age_seconds'
+        qiymatning haqiqiy eskirganligini bildiradi.
+        """
+        if max_age is None:
+            max_age = self.stats_ttl
+        cached = self._stats_cache.get(self.connection_string)
+        if cached and max_age > 0:
+            cached_at, stats = cached
+            age = time.monotonic() - cached_at
+            if age <= max_age:
+                return {**stats, 'cached': True, 'age_seconds': age}
+        
         session = self.get_session()
         if not session:
             return {}
         
+        generation = self._stats_generation.get(self.connection_string, 0)
         try:
-            total_users = session.query(UserBalance).count()
-            total_balance = session.query(func.sum(UserBalance.balans)).scalar() or 0
-            max_balance = session.query(func.max(UserBalance.balans)).scalar() or 0
-            min_balance = session.query(func.min(UserBalance.balans)).scalar() or 0
-            avg_balance = session.query(func.avg(UserBalance.balans)).scalar() or 0
+            row = session.execute(select(
+                func.count(UserBalance.id).label('total_users'),
+                func.sum(UserBalance.balans).label('total_balance'),
+                func.max(UserBalance.balans).label('max_balance'),
+                func.min(UserBalance.balans).label('min_balance'),
+                func.avg(UserBalance.balans).label('avg_balance'),
+            )).one()
             
-            return {
-                'total_users': total_users,
-                'total_balance': float(total_balance),
-                'max_balance': float(max_balance),
-                'min_balance': float(min_balance),
-                'avg_balance': float(avg_balance)
+            stats = {
+                'total_users': row.total_users,
+                'total_balance': float(row.total_balance or 0),
+                'max_balance': float(row.max_balance or 0),
+                'min_balance': float(row.min_balance or 0),
+                'avg_balance': float(row.avg_balance or 0)
             }
+            with self._stats_lock:
+                if self._stats_generation.get(self.connection_string, 0) == generation:
+                    self._stats_cache[self.connection_string] = (time.monotonic(), stats)
+            return {**stats, 'cached': False, 'age_seconds': 0.0}
         except Exception as e:
             print(f"{Colors.RED}❌ Statistika olishda xatolik: {e}{Colors.NC}")
             return {}
         finally:
             session.close()
     
+    def invalidate_statistics(self, session=None):
+        """Statistika keshini bekor qilish (har bir commit'dan keyin avtomatik chaqiriladi)"""
+        with self._stats_lock:
+            self._stats_generation[self.connection_string] = self._stats_generation.get(self.connection_string, 0) + 1
+            self._stats_cache.pop(self.connection_string, None)
+    
     def get_top_users(self, limit=10):
         """Eng katta balansga ega foydalanuvchilar"""
         session = self.get_session()
@@ -333,55 +562,307 @@ class DatabaseManager:
         user = self.get_user(chat_id)
         return user is not None
     
+    def _insert(self):
+        """Dvigatelga mos INSERT konstruktori (ON CONFLICT / ON DUPLICATE KEY UPDATE uchun)"""
+        if self.db_type == 'postgresql':
+            return pg_insert(UserBalance.__table__)
+        return mysql_insert(UserBalance.__table__)
+    
+    def _upsert_statement(self, update_balance):
+        """
+        Upsert INSERT (qatorlar executemany bilan beriladi - drayver ularni ko'p
+        qatorli VALUES ga birlashtiradi): update_balance=True bo'lsa mavjud balans
+        yangilanadi, aks holda mavjud foydalanuvchilar o'zgarishsiz qoladi
+        """
+        stmt = self._insert()
+        if self.db_type == 'postgresql':
+            if update_balance:
+                return stmt.on_conflict_do_update(
+                    index_elements=['chat_id'],
+                    set_={'balans': stmt.excluded.balans, 'updated_at': stmt.excluded.updated_at}
+                )
+            return stmt.on_conflict_do_nothing(index_elements=['chat_id'])
+        if update_balance:
+            return stmt.on_duplicate_key_update(balans=stmt.inserted.balans, updated_at=stmt.inserted.updated_at)
+        return stmt.on_duplicate_key_update(id=UserBalance.__table__.c.id)
+    
     def create_or_update(self, chat_id, initial_balance=0.00):
-        """Foydalanuvchi yaratish yoki mavjud bo'lsa olish"""
-        user = self.get_user(chat_id)
-        if user:
-            return user
-        return self.create_user(chat_id, initial_balance)
+        """Foydalanuvchi yaratish yoki mavjud bo'lsa olish (PostgreSQL da yangi foydalanuvchi uchun bitta so'rov)"""
+        session = self.get_session()
+        if not session:
+            return None
+        
+        table = UserBalance.__table__
+        now = datetime.datetime.now()
+        stmt = self._insert().values(chat_id=chat_id, balans=self.to_money(initial_balance),
+                                     created_at=now, updated_at=now)
+        try:
+            if self.db_type == 'postgresql':
+                # DO NOTHING mavjud qatorga yangi versiya yozmaydi; u holda RETURNING bo'sh - qator SELECT qilinadi
+                row = session.execute(
+                    stmt.on_conflict_do_nothing(index_elements=['chat_id']).returning(*table.c)
+                ).first()
+            else:
+                session.execute(stmt.on_duplicate_key_update(id=table.c.id))
+                row = None
+            if row is None:
+                row = session.execute(select(*table.c).where(table.c.chat_id == chat_id)).first()
+            session.commit()
+            return UserBalance(**row._mapping)
+        except Exception as e:
+            session.rollback()
+            print(f"{Colors.RED}❌ Foydalanuvchi yaratishda xatolik: {e}{Colors.NC}")
+            return None
+        finally:
+            session.close()
     
-    def transfer_money(self, from_chat_id, to_chat_id, amount):
-        """Pul o'tkazish"""
+    # Deadlock / serialization xatolari: PostgreSQL SQLSTATE va MySQL xato kodlari
+    RETRYABLE_ERRORS = {'40001', '40P01', 1213, 1205}
+    
+    def _is_retryable(self, error):
+        """Xato tranzaksiyani qayta urinish bilan hal bo'ladimi"""
+        orig = getattr(error, 'orig', None)
+        if orig is None:
+            return False
+        code = getattr(orig, 'pgcode', None) or getattr(orig, 'sqlstate', None)
+        if code is None and orig.args:
+            code = orig.args[0]
+        return code in self.RETRYABLE_ERRORS
+    
+    def _run_transaction(self, work, retries=3, backoff=0.05):
+        """
+        work(session) ni bitta tranzaksiyada bajarish. Deadlock yoki serialization
+        xatosida tranzaksiya eksponensial kutish (jitter bilan) bilan qayta boshlanadi.
+        """
+        for attempt in range(retries + 1):
+            session = self.get_session()
+            try:
+                result = work(session)
+                session.commit()
+                return result
+            except DBAPIError as e:
+                session.rollback()
+                if attempt == retries or not self._is_retryable(e):
+                    raise
+                time.sleep(backoff * 2 ** attempt * (1 + random.random()))
+            finally:
+                session.close()
+    
+    @staticmethod
+    def _lock_balances(session, chat_ids):
+        """Qatorlarni chat_id tartibida qulflash (deadlock bo'lmasligi uchun) va balanslarni olish"""
+        table = UserBalance.__table__
+        rows = session.execute(
+            select(table.c.chat_id, table.c.balans)
+            .where(table.c.chat_id.in_(sorted(set(chat_ids))))
+            .order_by(table.c.chat_id)
+            .with_for_update()
+        )
+        return {row.chat_id: row.balans for row in rows}
+    
+    @staticmethod
+    def _apply_deltas(session, deltas):
+        """Balans o'zgarishlarini bitta UPDATE ... CASE so'rovi bilan yozish"""
+        deltas = {chat_id: delta for chat_id, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        table = UserBalance.__table__
+        session.execute(
+            update(table)
+            .where(table.c.chat_id.in_(list(deltas)))
+            .values(balans=table.c.balans + case(deltas, value=table.c.chat_id),
+                    updated_at=datetime.datetime.now())
+        )
+    
+    @staticmethod
+    def _plan_transfer(balances, deltas, from_chat_id, to_chat_id, amount):
+        """Bitta o'tkazmani qulflangan balanslarga qo'llash; holat kodi qaytariladi"""
+        if amount <= 0:
+            return 'invalid_amount'
+        if from_chat_id == to_chat_id:
+            return 'same_account'
+        if from_chat_id not in balances or to_chat_id not in balances:
+            return 'not_found'
+        if balances[from_chat_id] < amount:
+            return 'insufficient_funds'
+        balances[from_chat_id] -= amount
+        balances[to_chat_id] += amount
+        deltas[from_chat_id] = deltas.get(from_chat_id, 0) - amount
+        deltas[to_chat_id] = deltas.get(to_chat_id, 0) + amount
+        return 'ok'
+    
+    def transfer_money(self, from_chat_id, to_chat_id, amount, retries=3):
+        """Pul o'tkazish (qatorlar chat_id tartibida FOR UPDATE bilan qulflanadi)"""
+        amount = self.to_money(amount)
         if amount <= 0:
             print(f"{Colors.YELLOW}⚠️ Miqdor musbat bo'lishi kerak{Colors.NC}")
             return False
         
-        session = self.get_session()
-        if not session:
+        if not self.Session:
             return False
         
+        def work(session):
+            balances = self._lock_balances(session, [from_chat_id, to_chat_id])
+            deltas = {}
+            status = self._plan_transfer(balances, deltas, from_chat_id, to_chat_id, amount)
+            self._apply_deltas(session, deltas)
+            return status, balances
+        
         try:
-            from_user = session.query(UserBalance).filter_by(chat_id=from_chat_id).first()
-            to_user = session.query(UserBalance).filter_by(chat_id=to_chat_id).first()
-            
-            if not from_user:
-                print(f"{Colors.YELLOW}⚠️ Jo'natuvchi topilmadi: {from_chat_id}{Colors.NC}")
-                return False
-            
-            if not to_user:
-                print(f"{Colors.YELLOW}⚠️ Qabul qiluvchi topilmadi: {to_chat_id}{Colors.NC}")
-                return False
-            
-            if float(from_user.balans) < amount:
-                print(f"{Colors.YELLOW}⚠️ Jo'natuvchida yetarli mablag' yo'q{Colors.NC}")
-                return False
+            status, balances = self._run_transaction(work, retries)
+        except Exception as e:
+            print(f"{Colors.RED}❌ Pul o'tkazishda xatolik: {e}{Colors.NC}")
+            return False
+        
+        if status == 'same_account':
+            print(f"{Colors.YELLOW}⚠️ Jo'natuvchi va qabul qiluvchi bir xil{Colors.NC}")
+            return False
+        if status == 'not_found':
+            missing = from_chat_id if from_chat_id not in balances else to_chat_id
+            role = "Jo'natuvchi" if missing == from_chat_id else "Qabul qiluvchi"
+            print(f"{Colors.YELLOW}⚠️ {role} topilmadi: {missing}{Colors.NC}")
+            return False
+        if status == 'insufficient_funds':
+            print(f"{Colors.YELLOW}⚠️ Jo'natuvchida yetarli mablag' yo'q{Colors.NC}")
+            return False
+        
+        print(f"{Colors.GREEN}✅ {amount:.2f} pul o'tkazildi: {from_chat_id} -> {to_chat_id}{Colors.NC}")
+        print(f"   {from_chat_id} yangi balans: {balances[from_chat_id]:.2f}")
+        print(f"   {to_chat_id} yangi balans: {balances[to_chat_id]:.2f}")
+        return True
+    
+    def transfer_many(self, transfers, batch_size=1000, retries=3):
+        """
+        Ko'p o'tkazmalarni paketlab bajarish: har bir paket bitta tranzaksiyada -
+        barcha qatorlar bitta SELECT ... FOR UPDATE bilan qulflanadi, o'tkazmalar
+        tartib bo'yicha tekshiriladi va natija bitta UPDATE bilan yoziladi.
+        transfers: (from_chat_id, to_chat_id, amount) juftliklari iterable'i (generator ham
+        bo'lishi mumkin - paketlar bo'yicha oqim sifatida o'qiladi).
+        Har bir o'tkazma uchun {'from', 'to', 'amount', 'status'} qaytariladi
+        (status: ok | invalid_amount | same_account | not_found | insufficient_funds | error).
+        """
+        if not self.Session:
+            return []
+        
+        results = []
+        transfers = iter(transfers)
+        while True:
+            batch = [(from_chat_id, to_chat_id, self.to_money(amount))
+                     for from_chat_id, to_chat_id, amount in itertools.islice(transfers, batch_size)]
+            if not batch:
+                break
             
-            from_user.balans = float(from_user.balans) - amount
-            to_user.balans = float(to_user.balans) + amount
+            def work(session, batch=batch):
+                balances = self._lock_balances(session, [chat_id for item in batch for chat_id in item[:2]])
+                deltas = {}
+                statuses = [self._plan_transfer(balances, deltas, *item) for item in batch]
+                self._apply_deltas(session, deltas)
+                return statuses
             
-            from_user.updated_at = datetime.datetime.now()
-            to_user.updated_at = datetime.datetime.now()
+            try:
+                statuses = self._run_transaction(work, retries)
+            except Exception as e:
+                print(f"{Colors.RED}❌ Paket o'tkazishda xatolik: {e}{Colors.NC}")
+                statuses = ['error'] * len(batch)
             
+            results += [{'from': from_chat_id, 'to': to_chat_id, 'amount': amount, 'status': status}
+                        for (from_chat_id, to_chat_id, amount), status in zip(batch, statuses)]
+        
+        done = sum(1 for item in results if item['status'] == 'ok')
+        print(f"{Colors.GREEN}✅ {done}/{len(results)} ta o'tkazma bajarildi{Colors.NC}")
+        return results
+    
+    # ==================== OMMAVIY OPERATSIYALAR ====================
+    
+    def _copy_upsert(self, session, rows, update_balance):
+        """
+        PostgreSQL: paketni COPY bilan vaqtinchalik jadvalga yuklash va bitta
+        INSERT ... SELECT ... ON CONFLICT bilan asosiy jadvalga o'tkazish
+        """
+        session.execute(text(
+            "CREATE TEMP TABLE IF NOT EXISTS tmp_user_balances "
+            "(chat_id BIGINT, balans NUMERIC(10, 2)) ON COMMIT DELETE ROWS"
+        ))
+        data = io.StringIO("".join(f"{row['chat_id']}\t{row['balans']}\n" for row in rows))
+        cursor = session.connection().connection.cursor()
+        try:
+            copy_sql = "COPY tmp_user_balances (chat_id, balans) FROM STDIN"
+            if hasattr(cursor, 'copy_expert'):
+                cursor.copy_expert(copy_sql, data)
+            else:
+                with cursor.copy(copy_sql) as copy:
+                    copy.write(data.getvalue())
+        finally:
+            cursor.close()
+        
+        conflict = ("DO UPDATE SET balans = EXCLUDED.balans, updated_at = EXCLUDED.updated_at"
+                    if update_balance else "DO NOTHING")
+        now = rows[0]['updated_at']
+        session.execute(text(
+            "INSERT INTO user_balances (chat_id, balans, created_at, updated_at) "
+            f"SELECT chat_id, balans, :now, :now FROM tmp_user_balances ON CONFLICT (chat_id) {conflict}"
+        ), {'now': now})
+        session.execute(text("TRUNCATE tmp_user_balances"))
+    
+    def _bulk_write(self, items, update_balance, batch_size, commit_interval, use_copy):
+        """Iterable ni paketlab yozish; {'rows', 'seconds', 'rows_per_sec'} qaytariladi"""
+        session = self.get_session()
+        if not session:
+            return None
+        if use_copy is None:
+            use_copy = self.db_type == 'postgresql'
+        
+        items = iter(items)
+        statement = self._upsert_statement(update_balance)
+        total = 0
+        pending = 0
+        start = time.perf_counter()
+        try:
+            while True:
+                batch = list(itertools.islice(items, batch_size))
+                if not batch:
+                    break
+                now = datetime.datetime.now()
+                # Paket ichidagi takroriy chat_id lar: oxirgisi qoladi (ON CONFLICT bitta qatorni ikki marta yangilay olmaydi)
+                rows = list({chat_id: {'chat_id': chat_id, 'balans': self.to_money(balance),
+                                       'created_at': now, 'updated_at': now}
+                             for chat_id, balance in batch}.values())
+                if use_copy:
+                    self._copy_upsert(session, rows, update_balance)
+                else:
+                    session.execute(statement, rows)
+                total += len(rows)
+                pending += len(rows)
+                if pending >= commit_interval:
+                    session.commit()
+                    pending = 0
             session.commit()
-            
-            print(f"{Colors.GREEN}✅ {amount:.2f} pul o'tkazildi: {from_chat_id} -> {to_chat_id}{Colors.NC}")
-            print(f"   {from_chat_id} yangi balans: {float(from_user.balans):.2f}")
-            print(f"   {to_chat_id} yangi balans: {float(to_user.balans):.2f}")
-            
-            return True
         except Exception as e:
             session.rollback()
-            print(f"{Colors.RED}❌ Pul o'tkazishda xatolik: {e}{Colors.NC}")
-            return False
+            print(f"{Colors.RED}❌ Ommaviy yozishda xatolik ({total} ta qatordan keyin): {e}{Colors.NC}")
+            return None
         finally:
             session.close()
+        
+        seconds = time.perf_counter() - start
+        rate = total / seconds if seconds > 0 else 0.0
+        print(f"{Colors.GREEN}✅ {total} ta qator yozildi: {seconds:.2f} s, {rate:,.0f} qator/s{Colors.NC}")
+        return {'rows': total, 'seconds': seconds, 'rows_per_sec': rate}
+    
+    def bulk_create_users(self, chat_ids, initial_balance=0.00, batch_size=5000,
+                          commit_interval=50000, use_copy=None):
+        """
+        Ko'p foydalanuvchini yaratish (mavjudlari o'zgarishsiz qoladi).
+        chat_ids: chat_id lar yoki (chat_id, balans) juftliklari iterable'i (oqim sifatida o'qiladi).
+        PostgreSQL da COPY ishlatiladi (use_copy=False - ko'p qatorli INSERT).
+        """
+        items = (item if isinstance(item, (tuple, list)) else (item, initial_balance) for item in chat_ids)
+        return self._bulk_write(items, False, batch_size, commit_interval, use_copy)
+    
+    def bulk_upsert_balances(self, balances, batch_size=5000, commit_interval=50000, use_copy=None):
+        """
+        Balanslarni ommaviy o'rnatish: yo'q foydalanuvchilar yaratiladi, mavjudlarining balansi yangilanadi.
+        balances: {chat_id: balans} yoki (chat_id, balans) juftliklari iterable'i.
+        """
+        items = balances.items() if isinstance(balances, dict) else balances
+        return self._bulk_write(items, True, batch_size, commit_interval, use_copy)
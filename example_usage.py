@@ -11,6 +11,7 @@ mysql_db = DatabaseManager(
 )
 
 if mysql_db.connect():
+    mysql_db.ensure_schema()
     # Foydalanuvchi yaratish
     user = mysql_db.create_user(chat_id=123456789, initial_balance=100.50)
     
@@ -46,6 +47,7 @@ pg_db = DatabaseManager(
 )
 
 if pg_db.connect():
+    pg_db.ensure_schema()
     # Bir nechta foydalanuvchi yaratish
     pg_db.create_user(111111, 1000)
     pg_db.create_user(222222, 2000)
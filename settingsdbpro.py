@@ -12,97 +12,117 @@ import hashlib
 import base64
 import re
 import socket
+import math
+import signal
 import glob
 import tarfile
 import zipfile
+import gzip
+import io
+import zlib
+import struct
+import sqlite3
+import contextlib
+import queue
+import uuid
+import atexit
+import importlib
+import importlib.util
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from typing import Dict, List, Tuple, Optional, Any
 
 # ============================================================================
 # KUTUBXONALARNI IMPORT QILISH (MAVJUD BO'LSA)
 # ============================================================================
 
-try:
-    import psutil
-    PSUTIL_AVAILABLE = True
-except ImportError:
-    PSUTIL_AVAILABLE = False
-
-try:
-    import requests
-    REQUESTS_AVAILABLE = True
-except ImportError:
-    REQUESTS_AVAILABLE = False
-
-try:
-    import schedule
-    SCHEDULE_AVAILABLE = True
-except ImportError:
-    SCHEDULE_AVAILABLE = False
-
-try:
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet
-    REPORTLAB_AVAILABLE = True
-except ImportError:
-    REPORTLAB_AVAILABLE = False
-
-try:
-    import docker
-    DOCKER_AVAILABLE = True
-except ImportError:
-    DOCKER_AVAILABLE = False
+class OptionalDeps:
+    """
+    Ixtiyoriy kutubxonalar reestri.
+    Mavjudlik importlib.util.find_spec orqali arzon tekshiriladi, haqiqiy
+    import esa birinchi ishlatilganda (load) bajariladi va vaqti yoziladi.
+    """
+    # --startup-profile uchun kuzatiladigan modullar
+    MODULES = [
+        "psutil", "requests", "schedule", "reportlab", "docker", "boto3",
+        "kubernetes", "flask", "numpy", "matplotlib.pyplot",
+        "sklearn.linear_model", "cryptography.fernet", "jwt",
+        "zstandard", "lz4.frame"
+    ]
+    check_times = {}
+    import_times = {}
 
-try:
-    import boto3
-    BOTO3_AVAILABLE = True
-except ImportError:
-    BOTO3_AVAILABLE = False
+    @staticmethod
+    def available(*names):
+        """Barcha modullar o'rnatilganmi (import qilmasdan)"""
+        result = True
+        for name in names:
+            start = time.perf_counter()
+            try:
+                found = importlib.util.find_spec(name) is not None
+            except (ImportError, ValueError):
+                found = False
+            OptionalDeps.check_times[name] = time.perf_counter() - start
+            result = result and found
+        return result
 
-try:
-    from kubernetes import client, config
-    K8S_AVAILABLE = True
-except ImportError:
-    K8S_AVAILABLE = False
+    @staticmethod
+    def load(name):
+        """Modulni import qilish (birinchi chaqiruvda) va vaqtini yozish"""
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        OptionalDeps.import_times[name] = time.perf_counter() - start
+        return module
 
-try:
-    from flask import Flask, render_template, request, jsonify
-    FLASK_AVAILABLE = True
-except ImportError:
-    FLASK_AVAILABLE = False
+    @staticmethod
+    def profile_startup():
+        """Modul yuklanishi va har bir kutubxona import narxini chiqarish"""
+        print(f"{Colors.CYAN}{Colors.BOLD}=== STARTUP PROFILE ==={Colors.NC}\n")
+        print(f"settingsdbpro yuklanishi: {(_STARTUP_DONE - _STARTUP_T0) * 1000:.1f} ms")
+        
+        print(f"\n{Colors.GREEN}Mavjudlik tekshiruvi (find_spec):{Colors.NC}")
+        for name, seconds in OptionalDeps.check_times.items():
+            print(f"  {name:<24} {seconds * 1000:8.2f} ms")
+        
+        print(f"\n{Colors.GREEN}Import narxi (birinchi ishlatilganda):{Colors.NC}")
+        total = 0.0
+        for name in OptionalDeps.MODULES:
+            already_loaded = name in OptionalDeps.import_times
+            try:
+                OptionalDeps.load(name)
+            except Exception:
+                print(f"  {name:<24} o'rnatilmagan")
+                continue
+            seconds = OptionalDeps.import_times.get(name, 0.0)
+            total += seconds
+            note = " (startupda)" if already_loaded else ""
+            print(f"  {name:<24} {seconds * 1000:8.1f} ms{note}")
+        print(f"\nJami (agar hammasi eager import qilinsa): {total * 1000:.1f} ms")
 
-try:
-    import matplotlib
-    import matplotlib.pyplot as plt
-    import numpy as np
-    MATPLOTLIB_AVAILABLE = True
-except ImportError:
-    MATPLOTLIB_AVAILABLE = False
 
-try:
-    from sklearn.linear_model import LinearRegression
-    from sklearn import preprocessing
-    SKLEARN_AVAILABLE = True
-except ImportError:
-    SKLEARN_AVAILABLE = False
+_STARTUP_T0 = time.perf_counter()
 
 try:
-    from cryptography.fernet import Fernet
-    from cryptography.hazmat.primitives import hashes, serialization
-    from cryptography.hazmat.primitives.asymmetric import rsa
-    from cryptography import x509
-    from cryptography.x509.oid import NameOID
-    CRYPTOGRAPHY_AVAILABLE = True
+    psutil = OptionalDeps.load("psutil")
+    PSUTIL_AVAILABLE = True
 except ImportError:
-    CRYPTOGRAPHY_AVAILABLE = False
+    PSUTIL_AVAILABLE = False
 
-try:
-    import jwt
-    JWT_AVAILABLE = True
-except ImportError:
-    JWT_AVAILABLE = False
+REQUESTS_AVAILABLE = OptionalDeps.available("requests")
+SCHEDULE_AVAILABLE = OptionalDeps.available("schedule")
+REPORTLAB_AVAILABLE = OptionalDeps.available("reportlab")
+DOCKER_AVAILABLE = OptionalDeps.available("docker")
+BOTO3_AVAILABLE = OptionalDeps.available("boto3")
+K8S_AVAILABLE = OptionalDeps.available("kubernetes")
+FLASK_AVAILABLE = OptionalDeps.available("flask")
+MATPLOTLIB_AVAILABLE = OptionalDeps.available("matplotlib", "numpy")
+NUMPY_AVAILABLE = OptionalDeps.available("numpy")
+SKLEARN_AVAILABLE = OptionalDeps.available("sklearn")
+CRYPTOGRAPHY_AVAILABLE = OptionalDeps.available("cryptography")
+JWT_AVAILABLE = OptionalDeps.available("jwt")
 
 # Ranglar va formatlash
 class Colors:
@@ -137,15 +157,16 @@ ERROR_LOG = LOG_DIR / "error.log"
 DEBUG_LOG = LOG_DIR / "debug.log"
 ALERT_LOG = LOG_DIR / "alerts.log"
 PERFORMANCE_LOG = LOG_DIR / "performance.log"
+METRICS_DIR = LOG_DIR / "metrics"
 CONFIG_FILE = CONFIG_DIR / "settings.json"
 
 # Papkalarni yaratish
 for directory in [CONFIG_DIR, BACKUP_DIR, LOG_DIR, SSL_DIR, TEMP_DIR, CACHE_DIR, 
                   DATA_DIR, ARCHIVE_DIR, REPORTS_DIR, ALERTS_DIR, MIGRATIONS_DIR, 
-                  PLUGINS_DIR, DASHBOARDS_DIR]:
+                  PLUGINS_DIR, DASHBOARDS_DIR, METRICS_DIR]:
     directory.mkdir(parents=True, exist_ok=True)
 
-for file in [CONNECTION_FILE, HISTORY_FILE, ERROR_LOG, DEBUG_LOG, ALERT_LOG, PERFORMANCE_LOG]:
+for file in [CONNECTION_FILE, HISTORY_FILE, ERROR_LOG, DEBUG_LOG, ALERT_LOG]:
     file.touch(exist_ok=True)
 
 # Konfiguratsiya faylini yaratish
@@ -175,10 +196,16 @@ if not CONFIG_FILE.exists():
             "postgresql_schedule": "03:00",
             "retention_days": 7,
             "compression": "gz",
+            "compression_level": None,
+            "compression_threads": 0,
             "encryption": False,
+            "encryption_workers": 0,
             "cloud_provider": "none",
             "cloud_bucket": "",
-            "incremental": False
+            "incremental": False,
+            "dedup": False,
+            "parallel_workers": 4,
+            "bandwidth_limit_mb": 0
         },
         "monitoring": {
             "interval": 60,
@@ -187,7 +214,10 @@ if not CONFIG_FILE.exists():
             "disk_threshold": 90,
             "connection_threshold": 100,
             "enable_realtime": True,
-            "enable_predictive": False
+            "enable_predictive": False,
+            "retention_days": 30,
+            "collector_intervals": {"os": 5, "mysql": 15, "postgresql": 15, "sizes": 3600},
+            "anomaly": {"alpha": 0.05, "threshold": 4.0, "warmup": 30}
         },
         "security": {
             "password_policy": True,
@@ -212,6 +242,20 @@ if not CONFIG_FILE.exists():
     with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
         json.dump(default_config, f, indent=4)
 
+class Config:
+    """settings.json dan sozlamalarni o'qish (bir marta yuklanadi)"""
+    _data = None
+
+    @staticmethod
+    def get(section, key, default=None):
+        if Config._data is None:
+            try:
+                with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+                    Config._data = json.load(f)
+            except (OSError, ValueError):
+                Config._data = {}
+        return Config._data.get(section, {}).get(key, default)
+
 # ============================================================================
 # LOGGING FUNKSIYALARI
 # ============================================================================
@@ -258,6 +302,13 @@ class Logger:
         timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         with open(DEBUG_LOG, 'a', encoding='utf-8') as f:
             f.write(f"[{timestamp}] {message}\n")
+    
+    @staticmethod
+    def alert(message):
+        Logger.log("WARNING", message)
+        timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        with open(ALERT_LOG, 'a', encoding='utf-8') as f:
+            f.write(f"[{timestamp}] {message}\n")
 
 # ============================================================================
 # UI FUNKSIYALARI
@@ -325,6 +376,20 @@ class UI:
             lines.append(line)
         return '\n'.join(lines)
 
+    @staticmethod
+    def show_table(rows, empty_message="Ma'lumot yo'q"):
+        """So'rov natijasini (dict qatorlar) jadval ko'rinishida chiqarish"""
+        if not rows:
+            print(empty_message)
+            return
+        headers = list(rows[0].keys())
+        cells = [['NULL' if row.get(h) is None else str(row.get(h)) for h in headers] for row in rows]
+        widths = [max(len(str(h)), *(len(line[i]) for line in cells)) for i, h in enumerate(headers)]
+        print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths)))
+        print("  ".join("-" * w for w in widths))
+        for line in cells:
+            print("  ".join(value.ljust(w) for value, w in zip(line, widths)))
+
 # ============================================================================
 # DATABASE FUNKSIYALARI
 # ============================================================================
@@ -351,21 +416,2221 @@ class DatabaseManager:
         else:
             cmd = f"sudo -u postgres psql -d {dbname} -f {filepath} 2>/dev/null"
         return DatabaseManager.run_command(cmd)
+
+    @staticmethod
+    def query(db_type, sql, dbname=None, timeout=60):
+        """SQL so'rovni doimiy sessiya orqali bajarish: (qatorlar, stderr, kod)"""
+        return DBSession.get(db_type, dbname).query(sql, timeout=timeout)
+
+    @staticmethod
+    def scalar(db_type, sql, dbname=None, column=None):
+        """Birinchi qatordagi qiymatni olish (column berilmasa - oxirgi ustun)"""
+        rows, _, code = DatabaseManager.query(db_type, sql, dbname)
+        if code != 0 or not rows:
+            return None
+        row = rows[0]
+        if column is not None:
+            return row.get(column)
+        return list(row.values())[-1]
+
+    @staticmethod
+    def get_hostname():
+        return socket.gethostname()
     
     @staticmethod
-    def get_hostname():
-        return socket.gethostname()
-    
+    def get_ip_address():
+        try:
+            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            s.connect(("8.8.8.8", 80))
+            ip = s.getsockname()[0]
+            s.close()
+            return ip
+        except:
+            return "127.0.0.1"
+
+class DBSession:
+    """
+    Har bir engine (va DB) uchun bitta doimiy ulanish.
+    Har so'rovga yangi `sudo mysql`/`psql` ochish o'rniga uzoq yashovchi
+    client coprocess ishlatiladi; natija dict qatorlar ko'rinishida qaytadi.
+    """
+    _sessions = {}
+    _registry_lock = threading.Lock()
+    QUEUE_LINES = 10000
+
+    def __init__(self, db_type, dbname=None):
+        self.db_type = db_type
+        self.dbname = dbname
+        self.proc = None
+        self.lock = threading.Lock()
+        self._stdout = queue.Queue()
+        self._stderr = queue.Queue()
+        self._stop = threading.Event()
+
+    @staticmethod
+    def get(db_type, dbname=None):
+        """(db_type, dbname) uchun sessiyani olish yoki yaratish"""
+        key = (db_type, dbname)
+        with DBSession._registry_lock:
+            session = DBSession._sessions.get(key)
+            if session is None:
+                session = DBSession(db_type, dbname)
+                DBSession._sessions[key] = session
+            return session
+
+    @staticmethod
+    def close_all():
+        """Barcha ochiq sessiyalarni yopish"""
+        with DBSession._registry_lock:
+            for session in DBSession._sessions.values():
+                session.close()
+            DBSession._sessions.clear()
+
+    def _command(self):
+        if self.db_type == "mysql":
+            # --quick: natija client xotirasida to'planmaydi, qatorma-qator oqimlanadi
+            cmd = ["sudo", "mysql", "--batch", "--quick", "--force", "--unbuffered"]
+            if self.dbname:
+                cmd.append(self.dbname)
+            return cmd
+        cmd = ["sudo", "-u", "postgres"]
+        if shutil.which("stdbuf"):
+            # psql stdout pipe'da to'liq buferlanadi - qatorma-qator chiqarish
+            cmd += ["stdbuf", "-oL"]
+        cmd += ["psql", "-X", "-q", "-A", "-F", "\t", "-P", "footer=off",
+                "-P", "pager=off", "-v", "ON_ERROR_STOP=0"]
+        if self.dbname:
+            cmd += ["-d", self.dbname]
+        return cmd
+
+    @staticmethod
+    def _pump(stream, target, stop):
+        # stdout navbati chegaralangan: sekin o'quvchi (stream()) client'ni ushlab turadi
+        for line in iter(stream.readline, ''):
+            if not BackupPipeline._put(target, line.rstrip('\n'), stop):
+                return
+        BackupPipeline._put(target, None, stop)
+
+    def _alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def _start(self):
+        self._stdout = queue.Queue(maxsize=DBSession.QUEUE_LINES)
+        self._stderr = queue.Queue()
+        self._stop = threading.Event()
+        # surrogateescape: UTF-8 bo'lmagan baytlar ham o'zgarishsiz qaytadi
+        self.proc = subprocess.Popen(self._command(), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     stderr=subprocess.PIPE, encoding='utf-8', errors='surrogateescape',
+                                     bufsize=1)
+        for stream, target in ((self.proc.stdout, self._stdout), (self.proc.stderr, self._stderr)):
+            threading.Thread(target=DBSession._pump, args=(stream, target, self._stop), daemon=True).start()
+        Logger.debug(f"{self.db_type} sessiyasi ochildi (db={self.dbname or '-'})")
+
+    def close(self):
+        """Sessiyani yopish (client stdin EOF orqali chiqadi)"""
+        if self.proc is None:
+            return
+        self._stop.set()
+        try:
+            if self.proc.stdin:
+                self.proc.stdin.close()
+            self.proc.wait(timeout=2)
+        except Exception:
+            self.proc.kill()
+        self.proc = None
+
+    def _drain_stderr(self):
+        lines = []
+        while True:
+            try:
+                line = self._stderr.get_nowait()
+            except queue.Empty:
+                break
+            if line:
+                lines.append(line)
+        return '\n'.join(lines)
+
+    def _read_stderr(self, marker, deadline):
+        """stderr ni so'rov trailer'i yozgan markergacha o'qish: (matn, marker topildimi)"""
+        lines = []
+        while True:
+            try:
+                line = self._stderr.get(timeout=max(deadline - time.monotonic(), 0.01))
+            except queue.Empty:
+                return '\n'.join(lines), False
+            if line is None or line == marker:
+                return '\n'.join(lines), line is not None
+            if line:
+                lines.append(line)
+
+    def _value(self, raw):
+        if self.db_type == "mysql":
+            if raw == "NULL":
+                return None
+            # --batch rejimida maxsus belgilar escape qilinadi
+            if '\\' in raw:
+                raw = re.sub(r'\\(.)', lambda m: {'n': '\n', 't': '\t', '0': '\0'}.get(m.group(1), m.group(1)), raw)
+        return raw
+
+    @staticmethod
+    def split(sql, db_type):
+        """SQL matnini alohida so'rovlarga ajratish (qo'shtirnoq va izoh ichidagi ';' hisobga olinmaydi)"""
+        statements, start, i, n = [], 0, 0, len(sql)
+        while i < n:
+            ch = sql[i]
+            if ch in "'\"`":
+                i += 1
+                while i < n and sql[i] != ch:
+                    if sql[i] == '\\' and db_type == "mysql":
+                        i += 1
+                    i += 1
+            elif sql.startswith('--', i) or (ch == '#' and db_type == "mysql"):
+                end = sql.find('\n', i)
+                i = n if end < 0 else end
+            elif sql.startswith('/*', i):
+                end = sql.find('*/', i + 2)
+                i = n if end < 0 else end + 1
+            elif ch == '$' and db_type == "postgresql":
+                tag = re.match(r'\$(?:[A-Za-z_]\w*)?\$', sql[i:])
+                if tag:
+                    end = sql.find(tag.group(0), i + len(tag.group(0)))
+                    i = n if end < 0 else end + len(tag.group(0)) - 1
+            elif ch == ';':
+                statements.append(sql[start:i])
+                start = i + 1
+            i += 1
+        statements.append(sql[start:])
+        return [s.strip() for s in statements if s.strip()]
+
+    def _parse(self, lines, boundary=None):
+        # Har bir natija to'plami o'z sarlavhasidan boshlanadi; to'plamlar boundary qatori bilan ajratilgan
+        rows, headers, skip = [], None, False
+        for line in lines:
+            if skip:
+                skip = False
+                continue
+            if line == boundary:
+                headers = None
+                # MySQL: boundary - ustun nomi, keyingi qator uning qiymati ("1")
+                skip = self.db_type == "mysql"
+                continue
+            if headers is None:
+                headers = line.split('\t')
+                continue
+            values = [self._value(v) for v in line.split('\t')]
+            rows.append(dict(zip(headers, values)))
+        return rows
+
+    def query(self, sql, timeout=60):
+        """
+        So'rovni bajarish: (qatorlar, stderr, kod).
+        Bir nechta so'rov bo'lsa, natija to'plamlari o'z ustun nomlari bilan ketma-ket qaytadi.
+        """
+        return self._execute(sql, timeout)
+
+    def stream(self, sql, sink, timeout=600):
+        """
+        Bitta ustunli katta natijani xotirada to'plamasdan o'qish: har bir qiymat
+        (birinchisi - ustun nomi) escape'dan ochilib sink(qiymat) ga beriladi.
+        timeout - qatorlar orasidagi kutish. Natija: (stderr, kod)
+        """
+        if len(DBSession.split(sql, self.db_type)) > 1:
+            return "stream() faqat bitta so'rov qabul qiladi", 1
+        _, errors, code = self._execute(sql, timeout, sink)
+        return errors, code
+
+    def _execute(self, sql, timeout, sink=None):
+        with self.lock:
+            if not self._alive():
+                try:
+                    self._start()
+                except Exception as e:
+                    self.proc = None
+                    return [], str(e), 1
+
+            marker = f"__END_{uuid.uuid4().hex}__"
+            err_marker = f"__ERR_{uuid.uuid4().hex}__"
+            boundary = f"__RS_{uuid.uuid4().hex}__"
+            statement = sql.strip()
+            statements = [statement] if statement.startswith('\\') else DBSession.split(statement, self.db_type)
+            statements = [s if s.startswith('\\') or s.endswith(';') else s + ';' for s in statements or [statement]]
+            if self.db_type == "mysql":
+                separator = f"SELECT 1 AS `{boundary}`;"
+                trailer = f"SELECT 1 AS `{marker}`;"
+            else:
+                separator = f"\\echo {boundary}"
+                trailer = f"\\echo {marker}"
+            # So'rovlar orasidagi ajratkich: keyingi natija to'plamining sarlavhasi ma'lumot qatori bo'lib qolmaydi
+            statement = f"\n{separator}\n".join(statements)
+            # stderr ham markergacha o'qiladi - shu so'rov xatosi keyingisiga o'tib ketmaydi
+            trailer += f"\n\\! echo {err_marker} >&2"
+
+            try:
+                self.proc.stdin.write(f"{statement}\n{trailer}\n")
+                self.proc.stdin.flush()
+            except (BrokenPipeError, OSError) as e:
+                self.close()
+                return [], str(e), 1
+
+            lines = []
+            deadline = time.monotonic() + timeout
+            while True:
+                try:
+                    line = self._stdout.get(timeout=max(deadline - time.monotonic(), 0.01))
+                except queue.Empty:
+                    self.close()
+                    return [], "Timeout", 1
+                if line is None:
+                    errors = self._drain_stderr()
+                    self.close()
+                    return [], errors or "Sessiya kutilmaganda yopildi", 1
+                if line == marker:
+                    break
+                if sink is None:
+                    lines.append(line)
+                    continue
+                try:
+                    sink(self._value(line))
+                except Exception:
+                    # Natija o'rtasida to'xtatilgan sessiyadan keyingi so'rovlar foydalana olmaydi
+                    self.close()
+                    raise
+                deadline = time.monotonic() + timeout
+
+            if self.db_type == "mysql":
+                # Marker - ustun nomi, keyingi qator uning qiymati ("1")
+                try:
+                    self._stdout.get(timeout=max(deadline - time.monotonic(), 0.01))
+                except queue.Empty:
+                    pass
+
+            errors, complete = self._read_stderr(err_marker, deadline)
+            if not complete:
+                self.close()
+                return [], errors or "Timeout", 1
+            code = 1 if re.search(r'\b(ERROR|FATAL)\b', errors) else 0
+            return self._parse(lines, boundary), errors, code
+
+atexit.register(DBSession.close_all)
+
+# ============================================================================
+# BACKUP PIPELINE (OQIMLI SIQISH)
+# ============================================================================
+
+class RateLimiter:
+    """Thread-safe token bucket: bir nechta worker uchun umumiy bayt/s cheklovi"""
+
+    def __init__(self, rate_bytes):
+        self.rate = float(rate_bytes)
+        self.tokens = self.rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, amount):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+class Codec:
+    """
+    Backup siqish kodeklari: gz, zstd (ko'p thread'li), lz4, none.
+    Kodek settings.json -> backup.compression / compression_level / compression_threads
+    dan olinadi; restore paytida fayl boshidagi magic bayt orqali aniqlanadi.
+    """
+    EXTENSIONS = {"gz": ".gz", "zstd": ".zst", "lz4": ".lz4", "none": ""}
+    MAGIC = {b'\x1f\x8b': "gz", b'\x28\xb5\x2f\xfd': "zstd", b'\x04\x22\x4d\x18': "lz4"}
+    DEFAULT_LEVELS = {"gz": 6, "zstd": 3, "lz4": 0, "none": 0}
+    MODULES = {"zstd": "zstandard", "lz4": "lz4.frame"}
+
+    @staticmethod
+    def available(codec):
+        module = Codec.MODULES.get(codec)
+        return codec in Codec.EXTENSIONS and (module is None or OptionalDeps.available(module.split('.')[0]))
+
+    @staticmethod
+    def configured():
+        """Sozlamadagi kodek (o'rnatilmagan bo'lsa gz ga qaytadi)"""
+        codec = str(Config.get("backup", "compression", "gz") or "gz").lower()
+        codec = {"gzip": "gz", "zst": "zstd", "off": "none"}.get(codec, codec)
+        if not Codec.available(codec):
+            Logger.warning(f"'{codec}' kodeki mavjud emas, gz ishlatiladi")
+            return "gz"
+        return codec
+
+    @staticmethod
+    def extension(codec=None):
+        return ".sql" + Codec.EXTENSIONS[codec or Codec.configured()]
+
+    @staticmethod
+    def is_backup(path):
+        """Fayl nomi SQL backup artefaktimi (.sql, .sql.gz, .sql.zst, .sql.lz4, + .enc)"""
+        name = path.name.removesuffix(StreamCipher.EXTENSION)
+        return any(name.endswith(".sql" + ext) for ext in Codec.EXTENSIONS.values())
+
+    @staticmethod
+    def backup_files(pattern="*"):
+        """BACKUP_DIR dagi barcha kodekdagi backup fayllar (.part'larsiz)"""
+        return sorted(f for f in BACKUP_DIR.glob(f"{pattern}.sql*") if f.is_file() and Codec.is_backup(f))
+
+    @staticmethod
+    def detect(head):
+        for magic, codec in Codec.MAGIC.items():
+            if head.startswith(magic):
+                return codec
+        return "none"
+
+    @staticmethod
+    def writer(raw, codec=None, level=None, threads=None):
+        """raw fayl ustiga siquvchi yozuvchi (context manager)"""
+        codec = codec or Codec.configured()
+        if level is None:
+            level = Config.get("backup", "compression_level", None)
+        if level is None:
+            level = Codec.DEFAULT_LEVELS[codec]
+        if threads is None:
+            threads = int(Config.get("backup", "compression_threads", 0) or 0)
+        
+        if codec == "gz":
+            return gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=level)
+        if codec == "zstd":
+            zstandard = OptionalDeps.load("zstandard")
+            # threads=-1: barcha CPU yadrolari
+            cctx = zstandard.ZstdCompressor(level=level, threads=threads or -1)
+            return cctx.stream_writer(raw, closefd=False)
+        if codec == "lz4":
+            lz4_frame = OptionalDeps.load("lz4.frame")
+            return lz4_frame.LZ4FrameFile(raw, mode='wb', compression_level=level)
+        return _Passthrough(raw)
+
+    @staticmethod
+    def reader(raw):
+        """Kodekni (va shifrlashni) magic bayt orqali aniqlab, ochiq oqimni qaytarish"""
+        head = raw.peek(8)[:8] if hasattr(raw, 'peek') else b''
+        if head.startswith(StreamCipher.MAGIC):
+            return Codec.reader(io.BufferedReader(DecryptingReader(raw, StreamCipher.password()),
+                                                  StreamCipher.CHUNK_SIZE))
+        codec = Codec.detect(head)
+        if codec == "gz":
+            return gzip.GzipFile(fileobj=raw, mode='rb')
+        if codec == "zstd":
+            zstandard = OptionalDeps.load("zstandard")
+            return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=False))
+        if codec == "lz4":
+            lz4_frame = OptionalDeps.load("lz4.frame")
+            return lz4_frame.LZ4FrameFile(raw, mode='rb')
+        return raw
+
+    @staticmethod
+    def benchmark(sample_file=None, sample_mb=64):
+        """Haqiqiy dump namunasida har bir kodek/daraja uchun MB/s va siqish nisbatini o'lchash"""
+        if sample_file is None:
+            backups = sorted(Codec.backup_files(), key=lambda f: f.stat().st_mtime)
+            if not backups:
+                Logger.error("Namuna uchun backup topilmadi (fayl yo'lini bering)")
+                return []
+            sample_file = backups[-1]
+        
+        with open(sample_file, 'rb') as raw:
+            sample = Codec.reader(raw).read(int(sample_mb * 1024 * 1024))
+        if not sample:
+            Logger.error("Namuna bo'sh")
+            return []
+        
+        Logger.info(f"Namuna: {Path(sample_file).name}, {len(sample) / (1024 * 1024):.1f} MB")
+        mb = len(sample) / (1024 * 1024)
+        candidates = [("gz", 1), ("gz", 6), ("zstd", 1), ("zstd", 3), ("zstd", 9), ("zstd", 19), ("lz4", 0), ("lz4", 9)]
+        results = []
+        
+        for codec, level in candidates:
+            if not Codec.available(codec):
+                results.append({'codec': codec, 'level': level, 'compress_mb_s': '-', 'decompress_mb_s': '-',
+                                'ratio': "o'rnatilmagan"})
+                continue
+            
+            buffer = io.BytesIO()
+            start = time.perf_counter()
+            with Codec.writer(buffer, codec, level) as out:
+                out.write(sample)
+            compress_time = time.perf_counter() - start
+            compressed_size = len(buffer.getvalue())
+            
+            buffer.seek(0)
+            start = time.perf_counter()
+            Codec.reader(io.BufferedReader(buffer)).read()
+            decompress_time = time.perf_counter() - start
+            
+            results.append({
+                'codec': codec,
+                'level': level,
+                'compress_mb_s': f"{mb / max(compress_time, 1e-9):.1f}",
+                'decompress_mb_s': f"{mb / max(decompress_time, 1e-9):.1f}",
+                'ratio': f"{len(sample) / max(compressed_size, 1):.2f}"
+            })
+        
+        print(f"\n{Colors.CYAN}{Colors.BOLD}=== SIQISH BENCHMARK ==={Colors.NC}")
+        UI.show_table(results)
+        return results
+
+class StreamCipher:
+    """
+    Oqimli, bo'lakli AEAD shifrlash konteyneri (AES-256-GCM, kalit - scrypt KDF).
+    Format: sarlavha (MAGIC, KDF parametrlari, salt, nonce prefiksi, bo'lak hajmi),
+    so'ng bo'laklar: [uzunlik | oxirgi-bayroq] + shifrlangan matn + teg.
+    Har bir bo'lakning AAD'i sarlavha, tartib raqami va oxirgi-bayroqni o'z ichiga
+    oladi - bo'laklarni almashtirish, olib tashlash yoki faylni kesish aniqlanadi.
+    """
+    MAGIC = b'SDBENC1\x00'
+    EXTENSION = ".enc"
+    CHUNK_SIZE = 1024 * 1024
+    SCRYPT_N_LOG2, SCRYPT_R, SCRYPT_P = 15, 8, 1
+    FINAL_FLAG = 0x80000000
+    HEADER = struct.Struct(">8sBBBB16s8sI")
+    _password = None
+
+    @staticmethod
+    def derive_key(password, salt, n_log2, r, p):
+        return hashlib.scrypt(password.encode(), salt=salt, n=1 << n_log2, r=r, p=p,
+                              maxmem=256 * 1024 * 1024, dklen=32)
+
+    @staticmethod
+    def password(prompt="Shifr paroli"):
+        """Parol: SETTINGSDBPRO_BACKUP_PASSWORD, SSL_DIR/backup.key yoki so'rov (bir marta)"""
+        if StreamCipher._password is None:
+            key_file = SSL_DIR / "backup.key"
+            if os.environ.get("SETTINGSDBPRO_BACKUP_PASSWORD"):
+                StreamCipher._password = os.environ["SETTINGSDBPRO_BACKUP_PASSWORD"]
+            elif key_file.exists():
+                StreamCipher._password = key_file.read_text(encoding='utf-8').strip()
+            else:
+                StreamCipher._password = UI.get_password(prompt)
+        return StreamCipher._password
+
+    @staticmethod
+    def _workers():
+        return int(Config.get("backup", "encryption_workers", 0) or 0) or min(4, os.cpu_count() or 1)
+
+class EncryptingWriter:
+    """Yozilgan baytlarni bo'laklab shifrlab raw faylga yozuvchi (pipeline bosqichi)"""
+
+    def __init__(self, raw, password, workers=None):
+        AESGCM = OptionalDeps.load("cryptography.hazmat.primitives.ciphers.aead").AESGCM
+        salt, self.prefix = os.urandom(16), os.urandom(8)
+        self.header = StreamCipher.HEADER.pack(
+            StreamCipher.MAGIC, 1, StreamCipher.SCRYPT_N_LOG2, StreamCipher.SCRYPT_R, StreamCipher.SCRYPT_P,
+            salt, self.prefix, StreamCipher.CHUNK_SIZE
+        )
+        self.aead = AESGCM(StreamCipher.derive_key(
+            password, salt, StreamCipher.SCRYPT_N_LOG2, StreamCipher.SCRYPT_R, StreamCipher.SCRYPT_P
+        ))
+        self.raw = raw
+        self.raw.write(self.header)
+        self.buffer = bytearray()
+        self.counter = 0
+        self.workers = workers or StreamCipher._workers()
+        self.pool = ThreadPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+
+    def _seal(self, item):
+        counter, data, final = item
+        flag = b'\x01' if final else b'\x00'
+        nonce = self.prefix + counter.to_bytes(4, 'big')
+        return self.aead.encrypt(nonce, data, self.header + counter.to_bytes(8, 'big') + flag), final
+
+    def _emit(self, items):
+        sealed = self.pool.map(self._seal, items) if self.pool else map(self._seal, items)
+        for ciphertext, final in sealed:
+            length = len(ciphertext) | (StreamCipher.FINAL_FLAG if final else 0)
+            self.raw.write(length.to_bytes(4, 'big'))
+            self.raw.write(ciphertext)
+
+    def write(self, data):
+        self.buffer += data
+        size = StreamCipher.CHUNK_SIZE
+        # Oxirgi bo'lak close() da "final" bayrog'i bilan yoziladi
+        if len(self.buffer) > size * self.workers:
+            count = (len(self.buffer) - 1) // size
+            items = []
+            for i in range(count):
+                items.append((self.counter, bytes(self.buffer[i * size:(i + 1) * size]), False))
+                self.counter += 1
+            del self.buffer[:count * size]
+            self._emit(items)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.raw is None:
+            return
+        size = StreamCipher.CHUNK_SIZE
+        items = []
+        while len(self.buffer) > size:
+            items.append((self.counter, bytes(self.buffer[:size]), False))
+            del self.buffer[:size]
+            self.counter += 1
+        items.append((self.counter, bytes(self.buffer), True))
+        self._emit(items)
+        if self.pool:
+            self.pool.shutdown()
+        self.raw = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+class DecryptingReader(io.RawIOBase):
+    """StreamCipher konteynerini o'qib, ochiq matnni oqim sifatida qaytarish"""
+
+    def __init__(self, raw, password):
+        AESGCM = OptionalDeps.load("cryptography.hazmat.primitives.ciphers.aead").AESGCM
+        self.header = raw.read(StreamCipher.HEADER.size)
+        magic, kdf, n_log2, r, p, salt, self.prefix, _ = StreamCipher.HEADER.unpack(self.header)
+        if magic != StreamCipher.MAGIC or kdf != 1:
+            raise ValueError("shifrlangan konteyner formati noma'lum")
+        self.aead = AESGCM(StreamCipher.derive_key(password, salt, n_log2, r, p))
+        self.raw = raw
+        self.counter = 0
+        self.current = b''
+        self.pos = 0
+        self.finished = False
+
+    def readable(self):
+        return True
+
+    def _next_chunk(self):
+        length_bytes = self.raw.read(4)
+        if len(length_bytes) < 4:
+            raise IOError("shifrlangan fayl kesilgan (oxirgi bo'lak yo'q)")
+        length = int.from_bytes(length_bytes, 'big')
+        final = bool(length & StreamCipher.FINAL_FLAG)
+        ciphertext = self.raw.read(length & ~StreamCipher.FINAL_FLAG)
+        nonce = self.prefix + self.counter.to_bytes(4, 'big')
+        aad = self.header + self.counter.to_bytes(8, 'big') + (b'\x01' if final else b'\x00')
+        try:
+            self.current = self.aead.decrypt(nonce, ciphertext, aad)
+        except Exception:
+            raise IOError(f"{self.counter}-bo'lak autentifikatsiyadan o'tmadi (parol noto'g'ri yoki fayl buzilgan)")
+        self.pos = 0
+        self.counter += 1
+        self.finished = final
+
+    def readinto(self, buffer):
+        while self.pos >= len(self.current):
+            if self.finished:
+                return 0
+            self._next_chunk()
+        size = min(len(buffer), len(self.current) - self.pos)
+        buffer[:size] = self.current[self.pos:self.pos + size]
+        self.pos += size
+        return size
+
+class _Passthrough:
+    """Siqishsiz yozish uchun yupqa o'ram (tashqi faylni yopmaydi)"""
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def write(self, data):
+        return self.raw.write(data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class BackupPipeline:
+    """
+    Dump chiqishini (stdout) oraliq .sql faylsiz to'g'ridan-to'g'ri siqilgan
+    artefaktga oqimlash. O'quvchi thread va kompressor o'rtasida cheklangan
+    navbat bor, shuning uchun xotira sarfi CHUNK_SIZE * QUEUE_DEPTH dan oshmaydi.
+    """
+    CHUNK_SIZE = 1024 * 1024
+    QUEUE_DEPTH = 8
+    _print_lock = threading.Lock()
+
+    @staticmethod
+    def _put(buffer, item, stop):
+        """Navbatga qo'yish; yozuvchi to'xtagan bo'lsa (stop) to'la navbatda osilib qolmaslik"""
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def _read_chunks(stream, buffer, stop):
+        try:
+            for chunk in iter(lambda: stream.read(BackupPipeline.CHUNK_SIZE), b''):
+                if not BackupPipeline._put(buffer, chunk, stop):
+                    break
+        finally:
+            BackupPipeline._put(buffer, None, stop)
+
+    @staticmethod
+    def run(cmd, target, limiter=None, codec=None, password=None):
+        """
+        cmd: dump komandasi (ro'yxat), target: yakuniy siqilgan fayl,
+        limiter: umumiy RateLimiter (I/O tezligi cheklovi) yoki None,
+        codec: Codec nomi (None - sozlamadagi),
+        password: berilsa siqilgan oqim shu bosqichda shifrlanadi (StreamCipher).
+        Natija: statistika dict ('ok', 'path', 'bytes_in', 'bytes_written', ...)
+        """
+        target = Path(target)
+        part_file = target.with_name(target.name + ".part")
+        stats = {'ok': False, 'path': str(target), 'bytes_in': 0, 'bytes_written': 0,
+                 'peak_disk': 0, 'duration': 0.0, 'throughput': 0.0, 'error': ''}
+        start = time.monotonic()
+        
+        try:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except Exception as e:
+            stats['error'] = str(e)
+            return stats
+        
+        buffer = queue.Queue(maxsize=BackupPipeline.QUEUE_DEPTH)
+        stop = threading.Event()
+        errors = []
+        reader = threading.Thread(target=BackupPipeline._read_chunks, args=(proc.stdout, buffer, stop), daemon=True)
+        err_reader = threading.Thread(target=lambda: errors.append(proc.stderr.read()), daemon=True)
+        reader.start()
+        err_reader.start()
+        
+        try:
+            with open(part_file, 'wb') as raw, contextlib.ExitStack() as stack:
+                sink = stack.enter_context(EncryptingWriter(raw, password)) if password else raw
+                with Codec.writer(sink, codec) as out:
+                    while True:
+                        chunk = buffer.get()
+                        if chunk is None:
+                            break
+                        if limiter:
+                            limiter.consume(len(chunk))
+                        out.write(chunk)
+                        stats['bytes_in'] += len(chunk)
+                        stats['peak_disk'] = max(stats['peak_disk'], raw.tell())
+            code = proc.wait()
+        except Exception as e:
+            stop.set()
+            proc.kill()
+            proc.wait()
+            code = -1
+            stats['error'] = str(e)
+        
+        reader.join(timeout=5)
+        err_reader.join(timeout=5)
+        if not stats['error'] and code != 0:
+            stats['error'] = b''.join(errors).decode(errors='replace').strip() or f"exit code {code}"
+        
+        stats['duration'] = time.monotonic() - start
+        if stats['error']:
+            part_file.unlink(missing_ok=True)
+            return stats
+        
+        part_file.replace(target)
+        stats['ok'] = True
+        stats['bytes_written'] = target.stat().st_size
+        stats['peak_disk'] = max(stats['peak_disk'], stats['bytes_written'])
+        if stats['duration'] > 0:
+            stats['throughput'] = stats['bytes_in'] / (1024 * 1024) / stats['duration']
+        return stats
+
+    @staticmethod
+    def run_parallel(db_type, dump_fn, sizes, workers=None, bandwidth_mb=None):
+        """
+        Bir nechta DB ni cheklangan thread pool'da backup qilish.
+        dump_fn(dbname, limiter) -> stats, sizes: {dbname: bayt}.
+        Katta bazalar birinchi boshlanadi; natija - har bir DB bo'yicha xulosa.
+        """
+        if workers is None:
+            workers = int(Config.get("backup", "parallel_workers", 4) or 1)
+        if bandwidth_mb is None:
+            bandwidth_mb = float(Config.get("backup", "bandwidth_limit_mb", 0) or 0)
+        workers = max(1, workers)
+        if Config.get("backup", "encryption", False):
+            # Parol worker thread'lardan oldin bir marta so'raladi
+            StreamCipher.password()
+        limiter = RateLimiter(bandwidth_mb * 1024 * 1024) if bandwidth_mb > 0 else None
+        
+        ordered = sorted(sizes, key=lambda name: sizes[name] or 0, reverse=True)
+        if not ordered:
+            Logger.warning(f"{db_type}: backup qilinadigan DB topilmadi")
+            return []
+        
+        Logger.info(f"{db_type}: {len(ordered)} ta DB, {workers} parallel worker"
+                    + (f", I/O limit {bandwidth_mb:.0f} MB/s" if limiter else ""))
+        
+        summary = []
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(dump_fn, name, limiter): name for name in ordered}
+            for done, future in enumerate(as_completed(futures), 1):
+                name = futures[future]
+                try:
+                    stats = future.result()
+                except Exception as e:
+                    stats = {'ok': False, 'error': str(e), 'bytes_written': 0, 'duration': 0.0}
+                summary.append({
+                    'database': name,
+                    'status': 'OK' if stats['ok'] else 'XATO',
+                    'size_mb': f"{stats['bytes_written'] / (1024 * 1024):.2f}",
+                    'duration_s': f"{stats['duration']:.1f}",
+                    'error': stats.get('error', '')[:60]
+                })
+                with BackupPipeline._print_lock:
+                    state = f"{Colors.GREEN}OK{Colors.NC}" if stats['ok'] else f"{Colors.RED}XATO{Colors.NC}"
+                    print(f"[{done}/{len(ordered)}] {name}: {state} ({stats['duration']:.1f} s)")
+        
+        failed = [row for row in summary if row['status'] != 'OK']
+        print(f"\n{Colors.CYAN}{Colors.BOLD}=== BACKUP XULOSASI ({db_type}) ==={Colors.NC}")
+        UI.show_table(summary)
+        print(f"\nJami vaqt: {time.monotonic() - start:.1f} s, muvaffaqiyatli: "
+              f"{len(summary) - len(failed)}, xato: {len(failed)}")
+        return summary
+
+    @staticmethod
+    def feed(cmd, source, prefix=b""):
+        """
+        Siqilgan (kodek avtomatik aniqlanadi) yoki oddiy SQL faylni client
+        stdin'iga oqimlash. Xotira sarfi CHUNK_SIZE bilan cheklangan.
+        """
+        source = Path(source)
+        stats = {'ok': False, 'path': str(source), 'bytes_in': 0, 'duration': 0.0, 'error': ''}
+        start = time.monotonic()
+        
+        try:
+            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        except Exception as e:
+            stats['error'] = str(e)
+            return stats
+        
+        errors = []
+        err_reader = threading.Thread(target=lambda: errors.append(proc.stderr.read()), daemon=True)
+        err_reader.start()
+        
+        try:
+            with open(source, 'rb') as raw:
+                f_in = Codec.reader(raw)
+                if prefix:
+                    proc.stdin.write(prefix)
+                for chunk in iter(lambda: f_in.read(BackupPipeline.CHUNK_SIZE), b''):
+                    proc.stdin.write(chunk)
+                    stats['bytes_in'] += len(chunk)
+            proc.stdin.close()
+        except BrokenPipeError:
+            # Client erta yopildi - sababi stderr'da bo'ladi
+            pass
+        except Exception as e:
+            proc.kill()
+            stats['error'] = str(e)
+        
+        code = proc.wait()
+        err_reader.join(timeout=5)
+        stderr = b''.join(errors).decode(errors='replace').strip()
+        if not stats['error'] and (code != 0 or re.search(r'\b(ERROR|FATAL)\b', stderr)):
+            stats['error'] = stderr or f"exit code {code}"
+        
+        stats['duration'] = time.monotonic() - start
+        stats['ok'] = not stats['error']
+        return stats
+
+    @staticmethod
+    def report(stats):
+        """Backup statistikasini chiqarish"""
+        mb = 1024 * 1024
+        Logger.info(
+            f"Dump: {stats['bytes_in'] / mb:.2f} MB, yozildi: {stats['bytes_written'] / mb:.2f} MB, "
+            f"disk cho'qqisi: {stats['peak_disk'] / mb:.2f} MB, "
+            f"{stats['duration']:.1f} s, {stats['throughput']:.2f} MB/s"
+        )
+
+class StreamingRestore:
+    """
+    Dump faylni (siqilgan yoki oddiy) client stdin'iga doimiy xotira bilan oqimlash.
+    SQL statement'lar partiyalarga (batch) bo'linadi; har bir partiyadan keyin
+    client marker qaytaradi va checkpoint TEMP_DIR ga yoziladi - uzilgan restore
+    oxirgi tasdiqlangan partiyadan davom ettiriladi.
+    """
+    BATCH_BYTES = 8 * 1024 * 1024
+    PROGRESS_INTERVAL = 1.0
+    # Resume paytida o'tkazib yuborilmaydigan sessiya sozlamalari
+    SESSION_STMT = re.compile(rb'^\s*(SET\s|/\*!\d+\s+SET\s|SELECT pg_catalog\.set_config|\\connect|USE\s)', re.I)
+    DOLLAR_TAG = re.compile(rb'\$[A-Za-z_0-9]*\$')
+
+    @staticmethod
+    def _client(db_type, dbname):
+        if db_type == "mysql":
+            return ["sudo", "mysql", "--batch", dbname]
+        return ["sudo", "-u", "postgres", "psql", "-X", "-q", "-v", "ON_ERROR_STOP=1", "-d", dbname]
+
+    @staticmethod
+    def _marker(db_type, token, batch):
+        text = f"__BATCH_{token}_{batch}__"
+        if db_type == "mysql":
+            return f"SELECT '{text}';\n".encode()
+        return f"\\echo {text}\n".encode()
+
+    @staticmethod
+    def checkpoint_path(source, dbname):
+        name = Path(source).resolve() if Path(source).exists() else source
+        key = hashlib.sha1(f"{name}|{dbname}".encode()).hexdigest()[:12]
+        return TEMP_DIR / f"restore_{key}.json"
+
+    @staticmethod
+    def load_checkpoint(source, dbname):
+        try:
+            with open(StreamingRestore.checkpoint_path(source, dbname), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def statements(stream, db_type):
+        """
+        Oqimni to'liq statement'larga bo'lish: (bytes, xavfsiz_chegara).
+        Xavfsiz chegara - COPY bloki, $$ tanasi yoki DELIMITER o'zgarishi ichida emas.
+        """
+        delimiter = b';'
+        dollar = None
+        in_copy = False
+        current = []
+        
+        for line in stream:
+            current.append(line)
+            stripped = line.rstrip(b'\r\n')
+            
+            if in_copy:
+                if stripped == b'\\.':
+                    in_copy = False
+                    yield b''.join(current), True
+                    current = []
+                continue
+            
+            if db_type == "postgresql":
+                if dollar is None and not current[1:] and stripped.startswith(b'\\'):
+                    # psql meta-komandasi (\connect, \restrict ...)
+                    yield b''.join(current), True
+                    current = []
+                    continue
+                for tag in StreamingRestore.DOLLAR_TAG.findall(stripped):
+                    if dollar is None:
+                        dollar = tag
+                    elif tag == dollar:
+                        dollar = None
+                if dollar is None and re.match(rb'^COPY .* FROM stdin;\s*$', stripped):
+                    in_copy = True
+                    continue
+            else:
+                match = re.match(rb'^DELIMITER\s+(\S+)', stripped, re.I)
+                if match:
+                    delimiter = match.group(1)
+                    yield b''.join(current), delimiter == b';'
+                    current = []
+                    continue
+            
+            if dollar is None and stripped.rstrip().endswith(delimiter):
+                yield b''.join(current), delimiter == b';'
+                current = []
+        
+        if current:
+            yield b''.join(current), False
+
+    @staticmethod
+    def _progress(done, total, start, skipped):
+        elapsed = max(time.monotonic() - start, 1e-6)
+        rate = done / elapsed
+        eta = (total - done) / rate if rate > 0 else 0
+        mb = 1024 * 1024
+        state = "o'tkazilmoqda" if skipped else "yuklanmoqda"
+        percent = 100.0 * done / total if total else 100.0
+        sys.stdout.write(
+            f"\r  {percent:5.1f}%  {done / mb:.1f}/{total / mb:.1f} MB  "
+            f"{rate / mb:.2f} MB/s  ETA {int(eta // 60)}:{int(eta % 60):02d}  ({state})   "
+        )
+        sys.stdout.flush()
+
+    @staticmethod
+    @contextlib.contextmanager
+    def open_file(source):
+        """(progress uchun xom fayl, dekompressiya oqimi, jami hajm)"""
+        with open(source, 'rb') as raw:
+            yield raw, Codec.reader(raw), Path(source).stat().st_size
+
+    @staticmethod
+    def run(db_type, source, dbname, resume=True, opener=None):
+        """
+        Restore: dekompressiya -> client stdin. Progress va ETA siqilgan fayl
+        ofsetiga qarab hisoblanadi. opener - boshqa manba (masalan dedup ombori)
+        uchun open_file o'rnini bosuvchi. Natija: True/False
+        """
+        opener = opener or StreamingRestore.open_file
+        checkpoint_file = StreamingRestore.checkpoint_path(source, dbname)
+        checkpoint = StreamingRestore.load_checkpoint(source, dbname) if resume else None
+        resume_offset = checkpoint['offset'] if checkpoint else 0
+        if checkpoint:
+            Logger.info(f"Checkpoint topildi: {checkpoint['batch']}-partiyadan davom ettiriladi")
+        
+        token = uuid.uuid4().hex[:8]
+        marker_re = re.compile(rf'__BATCH_{token}_(\d+)__')
+        offsets = {}
+        acked = {'batch': checkpoint['batch'] if checkpoint else 0}
+        
+        def save_checkpoint(batch):
+            state = {'source': str(source), 'database': dbname, 'batch': batch,
+                     'offset': offsets[batch], 'updated': datetime.datetime.now().isoformat()}
+            tmp = checkpoint_file.with_suffix('.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            tmp.replace(checkpoint_file)
+        
+        def read_markers(stream):
+            for line in stream:
+                match = marker_re.search(line.decode(errors='replace'))
+                if match:
+                    batch = int(match.group(1))
+                    if batch > acked['batch']:
+                        acked['batch'] = batch
+                        save_checkpoint(batch)
+        
+        try:
+            proc = subprocess.Popen(StreamingRestore._client(db_type, dbname),
+                                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except Exception as e:
+            Logger.error(f"Restore qilishda xatolik: {e}")
+            return False
+        
+        errors = []
+        out_reader = threading.Thread(target=read_markers, args=(proc.stdout,), daemon=True)
+        err_reader = threading.Thread(target=lambda: errors.append(proc.stderr.read()), daemon=True)
+        out_reader.start()
+        err_reader.start()
+        
+        start = time.monotonic()
+        last_report = 0.0
+        failure = ''
+        total = 0
+        
+        try:
+            with opener(source) as (raw, stream, total):
+                offset = 0
+                batch = acked['batch']
+                batch_bytes = 0
+                
+                for stmt, safe in StreamingRestore.statements(stream, db_type):
+                    offset += len(stmt)
+                    if offset <= resume_offset:
+                        # Tasdiqlangan partiyalar: faqat sessiya sozlamalari qayta yuboriladi
+                        if StreamingRestore.SESSION_STMT.match(stmt):
+                            proc.stdin.write(stmt)
+                    else:
+                        proc.stdin.write(stmt)
+                        batch_bytes += len(stmt)
+                        if safe and batch_bytes >= StreamingRestore.BATCH_BYTES:
+                            batch += 1
+                            offsets[batch] = offset
+                            proc.stdin.write(StreamingRestore._marker(db_type, token, batch))
+                            batch_bytes = 0
+                    
+                    now = time.monotonic()
+                    if now - last_report >= StreamingRestore.PROGRESS_INTERVAL:
+                        StreamingRestore._progress(raw.tell(), total, start, offset <= resume_offset)
+                        last_report = now
+                
+                StreamingRestore._progress(total, total, start, False)
+                print()
+            proc.stdin.close()
+        except BrokenPipeError:
+            print()
+        except Exception as e:
+            print()
+            proc.kill()
+            failure = str(e)
+        
+        code = proc.wait()
+        out_reader.join(timeout=5)
+        err_reader.join(timeout=5)
+        stderr = b''.join(errors).decode(errors='replace').strip()
+        
+        if not failure and code == 0:
+            checkpoint_file.unlink(missing_ok=True)
+            duration = time.monotonic() - start
+            Logger.success(f"Restore bajarildi ({duration:.1f} s, {total / (1024 * 1024) / max(duration, 1e-6):.2f} MB/s)")
+            return True
+        
+        Logger.error(f"Restore qilishda xatolik: {failure or stderr or f'exit code {code}'}")
+        if acked['batch']:
+            Logger.warning(f"{acked['batch']}-partiyagacha yuklangan; qayta ishga tushirilsa shu joydan davom etadi")
+        return False
+
+# ============================================================================
+# SHARDLI BACKUP (JADVAL BO'YICHA PARALLEL DUMP / RESTORE)
+# ============================================================================
+
+class ShardedBackup:
+    """
+    Bitta katta DB uchun jadval bo'yicha bo'lingan backup formati:
+      <prefix>_<db>_<vaqt>.shard/
+        manifest.json   - engine, jadvallar, qatorlar soni, hajmlar
+        schema.sql.*    - jadvallar (ikkilamchi indekslarsiz)
+        tables/*.sql.*  - har bir jadval ma'lumoti alohida
+        post.sql.*      - indekslar, FK, triggerlar (ma'lumotdan keyin)
+    Fayl kengaytmasi sozlamadagi kodekka bog'liq (.gz, .zst, .lz4).
+    """
+    MANIFEST = "manifest.json"
+    FORMAT_VERSION = 1
+    KEY_LINE = re.compile(r'^\s+((?:UNIQUE |FULLTEXT |SPATIAL )?KEY|CONSTRAINT)\b')
+    AUTO_COLUMN = re.compile(r'^\s+`((?:[^`]|``)+)` .*\bAUTO_INCREMENT\b')
+    MYSQL_SESSION = ("SET NAMES utf8mb4", "SET time_zone = '+00:00'",
+                     "SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+    MYSQL_DATA_HEADER = "SET NAMES utf8mb4;\nSET time_zone = '+00:00';\nSET sql_mode = 'NO_AUTO_VALUE_ON_ZERO';\n"
+    HEX_TYPES = {'binary', 'varbinary', 'tinyblob', 'blob', 'mediumblob', 'longblob', 'geometry', 'point',
+                 'linestring', 'polygon', 'multipoint', 'multilinestring', 'multipolygon', 'geometrycollection'}
+    INSERT_BYTES = 1024 * 1024
+
+    @staticmethod
+    def _prefix(db_type):
+        return "mysql" if db_type == "mysql" else "postgres"
+
+    @staticmethod
+    def _client(db_type, dbname):
+        if db_type == "mysql":
+            return ["sudo", "mysql", dbname]
+        return ["sudo", "-u", "postgres", "psql", "-X", "-q", "-v", "ON_ERROR_STOP=1", "-d", dbname]
+
+    @staticmethod
+    def _quote(db_type, name):
+        # PostgreSQL nomlari format('%I.%I') orqali allaqachon qo'shtirnoqlangan
+        return f"`{name}`" if db_type == "mysql" else name
+
+    @staticmethod
+    def _query(db_type, sql, dbname, session=None, timeout=60):
+        """So'rov: berilgan snapshot sessiyasida yoki umumiy DBSession orqali"""
+        if session is not None:
+            return session.query(sql, timeout)
+        return DatabaseManager.query(db_type, sql, dbname, timeout=timeout)
+
+    @staticmethod
+    def export_snapshot(dbname):
+        """
+        PostgreSQL: REPEATABLE READ tranzaksiyasini ochiq ushlab, snapshot eksport qilish.
+        Natija: (sessiya, snapshot id) - sessiya barcha pg_dump'lar tugaguncha yopilmasligi kerak.
+        """
+        session = DBSession("postgresql", dbname)
+        _, stderr, code = session.query("BEGIN ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        rows = []
+        if code == 0:
+            rows, stderr, code = session.query("SELECT pg_export_snapshot() AS id")
+        if code != 0 or not rows:
+            session.close()
+            raise RuntimeError(stderr or "snapshot eksport qilinmadi")
+        return session, rows[0]['id']
+
+    @staticmethod
+    def _session_query(session, sql, timeout=60):
+        _, stderr, code = session.query(sql, timeout)
+        if code != 0:
+            raise RuntimeError(stderr or f"so'rov bajarilmadi: {sql}")
+
+    @staticmethod
+    def open_mysql_snapshots(dbname, count):
+        """
+        MySQL (mydumper usuli): FLUSH TABLES WITH READ LOCK ostida har bir sessiyada
+        START TRANSACTION WITH CONSISTENT SNAPSHOT ochiladi, so'ng qulf darhol yechiladi.
+        Qulf paytida yozuvlar to'xtagani uchun barcha snapshot'lar bir xil holatni ko'radi.
+        Natija: sessiyalar ro'yxati - barcha dump'lar tugaguncha yopilmasligi kerak.
+        """
+        sessions = [DBSession("mysql", dbname) for _ in range(count)]
+        lock = DBSession("mysql", dbname)
+        try:
+            # Ulanishlar qulfdan oldin ochiladi - yozuvlar imkon qadar qisqa to'xtaydi
+            for session in sessions:
+                for sql in ShardedBackup.MYSQL_SESSION:
+                    ShardedBackup._session_query(session, sql)
+            ShardedBackup._session_query(lock, "SET SESSION lock_wait_timeout = 60")
+            ShardedBackup._session_query(lock, "FLUSH TABLES WITH READ LOCK", timeout=120)
+            try:
+                for session in sessions:
+                    ShardedBackup._session_query(session, "START TRANSACTION WITH CONSISTENT SNAPSHOT")
+            finally:
+                lock.query("UNLOCK TABLES")
+        except Exception:
+            for session in sessions:
+                session.close()
+            raise
+        finally:
+            lock.close()
+        return sessions
+
+    @staticmethod
+    def _mysql_value(column):
+        """Ustun qiymatini SQL literal sifatida qaytaruvchi ifoda (NULL -> NULL so'zi)"""
+        name, kind = f"`{column['name']}`", column['type'].lower()
+        if kind == 'bit':
+            return f"IF({name} IS NULL, 'NULL', CONCAT('b''', BIN({name}), ''''))"
+        if kind in ShardedBackup.HEX_TYPES:
+            return f"IF({name} IS NULL, 'NULL', CONCAT('X''', HEX({name}), ''''))"
+        return f"QUOTE({name})"
+
+    @staticmethod
+    def dump_mysql_table(session, table, path, codec):
+        """
+        Jadval ma'lumotini worker sessiyasining snapshot'idan ko'p qatorli INSERT'lar
+        sifatida yozish (mysqldump o'z tranzaksiyasini ochgani uchun ishlatilmaydi).
+        Natija: BackupPipeline.run bilan bir xil statistika.
+        """
+        stats = {'ok': False, 'path': str(path), 'bytes_in': 0, 'bytes_written': 0, 'duration': 0.0, 'error': ''}
+        start = time.monotonic()
+        try:
+            columns, stderr, code = session.query(
+                "SELECT column_name AS name, data_type AS type FROM information_schema.columns "
+                f"WHERE table_schema = DATABASE() AND table_name = '{table}' "
+                "AND extra NOT LIKE '%VIRTUAL GENERATED%' AND extra NOT LIKE '%STORED GENERATED%' "
+                "ORDER BY ordinal_position"
+            )
+            if code != 0 or not columns:
+                raise RuntimeError(stderr or "ustunlar topilmadi")
+            values = ", ".join(ShardedBackup._mysql_value(column) for column in columns)
+            names = ", ".join(f"`{column['name']}`" for column in columns)
+            sql = f"SELECT CONCAT('(', CONCAT_WS(',', {values}), ')') AS r FROM `{table}`"
+            prefix = f"INSERT INTO `{table}` ({names}) VALUES ".encode()
+            
+            with open(path, 'wb') as raw:
+                with Codec.writer(raw, codec) as out:
+                    out.write(ShardedBackup.MYSQL_DATA_HEADER.encode())
+                    batch, size, header = [], 0, True
+                    
+                    def flush():
+                        nonlocal batch, size
+                        if batch:
+                            out.write(prefix + b",\n".join(batch) + b";\n")
+                            batch, size = [], 0
+                    
+                    def sink(value):
+                        nonlocal size, header
+                        if header:
+                            # Birinchi qator - ustun nomi
+                            header = False
+                            return
+                        row = value.encode('utf-8', 'surrogateescape')
+                        batch.append(row)
+                        size += len(row)
+                        stats['bytes_in'] += len(row)
+                        if size >= ShardedBackup.INSERT_BYTES:
+                            flush()
+                    
+                    stderr, code = session.stream(sql, sink)
+                    if code != 0:
+                        raise RuntimeError(stderr or "jadval o'qilmadi")
+                    flush()
+            stats['bytes_written'] = path.stat().st_size
+            stats['ok'] = True
+        except Exception as e:
+            stats['error'] = str(e)
+            path.unlink(missing_ok=True)
+        stats['duration'] = time.monotonic() - start
+        return stats
+
+    @staticmethod
+    def list_tables(db_type, dbname, session=None):
+        """Jadvallar va ularning hajmi (bayt), kattasi birinchi"""
+        if db_type == "mysql":
+            sql = ("SELECT table_name AS name, COALESCE(data_length + index_length, 0) AS size "
+                   f"FROM information_schema.tables WHERE table_schema = '{dbname}' AND table_type = 'BASE TABLE'")
+        else:
+            sql = ("SELECT format('%I.%I', schemaname, tablename) AS name, "
+                   "pg_total_relation_size(format('%I.%I', schemaname, tablename)::regclass) AS size "
+                   "FROM pg_tables WHERE schemaname NOT IN ('pg_catalog', 'information_schema')")
+        rows, stderr, code = ShardedBackup._query(db_type, sql, dbname, session)
+        if code != 0:
+            raise RuntimeError(stderr or "jadvallar ro'yxatini olib bo'lmadi")
+        tables = [(row['name'], int(row['size'] or 0)) for row in rows]
+        return sorted(tables, key=lambda t: t[1], reverse=True)
+
+    @staticmethod
+    def count_rows(db_type, dbname, tables, session=None):
+        """Har bir jadvaldagi aniq qatorlar soni - bitta UNION ALL so'rovi bilan (session: snapshot ichida)"""
+        if not tables:
+            return {}
+        sql = " UNION ALL ".join(
+            f"SELECT {i} AS i, COUNT(*) AS n FROM {ShardedBackup._quote(db_type, name)}"
+            for i, name in enumerate(tables)
+        )
+        rows, stderr, code = ShardedBackup._query(db_type, sql, dbname, session, timeout=3600)
+        if code != 0:
+            raise RuntimeError(stderr or "qatorlarni sanab bo'lmadi")
+        return {tables[int(row['i'])]: int(row['n']) for row in rows}
+
+    @staticmethod
+    def split_mysql_schema(sql):
+        """
+        mysqldump --no-data chiqishidan ikkilamchi indeks va FK'larni ajratish.
+        Natija: (schema, post) - post ALTER TABLE ... ADD ... so'rovlari.
+        """
+        schema, keys, constraints = [], [], []
+        table, body = None, []
+        
+        for line in sql.splitlines():
+            if table is None:
+                match = re.match(r'^CREATE TABLE `(.+?)` \($', line)
+                if match:
+                    table, body = match.group(1), []
+                schema.append(line)
+                continue
+            
+            if not line.startswith(')'):
+                body.append(line)
+                continue
+            
+            # CREATE TABLE tanasi tugadi. AUTO_INCREMENT ustuni o'zi birinchi ustun bo'lgan
+            # indeksisiz yaratilmaydi - PRIMARY KEY boshqa ustunda bo'lsa, shunday KEY qoladi
+            auto = {m.group(1) for m in map(ShardedBackup.AUTO_COLUMN.match, body) if m}
+            primary = next((ShardedBackup._first_key_column(item) for item in body
+                            if item.strip().startswith('PRIMARY KEY')), None)
+            needed = auto - {primary}
+            kept = []
+            for item in body:
+                match = ShardedBackup.KEY_LINE.match(item)
+                if match and (match.group(1) == 'CONSTRAINT' or ShardedBackup._first_key_column(item) not in needed):
+                    target = constraints if match.group(1) == 'CONSTRAINT' else keys
+                    target.append(f"ALTER TABLE `{table}` ADD {item.strip().rstrip(',')};")
+                else:
+                    kept.append(item)
+            if kept:
+                kept[-1] = kept[-1].rstrip(',')
+            schema.extend(kept)
+            schema.append(line)
+            table = None
+        
+        return "\n".join(schema) + "\n", "\n".join(keys + constraints) + "\n"
+
+    @staticmethod
+    def _first_key_column(item):
+        match = re.search(r'\(`((?:[^`]|``)+)`', item)
+        return match.group(1) if match else None
+
+    @staticmethod
+    def _write(path, text, codec):
+        with open(path, 'wb') as raw:
+            with Codec.writer(raw, codec) as out:
+                out.write(text.encode('utf-8'))
+
+    @staticmethod
+    def _dump_schema(db_type, dbname, target_dir, codec, snapshot=None):
+        ext = Codec.extension(codec)
+        if db_type == "mysql":
+            result = subprocess.run(
+                ["sudo", "mysqldump", "--no-data", "--skip-triggers", "--routines", "--events", dbname],
+                capture_output=True, text=True
+            )
+            if result.returncode != 0:
+                raise RuntimeError(result.stderr.strip() or "schema dump xatosi")
+            triggers = subprocess.run(
+                ["sudo", "mysqldump", "--no-data", "--no-create-info", "--skip-routines", "--triggers", dbname],
+                capture_output=True, text=True
+            )
+            if triggers.returncode != 0:
+                raise RuntimeError(triggers.stderr.strip() or "trigger dump xatosi")
+            schema, post = ShardedBackup.split_mysql_schema(result.stdout)
+            ShardedBackup._write(target_dir / f"schema{ext}", schema, codec)
+            ShardedBackup._write(target_dir / f"post{ext}", post + triggers.stdout, codec)
+            return
+        
+        snapshot_args = [f"--snapshot={snapshot}"] if snapshot else []
+        for section, name in (("pre-data", "schema"), ("post-data", "post")):
+            stats = BackupPipeline.run(
+                ["sudo", "-u", "postgres", "pg_dump", f"--section={section}", *snapshot_args, dbname],
+                target_dir / f"{name}{ext}", codec=codec
+            )
+            if not stats['ok']:
+                raise RuntimeError(stats['error'])
+
+    @staticmethod
+    def _pg_table_cmd(dbname, table, snapshot=None):
+        snapshot_args = [f"--snapshot={snapshot}"] if snapshot else []
+        return ["sudo", "-u", "postgres", "pg_dump", "--data-only", *snapshot_args, "-t", table, dbname]
+
+    @staticmethod
+    def backup(db_type, dbname, workers=None):
+        """
+        Jadval bo'yicha parallel dump. Natija: shard katalogi yoki None.
+        Jadvallar ro'yxati, ma'lumot va qatorlar soni bitta izchil holatdan olinadi:
+        PostgreSQL - eksport qilingan snapshot (pg_dump --snapshot), MySQL - FTWRL
+        ostida ochilgan worker snapshot'lari (open_mysql_snapshots).
+        """
+        workers = max(1, workers or int(Config.get("backup", "parallel_workers", 4) or 1))
+        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        target = BACKUP_DIR / f"{ShardedBackup._prefix(db_type)}_{dbname}_{timestamp}.shard"
+        part_dir = target.with_name(target.name + ".part")
+        codec = Codec.configured()
+        ext = Codec.extension(codec)
+        start = time.monotonic()
+        sessions, snapshot = [], None
+        
+        try:
+            if db_type == "postgresql":
+                session, snapshot = ShardedBackup.export_snapshot(dbname)
+                sessions = [session]
+            else:
+                sessions = ShardedBackup.open_mysql_snapshots(dbname, workers)
+            session = sessions[0]
+            tables = ShardedBackup.list_tables(db_type, dbname, session)
+            (part_dir / "tables").mkdir(parents=True)
+            ShardedBackup._dump_schema(db_type, dbname, part_dir, codec, snapshot)
+            
+            entries = [{'name': name, 'file': f"tables/{i:04d}_{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}{ext}",
+                        'size': size} for i, (name, size) in enumerate(tables)]
+            Logger.info(f"{dbname}: {len(entries)} ta jadval, {workers} parallel worker")
+            
+            # MySQL: har bir jadval bo'sh turgan worker snapshot sessiyasida o'qiladi
+            idle = queue.Queue()
+            for worker_session in sessions:
+                idle.put(worker_session)
+            
+            def dump(entry):
+                if db_type != "mysql":
+                    return BackupPipeline.run(ShardedBackup._pg_table_cmd(dbname, entry['name'], snapshot),
+                                              part_dir / entry['file'], None, codec)
+                worker_session = idle.get()
+                try:
+                    return ShardedBackup.dump_mysql_table(worker_session, entry['name'], part_dir / entry['file'], codec)
+                finally:
+                    idle.put(worker_session)
+            
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(dump, e): e for e in entries}
+                for done, future in enumerate(as_completed(futures), 1):
+                    entry, stats = futures[future], future.result()
+                    if not stats['ok']:
+                        raise RuntimeError(f"{entry['name']}: {stats['error']}")
+                    entry['bytes_in'] = stats['bytes_in']
+                    entry['bytes_written'] = stats['bytes_written']
+                    with BackupPipeline._print_lock:
+                        print(f"[{done}/{len(entries)}] {entry['name']}: {stats['bytes_in'] / (1024 * 1024):.2f} MB")
+            
+            # Qatorlar soni dump bilan bir xil snapshot'da: restore oxiridagi tekshiruv uchun
+            counts = ShardedBackup.count_rows(db_type, dbname, [e['name'] for e in entries], session)
+            for entry in entries:
+                entry['rows'] = counts.get(entry['name'])
+            
+            manifest = {
+                'format': ShardedBackup.FORMAT_VERSION,
+                'engine': db_type,
+                'database': dbname,
+                'created': datetime.datetime.now().isoformat(),
+                'codec': codec,
+                'schema': f"schema{ext}",
+                'post': f"post{ext}",
+                'tables': entries
+            }
+            with open(part_dir / ShardedBackup.MANIFEST, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+            part_dir.rename(target)
+        except Exception as e:
+            shutil.rmtree(part_dir, ignore_errors=True)
+            Logger.error(f"Shardli backup xatosi ({dbname}): {e}")
+            return None
+        finally:
+            for session in sessions:
+                session.close()
+        
+        total = sum(e['bytes_written'] for e in entries) / (1024 * 1024)
+        Logger.success(f"Shardli backup yaratildi: {target} ({total:.2f} MB, {time.monotonic() - start:.1f} s)")
+        return str(target)
+
+    @staticmethod
+    def _ensure_database(db_type, dbname):
+        if db_type == "mysql":
+            _, stderr, code = DatabaseManager.query("mysql", f"CREATE DATABASE IF NOT EXISTS `{dbname}`")
+        else:
+            exists = DatabaseManager.scalar(
+                "postgresql", f"SELECT COUNT(*) FROM pg_database WHERE datname = '{dbname}'"
+            )
+            stderr, code = "", 0
+            if exists == "0":
+                _, stderr, code = DatabaseManager.query("postgresql", f'CREATE DATABASE "{dbname}"')
+        if code != 0:
+            raise RuntimeError(stderr)
+
+    @staticmethod
+    def restore(shard_dir, dbname=None, workers=None):
+        """
+        Shardli backupni tiklash: schema -> jadvallar (parallel) -> indeks/FK ->
+        qatorlar sonini manifest bilan solishtirish. Natija: True/False
+        """
+        shard_dir = Path(shard_dir)
+        try:
+            with open(shard_dir / ShardedBackup.MANIFEST, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            Logger.error(f"Manifest o'qilmadi: {e}")
+            return False
+        
+        db_type = manifest['engine']
+        dbname = dbname or manifest['database']
+        workers = max(1, workers or int(Config.get("backup", "parallel_workers", 4) or 1))
+        client = ShardedBackup._client(db_type, dbname)
+        # MySQL: yuklash paytida FK va unique tekshiruvlarini o'chirish
+        data_prefix = b"SET foreign_key_checks=0; SET unique_checks=0;\n" if db_type == "mysql" else b""
+        start = time.monotonic()
+        
+        try:
+            ShardedBackup._ensure_database(db_type, dbname)
+            
+            Logger.info("Schema yuklanmoqda...")
+            stats = BackupPipeline.feed(client, shard_dir / manifest['schema'])
+            if not stats['ok']:
+                raise RuntimeError(f"schema: {stats['error']}")
+            
+            entries = sorted(manifest['tables'], key=lambda e: e.get('size', 0), reverse=True)
+            Logger.info(f"{len(entries)} ta jadval {workers} parallel worker bilan yuklanmoqda...")
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    pool.submit(BackupPipeline.feed, client, shard_dir / e['file'], data_prefix): e
+                    for e in entries
+                }
+                for done, future in enumerate(as_completed(futures), 1):
+                    entry, stats = futures[future], future.result()
+                    if not stats['ok']:
+                        raise RuntimeError(f"{entry['name']}: {stats['error']}")
+                    with BackupPipeline._print_lock:
+                        print(f"[{done}/{len(entries)}] {entry['name']}: {stats['duration']:.1f} s")
+            
+            Logger.info("Indekslar va cheklovlar yaratilmoqda...")
+            stats = BackupPipeline.feed(client, shard_dir / manifest['post'])
+            if not stats['ok']:
+                raise RuntimeError(f"post: {stats['error']}")
+            
+            counts = ShardedBackup.count_rows(db_type, dbname, [e['name'] for e in entries])
+        except Exception as e:
+            Logger.error(f"Shardli restore xatosi: {e}")
+            return False
+        
+        mismatches = [
+            {'table': e['name'], 'expected': e.get('rows'), 'actual': counts.get(e['name'])}
+            for e in entries if e.get('rows') is not None and counts.get(e['name']) != e['rows']
+        ]
+        if mismatches:
+            Logger.error("Izchillik tekshiruvi: qatorlar soni mos kelmadi")
+            UI.show_table(mismatches)
+            return False
+        
+        checked = any(e.get('rows') is not None for e in entries)
+        Logger.success(f"Restore bajarildi: {dbname} ({len(entries)} jadval, {time.monotonic() - start:.1f} s), "
+                       + ("qatorlar soni manifest bilan mos" if checked else "qatorlar soni tekshirilmadi"))
+        return True
+
+    @staticmethod
+    def choose(db_type):
+        """Mavjud shard backup'lardan birini tanlash"""
+        backups = sorted(BACKUP_DIR.glob(f"{ShardedBackup._prefix(db_type)}_*.shard"))
+        if not backups:
+            Logger.error("Shardli backup'lar topilmadi")
+            return None
+        
+        print("Mavjud shardli backup'lar:")
+        for i, path in enumerate(backups, 1):
+            print(f"{i}) {path.name}")
+        try:
+            return backups[int(UI.get_input("Tanlang", "1")) - 1]
+        except (ValueError, IndexError):
+            Logger.error("Noto'g'ri tanlov")
+            return None
+
+# ============================================================================
+# INKREMENTAL BACKUP (BINLOG / WAL POZITSIYALARI)
+# ============================================================================
+
+class IncrementalBackup:
+    """
+    To'liq backup + inkremental/differensial zanjir.
+      MySQL:      to'liq mysqldump binlog pozitsiyasini yozadi (--source-data=2),
+                  keyingi backup'lar faqat shu pozitsiyadan keyingi binlog'ni oladi.
+      PostgreSQL: pg_basebackup --incremental (PG 17+, summarize_wal=on),
+                  klaster darajasida; restore - pg_combinebackup.
+    Zanjir BACKUP_DIR/<prefix>_<db>.chain.json da saqlanadi; har bir yozuv
+    o'z ota-yozuviga (parent) ishora qiladi.
+    """
+    POSITION_RE = re.compile(rb"(?:MASTER|SOURCE)_LOG_FILE='([^']+)',\s*(?:MASTER|SOURCE)_LOG_POS=(\d+)")
+    _position_flag = None
+
+    @staticmethod
+    def chain_path(db_type, dbname):
+        if db_type == "mysql":
+            return BACKUP_DIR / f"mysql_{dbname}.chain.json"
+        return BACKUP_DIR / "postgres_cluster.chain.json"
+
+    @staticmethod
+    def load_chain(db_type, dbname):
+        try:
+            with open(IncrementalBackup.chain_path(db_type, dbname), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'engine': db_type, 'database': dbname, 'entries': []}
+
+    @staticmethod
+    def save_chain(chain):
+        path = IncrementalBackup.chain_path(chain['engine'], chain['database'])
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(chain, f, indent=2)
+        tmp.replace(path)
+
+    @staticmethod
+    def referenced_files():
+        """Zanjirlarda ishlatilayotgan fayl/kataloglar (tozalashda o'chirilmasligi uchun)"""
+        files = set()
+        for path in BACKUP_DIR.glob("*.chain.json"):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    files.update(entry['path'] for entry in json.load(f).get('entries', []))
+            except (OSError, ValueError, KeyError):
+                continue
+        return files
+
+    @staticmethod
+    def lineage(chain, index=None):
+        """Berilgan yozuvni tiklash uchun kerakli yozuvlar (to'liq backup'dan boshlab)"""
+        entries = chain['entries']
+        index = len(entries) - 1 if index is None else index
+        path = []
+        while index is not None:
+            path.append(entries[index])
+            index = entries[index]['parent']
+        return list(reversed(path))
+
+    # ------------------------------------------------------------------ MySQL
+
+    @staticmethod
+    def _mysqldump_position_flag():
+        # MySQL 8.0.26+ da --source-data, eski versiya va MariaDB da --master-data
+        if IncrementalBackup._position_flag is None:
+            result = subprocess.run(["mysqldump", "--help"], capture_output=True, text=True)
+            IncrementalBackup._position_flag = (
+                "--source-data=2" if "--source-data" in result.stdout else "--master-data=2"
+            )
+        return IncrementalBackup._position_flag
+
+    @staticmethod
+    def _read_dump_position(path):
+        with open(path, 'rb') as raw:
+            head = Codec.reader(raw).read(256 * 1024)
+        match = IncrementalBackup.POSITION_RE.search(head)
+        if not match:
+            return None
+        return {'file': match.group(1).decode(), 'pos': int(match.group(2))}
+
+    @staticmethod
+    def _mysql_binlog_status():
+        rows, stderr, code = DatabaseManager.query("mysql", "SHOW MASTER STATUS")
+        if code != 0:
+            # MySQL 8.4+
+            rows, stderr, code = DatabaseManager.query("mysql", "SHOW BINARY LOG STATUS")
+        if not rows or not rows[0].get('File'):
+            raise RuntimeError("binlog holatini olib bo'lmadi (log_bin yoqilganmi?)")
+        return {'file': rows[0]['File'], 'pos': int(rows[0]['Position'])}
+
+    @staticmethod
+    def _mysql_full(dbname, target):
+        if DatabaseManager.scalar("mysql", "SELECT @@log_bin") != "1":
+            raise RuntimeError("MySQL binlog o'chirilgan - inkremental backup uchun log_bin kerak")
+        stats = BackupPipeline.run(
+            ["sudo", "mysqldump", "--single-transaction", IncrementalBackup._mysqldump_position_flag(), dbname],
+            target
+        )
+        if not stats['ok']:
+            raise RuntimeError(stats['error'])
+        position = IncrementalBackup._read_dump_position(target)
+        if position is None:
+            raise RuntimeError("dump ichida binlog pozitsiyasi topilmadi")
+        return stats, position, position
+
+    @staticmethod
+    def _mysql_incremental(dbname, target, start):
+        # Joriy binlog yopiladi: [start, yangi fayl boshi) oralig'i to'liq va o'zgarmas
+        _, stderr, code = DatabaseManager.query("mysql", "FLUSH BINARY LOGS")
+        if code != 0:
+            raise RuntimeError(stderr)
+        # Oraliq yangi faylning birinchi hodisasi (offset 4) bilan tugaydi: FLUSH va
+        # SHOW orasida yozilgan hodisalar keyingi inkrementalga tushadi
+        end = {'file': IncrementalBackup._mysql_binlog_status()['file'], 'pos': 4}
+        
+        rows, stderr, code = DatabaseManager.query("mysql", "SHOW BINARY LOGS")
+        names = [row['Log_name'] for row in rows]
+        if start['file'] not in names:
+            raise RuntimeError(f"{start['file']} allaqachon o'chirilgan (purge) - yangi to'liq backup kerak")
+        files = names[names.index(start['file']):names.index(end['file'])]
+        
+        stats = BackupPipeline.run(
+            ["sudo", "mysqlbinlog", "--read-from-remote-server", "--host=localhost", "--user=root",
+             f"--database={dbname}", f"--start-position={start['pos']}", *files],
+            target
+        )
+        if not stats['ok']:
+            raise RuntimeError(stats['error'])
+        return stats, start, end
+
+    # ------------------------------------------------------------- PostgreSQL
+
+    @staticmethod
+    def _pg_basebackup(target, parent=None):
+        target.mkdir(parents=True)
+        shutil.chown(target, "postgres", "postgres")
+        cmd = ["sudo", "-u", "postgres", "pg_basebackup", "-D", str(target), "-c", "fast", "--no-password"]
+        if parent:
+            cmd.append(f"--incremental={Path(parent['path']) / 'backup_manifest'}")
+        
+        start = time.monotonic()
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            shutil.rmtree(target, ignore_errors=True)
+            raise RuntimeError(result.stderr.strip() or f"exit code {result.returncode}")
+        
+        with open(target / "backup_manifest", 'r', encoding='utf-8') as f:
+            ranges = json.load(f).get("WAL-Ranges", [])
+        size = sum(f.stat().st_size for f in target.rglob('*') if f.is_file())
+        stats = {'ok': True, 'path': str(target), 'bytes_written': size, 'duration': time.monotonic() - start}
+        return stats, {'lsn': ranges[0]['Start-LSN']}, {'lsn': ranges[-1]['End-LSN']}
+
+    @staticmethod
+    def _pg_check_incremental():
+        if DatabaseManager.scalar("postgresql", "SHOW summarize_wal") != "on":
+            raise RuntimeError("summarize_wal o'chirilgan (PostgreSQL 17+ da ALTER SYSTEM SET summarize_wal = on)")
+
+    # ---------------------------------------------------------------- Umumiy
+
+    @staticmethod
+    def backup(db_type, dbname=None, mode="incremental"):
+        """
+        mode: 'full' | 'incremental' (oxirgi yozuvdan) | 'differential' (oxirgi to'liqdan).
+        Zanjirda to'liq backup bo'lmasa, avtomatik to'liq backup olinadi.
+        """
+        stats = IncrementalBackup.run(db_type, dbname, mode)
+        return stats['path'] if stats['ok'] else None
+
+    @staticmethod
+    def run(db_type, dbname=None, mode="incremental"):
+        """backup() bilan bir xil, lekin BackupPipeline.run_parallel uchun statistikani qaytaradi"""
+        dbname = dbname if db_type == "mysql" else "cluster"
+        chain = IncrementalBackup.load_chain(db_type, dbname)
+        entries = chain['entries']
+        fulls = [i for i, entry in enumerate(entries) if entry['type'] == "full"]
+        if not fulls:
+            mode = "full"
+        parent = None
+        if mode == "incremental":
+            parent = len(entries) - 1
+        elif mode == "differential":
+            parent = fulls[-1]
+        
+        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        kind = {"full": "full", "incremental": "inc", "differential": "diff"}[mode]
+        started = time.monotonic()
+        try:
+            if db_type == "mysql":
+                target = BACKUP_DIR / f"mysql_{dbname}_{timestamp}.{kind}{Codec.extension()}"
+                if parent is None:
+                    stats, start, end = IncrementalBackup._mysql_full(dbname, target)
+                else:
+                    stats, start, end = IncrementalBackup._mysql_incremental(dbname, target, entries[parent]['end'])
+            else:
+                target = BACKUP_DIR / f"postgres_cluster_{timestamp}.{kind}.base"
+                if parent is not None:
+                    IncrementalBackup._pg_check_incremental()
+                stats, start, end = IncrementalBackup._pg_basebackup(
+                    target, entries[parent] if parent is not None else None
+                )
+        except Exception as e:
+            Logger.error(f"{mode} backup xatosi: {e}")
+            return {'ok': False, 'path': '', 'bytes_written': 0, 'duration': time.monotonic() - started,
+                    'error': str(e)}
+        
+        entries.append({
+            'type': mode,
+            'path': stats['path'],
+            'parent': parent,
+            'start': start,
+            'end': end,
+            'bytes': stats['bytes_written'],
+            'created': datetime.datetime.now().isoformat()
+        })
+        IncrementalBackup.save_chain(chain)
+        Logger.success(f"{mode} backup #{len(entries) - 1}: {stats['path']} "
+                       f"({stats['bytes_written'] / (1024 * 1024):.2f} MB, {stats['duration']:.1f} s)")
+        return stats
+
+    @staticmethod
+    def show_chain(db_type, dbname=None):
+        dbname = dbname if db_type == "mysql" else "cluster"
+        chain = IncrementalBackup.load_chain(db_type, dbname)
+        rows = []
+        for i, entry in enumerate(chain['entries']):
+            rows.append({
+                '#': i,
+                'type': entry['type'],
+                'parent': entry['parent'],
+                'end': entry['end'].get('lsn') or f"{entry['end'].get('file')}:{entry['end'].get('pos')}",
+                'size_mb': f"{entry['bytes'] / (1024 * 1024):.2f}",
+                'created': entry['created'][:19],
+                'file': Path(entry['path']).name
+            })
+        UI.show_table(rows, "Zanjir bo'sh")
+        return rows
+
+    @staticmethod
+    def restore(db_type, dbname=None, until=None, target_db=None, output=None):
+        """
+        Zanjirdagi ixtiyoriy nuqtani tiklash: to'liq backup + kerakli
+        inkremental/differensial yozuvlar ketma-ket qo'llanadi.
+        """
+        chain_db = dbname if db_type == "mysql" else "cluster"
+        chain = IncrementalBackup.load_chain(db_type, chain_db)
+        if not chain['entries']:
+            Logger.error("Zanjir bo'sh - avval to'liq backup oling")
+            return False
+        try:
+            steps = IncrementalBackup.lineage(chain, until)
+        except (IndexError, TypeError):
+            Logger.error(f"Zanjirda #{until} yozuv yo'q")
+            return False
+        
+        Logger.info("Tiklash yo'li: " + " -> ".join(f"{e['type']}({Path(e['path']).name})" for e in steps))
+        
+        if db_type != "mysql":
+            output = Path(output) if output else BACKUP_DIR / f"postgres_cluster_restored_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            output.mkdir(parents=True)
+            shutil.chown(output, "postgres", "postgres")
+            result = subprocess.run(
+                ["sudo", "-u", "postgres", "pg_combinebackup", *[e['path'] for e in steps], "-o", str(output)],
+                capture_output=True, text=True
+            )
+            if result.returncode != 0:
+                Logger.error(f"pg_combinebackup xatosi: {result.stderr.strip()}")
+                return False
+            data_dir = DatabaseManager.scalar("postgresql", "SHOW data_directory") or "<data_directory>"
+            Logger.success(f"Data katalog tiklandi: {output}")
+            print("Ishga tushirish uchun: postgresql'ni to'xtating, "
+                  f"{data_dir} ni {output} bilan almashtiring va qayta ishga tushiring")
+            return True
+        
+        target_db = target_db or dbname
+        if target_db != dbname and len(steps) > 1:
+            Logger.warning(f"Binlog yozuvlari `USE {dbname}` ni o'z ichiga oladi - inkremental qadamlar {dbname} ga qo'llanishi mumkin")
+        # Zanjir darajasidagi checkpoint: qayta ishga tushirilganda bajarilgan qadamlar takrorlanmaydi
+        key = hashlib.sha1(f"{chain_db}|{target_db}|{steps[-1]['path']}".encode()).hexdigest()[:12]
+        progress_file = TEMP_DIR / f"chain_{key}.json"
+        done = 0
+        if progress_file.exists():
+            with open(progress_file, 'r', encoding='utf-8') as f:
+                done = json.load(f).get('done', 0)
+            Logger.info(f"{done} ta qadam avval bajarilgan, davom ettiriladi")
+        
+        for i, entry in enumerate(steps[done:], done + 1):
+            Logger.info(f"[{i}/{len(steps)}] {entry['type']}: {Path(entry['path']).name}")
+            if not StreamingRestore.run("mysql", entry['path'], target_db, resume=True):
+                return False
+            with open(progress_file, 'w', encoding='utf-8') as f:
+                json.dump({'done': i}, f)
+        
+        progress_file.unlink(missing_ok=True)
+        Logger.success(f"{target_db} zanjirning #{chain['entries'].index(steps[-1])} nuqtasigacha tiklandi")
+        return True
+
+# ============================================================================
+# DEDUP BACKUP OMBORI (CONTENT-ADDRESSED)
+# ============================================================================
+
+class _SnapshotReader(io.RawIOBase):
+    """Dedup ombordagi backup'ni chunk'lar ketma-ketligidan oqim sifatida o'qish"""
+
+    def __init__(self, hashes):
+        self.hashes = iter(hashes)
+        self.current = b''
+        self.pos = 0
+        self.offset = 0
+
+    def readable(self):
+        return True
+
+    def tell(self):
+        return self.offset
+
+    def readinto(self, buffer):
+        while self.pos >= len(self.current):
+            digest = next(self.hashes, None)
+            if digest is None:
+                return 0
+            self.current, self.pos = DedupStore.read_chunk(digest), 0
+        size = min(len(buffer), len(self.current) - self.pos)
+        buffer[:size] = self.current[self.pos:self.pos + size]
+        self.pos += size
+        self.offset += size
+        return size
+
+class DedupStore:
+    """
+    Content-addressed backup ombori: dump oqimi kontentga bog'liq chegaralar
+    bo'yicha chunk'larga bo'linadi, har bir chunk sha256 nomi bilan bir marta
+    saqlanadi. Katalog (SQLite, CONFIG_DIR) backup manifestlari, chunk
+    refcount'lari va hajmlarni saqlaydi - ro'yxat va tozalash katalog skanisiz.
+    """
+    REPO_DIR = BACKUP_DIR / "repo"
+    CATALOG = CONFIG_DIR / "backup_catalog.db"
+    MIN_CHUNK = 256 * 1024
+    AVG_CHUNK = 1024 * 1024
+    MAX_CHUNK = 4 * 1024 * 1024
+    COMMIT_EVERY = 64
+    GC_GRACE = 3600
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS chunks (
+            hash TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            stored INTEGER NOT NULL,
+            refcount INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS backups (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            engine TEXT NOT NULL,
+            database TEXT NOT NULL,
+            created TEXT NOT NULL,
+            status TEXT NOT NULL,
+            logical_size INTEGER DEFAULT 0,
+            new_bytes INTEGER DEFAULT 0,
+            chunk_count INTEGER DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS backup_chunks (
+            backup_id INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            hash TEXT NOT NULL,
+            PRIMARY KEY (backup_id, seq)
+        );
+        CREATE INDEX IF NOT EXISTS idx_backups_created ON backups(created);
+        CREATE INDEX IF NOT EXISTS idx_backup_chunks_hash ON backup_chunks(hash);
+    """
+
+    @staticmethod
+    def connect():
+        conn = sqlite3.connect(DedupStore.CATALOG, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(DedupStore.SCHEMA)
+        return conn
+
+    @staticmethod
+    def chunk_path(digest):
+        return DedupStore.REPO_DIR / "chunks" / digest[:2] / digest
+
+    @staticmethod
+    def dump_cmd(db_type, dbname):
+        """
+        Dump buyrug'i: har bir jadval qatori alohida satrda bo'lishi kerak (split()
+        satr darajasida ishlaydi). mysqldump'ning standart extended insert'i ko'p
+        qatorni ~1 MB satrlarga jamlaydi - bitta qo'shilgan qator jadvalning
+        keyingi barcha satrlarini o'zgartirib yuborardi. pg_dump COPY formati
+        allaqachon satr boshiga bitta qator.
+        """
+        if db_type == "mysql":
+            return ["sudo", "mysqldump", "--single-transaction", "--skip-extended-insert", "--no-autocommit", dbname]
+        return ["sudo", "-u", "postgres", "pg_dump", dbname]
+
+    @staticmethod
+    def split(stream):
+        """
+        Kontentga bog'liq chunk'lash (qator darajasida): har bir qatordan keyin
+        crc32(qator) < len(qator) * 2^32 / AVG_CHUNK bo'lsa chegara qo'yiladi.
+        Chegaralar faqat mahalliy kontentga bog'liq, shuning uchun dump o'rtasiga
+        qo'shilgan qatorlar keyingi chunk'larni siljitmaydi (dump_cmd() ga qarang).
+        """
+        threshold = (1 << 32) // DedupStore.AVG_CHUNK
+        parts, size = [], 0
+        for line in iter(lambda: stream.readline(DedupStore.MAX_CHUNK), b''):
+            if size + len(line) > DedupStore.MAX_CHUNK:
+                yield b''.join(parts)
+                parts, size = [], 0
+            parts.append(line)
+            size += len(line)
+            if size >= DedupStore.MIN_CHUNK and zlib.crc32(line) < len(line) * threshold:
+                yield b''.join(parts)
+                parts, size = [], 0
+        if parts:
+            yield b''.join(parts)
+
+    @staticmethod
+    def _write_chunk(digest, data, codec):
+        """Chunk faylini yozish. Natija: (diskdagi hajm, yangi yozildimi)"""
+        path = DedupStore.chunk_path(digest)
+        try:
+            # mtime yangilanadi: parallel GC grace oralig'idagi faylga tegmaydi
+            os.utime(path)
+            return path.stat().st_size, False
+        except FileNotFoundError:
+            pass
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.part")
+        with open(tmp, 'wb') as raw:
+            with Codec.writer(raw, codec) as out:
+                out.write(data)
+        tmp.replace(path)
+        return path.stat().st_size, True
+
+    @staticmethod
+    def _record_batch(conn, backup_id, batch):
+        """Diskka yozib bo'lingan chunk'lar partiyasini katalogga bitta qisqa tranzaksiyada yozish"""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for seq, digest, size, stored in batch:
+                if not DedupStore.chunk_path(digest).exists():
+                    raise IOError(f"chunk {digest[:12]} yozilgandan keyin o'chirildi (parallel tozalash)")
+                conn.execute(
+                    "INSERT INTO chunks (hash, size, stored, refcount) VALUES (?, ?, ?, 1) "
+                    "ON CONFLICT(hash) DO UPDATE SET refcount = refcount + 1",
+                    (digest, size, stored)
+                )
+            conn.executemany("INSERT INTO backup_chunks (backup_id, seq, hash) VALUES (?, ?, ?)",
+                             [(backup_id, seq, digest) for seq, digest, _, _ in batch])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    @staticmethod
+    def read_chunk(digest):
+        with open(DedupStore.chunk_path(digest), 'rb') as raw:
+            data = Codec.reader(raw).read()
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise IOError(f"chunk {digest[:12]} buzilgan (hash mos emas)")
+        return data
+
+    @staticmethod
+    def _drop_backup(conn, backup_id):
+        conn.execute(
+            "UPDATE chunks SET refcount = refcount - "
+            "(SELECT COUNT(*) FROM backup_chunks bc WHERE bc.backup_id = ? AND bc.hash = chunks.hash) "
+            "WHERE hash IN (SELECT hash FROM backup_chunks WHERE backup_id = ?)",
+            (backup_id, backup_id)
+        )
+        conn.execute("DELETE FROM backup_chunks WHERE backup_id = ?", (backup_id,))
+        conn.execute("DELETE FROM backups WHERE id = ?", (backup_id,))
+
+    @staticmethod
+    def _collect_garbage(conn):
+        """
+        refcount = 0 bo'lgan chunk'lar va katalogda yo'q fayllarni (uzilgan backup
+        qoldiqlari) o'chirish. GC_GRACE dan yangi fayllarga tegilmaydi - ular davom
+        etayotgan backup'ga tegishli bo'lishi mumkin. Natija: bo'shatilgan bayt
+        """
+        cutoff = time.time() - DedupStore.GC_GRACE
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        freed = 0
+        for row in conn.execute("SELECT hash, stored FROM chunks WHERE refcount <= 0").fetchall():
+            path = DedupStore.chunk_path(row['hash'])
+            try:
+                if path.stat().st_mtime > cutoff:
+                    continue
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            conn.execute("DELETE FROM chunks WHERE hash = ?", (row['hash'],))
+            freed += row['stored']
+        
+        for path in (DedupStore.REPO_DIR / "chunks").glob("*/*"):
+            digest = path.name.split('.')[0]
+            if path.name == digest and conn.execute("SELECT 1 FROM chunks WHERE hash = ?", (digest,)).fetchone():
+                continue
+            try:
+                stat = path.stat()
+                if stat.st_mtime > cutoff:
+                    continue
+                path.unlink()
+                freed += stat.st_size
+            except FileNotFoundError:
+                pass
+        conn.commit()
+        return freed
+
+    @staticmethod
+    def backup(db_type, dbname):
+        """Dump'ni dedup omborga yozish. Natija: backup id yoki None"""
+        stats = DedupStore.run(db_type, dbname)
+        return stats['backup_id'] if stats['ok'] else None
+
+    @staticmethod
+    def run(db_type, dbname):
+        """backup() bilan bir xil, lekin BackupPipeline.run_parallel uchun statistikani qaytaradi"""
+        cmd = DedupStore.dump_cmd(db_type, dbname)
+        codec = Codec.configured()
+        conn = DedupStore.connect()
+        backup_id = conn.execute(
+            "INSERT INTO backups (engine, database, created, status) VALUES (?, ?, ?, 'running')",
+            (db_type, dbname, datetime.datetime.now().isoformat())
+        ).lastrowid
+        conn.commit()
+        
+        start = time.monotonic()
+        logical = new_bytes = count = 0
+        proc = None
+        try:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            errors = []
+            err_reader = threading.Thread(target=lambda: errors.append(proc.stderr.read()), daemon=True)
+            err_reader.start()
+            
+            # Chunk fayllari tranzaksiyadan tashqarida yoziladi; katalog partiyalab yangilanadi
+            batch = []
+            for seq, chunk in enumerate(DedupStore.split(proc.stdout)):
+                digest = hashlib.sha256(chunk).hexdigest()
+                stored, written = DedupStore._write_chunk(digest, chunk, codec)
+                if written:
+                    new_bytes += stored
+                batch.append((seq, digest, len(chunk), stored))
+                logical += len(chunk)
+                count += 1
+                if len(batch) >= DedupStore.COMMIT_EVERY:
+                    DedupStore._record_batch(conn, backup_id, batch)
+                    batch = []
+            if batch:
+                DedupStore._record_batch(conn, backup_id, batch)
+            
+            code = proc.wait()
+            err_reader.join(timeout=5)
+            if code != 0:
+                raise RuntimeError(b''.join(errors).decode(errors='replace').strip() or f"exit code {code}")
+            
+            conn.execute(
+                "UPDATE backups SET status = 'ok', logical_size = ?, new_bytes = ?, chunk_count = ? WHERE id = ?",
+                (logical, new_bytes, count, backup_id)
+            )
+            conn.commit()
+        except Exception as e:
+            if proc and proc.poll() is None:
+                proc.kill()
+            DedupStore._drop_backup(conn, backup_id)
+            DedupStore._collect_garbage(conn)
+            conn.close()
+            Logger.error(f"Dedup backup xatosi ({dbname}): {e}")
+            return {'ok': False, 'backup_id': None, 'path': '', 'bytes_written': 0,
+                    'duration': time.monotonic() - start, 'error': str(e)}
+        
+        conn.close()
+        mb = 1024 * 1024
+        duration = time.monotonic() - start
+        Logger.success(
+            f"Dedup backup #{backup_id}: {dbname}, {logical / mb:.2f} MB mantiqiy, "
+            f"{new_bytes / mb:.2f} MB yangi yozildi ({count} chunk, {duration:.1f} s)"
+        )
+        return {'ok': True, 'backup_id': backup_id, 'path': f"dedup:{backup_id}", 'bytes_in': logical,
+                'bytes_written': new_bytes, 'duration': duration, 'error': ''}
+
+    @staticmethod
+    @contextlib.contextmanager
+    def open_snapshot(backup_id):
+        """StreamingRestore uchun opener: (progress oqimi, o'qish oqimi, mantiqiy hajm)"""
+        conn = DedupStore.connect()
+        try:
+            row = conn.execute("SELECT logical_size FROM backups WHERE id = ? AND status = 'ok'",
+                               (backup_id,)).fetchone()
+            if row is None:
+                raise FileNotFoundError(f"dedup backup #{backup_id} topilmadi")
+            hashes = [r['hash'] for r in conn.execute(
+                "SELECT hash FROM backup_chunks WHERE backup_id = ? ORDER BY seq", (backup_id,))]
+        finally:
+            conn.close()
+        reader = _SnapshotReader(hashes)
+        yield reader, io.BufferedReader(reader, DedupStore.AVG_CHUNK), row['logical_size']
+
+    @staticmethod
+    def restore(backup_id, dbname=None, resume=True):
+        conn = DedupStore.connect()
+        row = conn.execute("SELECT engine, database FROM backups WHERE id = ?", (backup_id,)).fetchone()
+        conn.close()
+        if row is None:
+            Logger.error(f"Dedup backup #{backup_id} topilmadi")
+            return False
+        return StreamingRestore.run(
+            row['engine'], f"dedup:{backup_id}", dbname or row['database'], resume,
+            opener=lambda _: DedupStore.open_snapshot(backup_id)
+        )
+
+    @staticmethod
+    def list_backups(dbname=None):
+        conn = DedupStore.connect()
+        sql = "SELECT * FROM backups WHERE status = 'ok'"
+        params = ()
+        if dbname:
+            sql += " AND database = ?"
+            params = (dbname,)
+        rows = conn.execute(sql + " ORDER BY created", params).fetchall()
+        conn.close()
+        
+        mb = 1024 * 1024
+        table = [{
+            'id': r['id'],
+            'engine': r['engine'],
+            'database': r['database'],
+            'created': r['created'][:19],
+            'logical_mb': f"{r['logical_size'] / mb:.2f}",
+            'new_mb': f"{r['new_bytes'] / mb:.2f}",
+            'chunks': r['chunk_count']
+        } for r in rows]
+        UI.show_table(table, "Dedup omborda backup yo'q")
+        return table
+
     @staticmethod
-    def get_ip_address():
-        try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(("8.8.8.8", 80))
-            ip = s.getsockname()[0]
-            s.close()
-            return ip
-        except:
-            return "127.0.0.1"
+    def stats():
+        """Ombor hajmi: mantiqiy (barcha backup'lar) va fizik (noyob chunk'lar)"""
+        conn = DedupStore.connect()
+        logical = conn.execute("SELECT COUNT(*), COALESCE(SUM(logical_size), 0) FROM backups WHERE status = 'ok'").fetchone()
+        physical = conn.execute("SELECT COUNT(*), COALESCE(SUM(stored), 0) FROM chunks").fetchone()
+        conn.close()
+        
+        result = {
+            'backups': logical[0],
+            'logical_bytes': logical[1],
+            'chunks': physical[0],
+            'stored_bytes': physical[1],
+            'dedup_ratio': logical[1] / physical[1] if physical[1] else 0.0
+        }
+        mb = 1024 * 1024
+        print(f"Backup'lar: {result['backups']}, chunk'lar: {result['chunks']}")
+        print(f"Mantiqiy hajm: {result['logical_bytes'] / mb:.2f} MB, diskda: {result['stored_bytes'] / mb:.2f} MB, "
+              f"tejash: {result['dedup_ratio']:.1f}x")
+        return result
+
+    @staticmethod
+    def prune(days=None):
+        """
+        Retention: `days` dan eski backup'larni katalogdan o'chirish (har bir DB ning
+        eng so'nggi backup'i saqlanadi), so'ng hech kim ishlatmaydigan chunk'larni tozalash.
+        """
+        if days is None:
+            days = int(Config.get("backup", "retention_days", 7))
+        cutoff = (datetime.datetime.now() - datetime.timedelta(days=days)).isoformat()
+        stale = (datetime.datetime.now() - datetime.timedelta(days=1)).isoformat()
+        
+        conn = DedupStore.connect()
+        ids = [r['id'] for r in conn.execute(
+            "SELECT id FROM backups WHERE (status = 'ok' AND created < ? AND id NOT IN "
+            "(SELECT MAX(id) FROM backups WHERE status = 'ok' GROUP BY engine, database)) "
+            "OR (status != 'ok' AND created < ?)",
+            (cutoff, stale)
+        )]
+        for backup_id in ids:
+            DedupStore._drop_backup(conn, backup_id)
+        freed = DedupStore._collect_garbage(conn)
+        conn.close()
+        
+        Logger.success(f"{len(ids)} ta backup o'chirildi, {freed / (1024 * 1024):.2f} MB bo'shatildi")
+        return len(ids), freed
 
 # ============================================================================
 # MYSQL FUNKSIYALARI (TO'LIQ)
@@ -374,8 +2639,7 @@ class DatabaseManager:
 class MySQLManager:
     @staticmethod
     def check():
-        stdout, stderr, code = DatabaseManager.run_command("command -v mysql")
-        return code == 0
+        return shutil.which("mysql") is not None
     
     @staticmethod
     def status():
@@ -402,9 +2666,9 @@ class MySQLManager:
         print(f"\n{Colors.CYAN}{Colors.BOLD}Port:{Colors.NC}")
         print(stdout[:100])
         
-        stdout, stderr, code = DatabaseManager.run_command("sudo mysql -e \"SHOW STATUS LIKE 'Threads_connected';\" 2>/dev/null")
+        connections = DatabaseManager.scalar("mysql", "SHOW STATUS LIKE 'Threads_connected'")
         print(f"\n{Colors.CYAN}{Colors.BOLD}Faol ulanishlar:{Colors.NC}")
-        print(stdout if stdout else "Ma'lumot olish imkonsiz")
+        print(connections if connections is not None else "Ma'lumot olish imkonsiz")
     
     @staticmethod
     def list_users():
@@ -414,14 +2678,9 @@ class MySQLManager:
             Logger.error("MySQL o'rnatilmagan")
             return
         
-        stdout, stderr, code = DatabaseManager.run_command(
-            "sudo mysql -e \"SELECT User, Host, plugin FROM mysql.user ORDER BY User;\" 2>/dev/null"
-        )
+        rows, stderr, code = DatabaseManager.query("mysql", "SELECT User, Host, plugin FROM mysql.user ORDER BY User")
         print(f"{Colors.GREEN}{Colors.BOLD}Barcha foydalanuvchilar:{Colors.NC}\n")
-        if stdout:
-            print(stdout)
-        else:
-            print("Ma'lumot olish imkonsiz")
+        UI.show_table(rows, "Ma'lumot olish imkonsiz")
     
     @staticmethod
     def create_user():
@@ -446,8 +2705,7 @@ class MySQLManager:
         else:
             auth_plugin = "mysql_native_password"
         
-        cmd = f"sudo mysql -e \"CREATE USER '{username}'@'{host}' IDENTIFIED WITH {auth_plugin} BY '{password}';\" 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        _, stderr, code = DatabaseManager.query("mysql", f"CREATE USER '{username}'@'{host}' IDENTIFIED WITH {auth_plugin} BY '{password}'")
         
         if code == 0:
             Logger.success(f"Foydalanuvchi yaratildi: {username}@{host}")
@@ -461,19 +2719,16 @@ class MySQLManager:
             
             if extra_choice == "1":
                 days = UI.get_input("Parol amal qilish muddati (kun)", "30")
-                cmd = f"sudo mysql -e \"ALTER USER '{username}'@'{host}' PASSWORD EXPIRE INTERVAL {days} DAY;\" 2>/dev/null"
-                DatabaseManager.run_command(cmd)
+                DatabaseManager.query("mysql", f"ALTER USER '{username}'@'{host}' PASSWORD EXPIRE INTERVAL {days} DAY")
                 Logger.info(f"Parol muddati: {days} kun")
             elif extra_choice == "2":
-                cmd = f"sudo mysql -e \"ALTER USER '{username}'@'{host}' ACCOUNT LOCK;\" 2>/dev/null"
-                DatabaseManager.run_command(cmd)
+                DatabaseManager.query("mysql", f"ALTER USER '{username}'@'{host}' ACCOUNT LOCK")
                 Logger.info("Hisob bloklandi")
             elif extra_choice == "3":
                 queries = UI.get_input("So'rovlar limiti/soat", "0")
                 connections = UI.get_input("Ulanishlar limiti/soat", "0")
                 updates = UI.get_input("Yangilanishlar limiti/soat", "0")
-                cmd = f"sudo mysql -e \"ALTER USER '{username}'@'{host}' WITH MAX_QUERIES_PER_HOUR {queries} MAX_CONNECTIONS_PER_HOUR {connections} MAX_UPDATES_PER_HOUR {updates};\" 2>/dev/null"
-                DatabaseManager.run_command(cmd)
+                DatabaseManager.query("mysql", f"ALTER USER '{username}'@'{host}' WITH MAX_QUERIES_PER_HOUR {queries} MAX_CONNECTIONS_PER_HOUR {connections} MAX_UPDATES_PER_HOUR {updates}")
                 Logger.info("Resurs limitlari o'rnatildi")
         else:
             Logger.error("Foydalanuvchi yaratishda xatolik")
@@ -488,8 +2743,7 @@ class MySQLManager:
         host = UI.get_input("Xost")
         
         if UI.confirm_action(f"Foydalanuvchi {username}@{host} ni o'chirishni tasdiqlaysizmi?"):
-            cmd = f"sudo mysql -e \"DROP USER IF EXISTS '{username}'@'{host}'; FLUSH PRIVILEGES;\" 2>/dev/null"
-            stdout, stderr, code = DatabaseManager.run_command(cmd)
+            _, stderr, code = DatabaseManager.query("mysql", f"DROP USER IF EXISTS '{username}'@'{host}'; FLUSH PRIVILEGES")
             
             if code == 0:
                 Logger.success(f"Foydalanuvchi o'chirildi: {username}@{host}")
@@ -509,8 +2763,7 @@ class MySQLManager:
             Logger.error("Parollar mos kelmadi")
             return
         
-        cmd = f"sudo mysql -e \"ALTER USER '{username}'@'{host}' IDENTIFIED BY '{new_password}'; FLUSH PRIVILEGES;\" 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        _, stderr, code = DatabaseManager.query("mysql", f"ALTER USER '{username}'@'{host}' IDENTIFIED BY '{new_password}'; FLUSH PRIVILEGES")
         
         if code == 0:
             Logger.success("Parol o'zgartirildi")
@@ -526,9 +2779,9 @@ class MySQLManager:
         username = UI.get_input("Foydalanuvchi nomi")
         host = UI.get_input("Xost")
         
-        stdout, stderr, code = DatabaseManager.run_command("sudo mysql -e \"SHOW DATABASES;\" 2>/dev/null")
+        rows, stderr, code = DatabaseManager.query("mysql", "SHOW DATABASES")
         print(f"\n{Colors.CYAN}Ma'lumotlar bazalari:{Colors.NC}")
-        print(stdout if stdout else "Ma'lumot yo'q")
+        UI.show_table(rows)
         
         database = UI.get_input("Ma'lumotlar bazasi nomi (* - barchasi)")
         if database == "*":
@@ -561,16 +2814,14 @@ class MySQLManager:
             Logger.error("Noto'g'ri tanlov")
             return
         
-        cmd = f"sudo mysql -e \"GRANT {privileges} ON {database}.* TO '{username}'@'{host}'; FLUSH PRIVILEGES;\" 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        _, stderr, code = DatabaseManager.query("mysql", f"GRANT {privileges} ON {database}.* TO '{username}'@'{host}'; FLUSH PRIVILEGES")
         
         if code == 0:
             Logger.success(f"Ruxsatlar berildi: {privileges}")
             
-            cmd = f"sudo mysql -e \"SHOW GRANTS FOR '{username}'@'{host}';\" 2>/dev/null"
-            stdout, stderr, code = DatabaseManager.run_command(cmd)
+            rows, stderr, code = DatabaseManager.query("mysql", f"SHOW GRANTS FOR '{username}'@'{host}'")
             print(f"\n{Colors.CYAN}Yangi grantlar:{Colors.NC}")
-            print(stdout if stdout else "Ma'lumot yo'q")
+            UI.show_table(rows)
         else:
             Logger.error("Ruxsat berishda xatolik")
     
@@ -581,9 +2832,8 @@ class MySQLManager:
         username = UI.get_input("Foydalanuvchi nomi")
         host = UI.get_input("Xost")
         
-        cmd = f"sudo mysql -e \"SHOW GRANTS FOR '{username}'@'{host}';\" 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
-        print(stdout if stdout else "Ma'lumot yo'q")
+        rows, stderr, code = DatabaseManager.query("mysql", f"SHOW GRANTS FOR '{username}'@'{host}'")
+        UI.show_table(rows)
     
     @staticmethod
     def revoke_privileges():
@@ -593,15 +2843,13 @@ class MySQLManager:
         host = UI.get_input("Xost")
         database = UI.get_input("Ma'lumotlar bazasi")
         
-        cmd = f"sudo mysql -e \"SHOW GRANTS FOR '{username}'@'{host}';\" 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        rows, stderr, code = DatabaseManager.query("mysql", f"SHOW GRANTS FOR '{username}'@'{host}'")
         print(f"\n{Colors.CYAN}Mavjud grantlar:{Colors.NC}")
-        print(stdout if stdout else "Ma'lumot yo'q")
+        UI.show_table(rows)
         
         privileges = UI.get_input("Olib tashlanadigan ruxsatlar")
         
-        cmd = f"sudo mysql -e \"REVOKE {privileges} ON {database}.* FROM '{username}'@'{host}'; FLUSH PRIVILEGES;\" 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        _, stderr, code = DatabaseManager.query("mysql", f"REVOKE {privileges} ON {database}.* FROM '{username}'@'{host}'; FLUSH PRIVILEGES")
         
         if code == 0:
             Logger.success("Ruxsatlar olib tashlandi")
@@ -612,10 +2860,9 @@ class MySQLManager:
     def list_databases():
         UI.show_menu_header("MYSQL MA'LUMOTLAR BAZALARI")
         
-        cmd = "sudo mysql -e \"SHOW DATABASES;\" 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        rows, stderr, code = DatabaseManager.query("mysql", "SHOW DATABASES")
         print(f"{Colors.GREEN}{Colors.BOLD}Barcha ma'lumotlar bazalari:{Colors.NC}\n")
-        print(stdout if stdout else "Ma'lumot yo'q")
+        UI.show_table(rows)
     
     @staticmethod
     def create_database():
@@ -623,16 +2870,14 @@ class MySQLManager:
         
         dbname = UI.get_input("Ma'lumotlar bazasi nomi")
         
-        cmd = "sudo mysql -e \"SHOW CHARACTER SET;\" 2>/dev/null | head -10"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        rows, stderr, code = DatabaseManager.query("mysql", "SHOW CHARACTER SET")
         print(f"\n{Colors.CYAN}Mavjud charsetlar:{Colors.NC}")
-        print(stdout if stdout else "Ma'lumot yo'q")
+        UI.show_table(rows[:10])
         
         charset = UI.get_input("Charset", "utf8mb4")
         collation = UI.get_input("Collation", "utf8mb4_unicode_ci")
         
-        cmd = f"sudo mysql -e \"CREATE DATABASE IF NOT EXISTS {dbname} CHARACTER SET {charset} COLLATE {collation};\" 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        _, stderr, code = DatabaseManager.query("mysql", f"CREATE DATABASE IF NOT EXISTS {dbname} CHARACTER SET {charset} COLLATE {collation}")
         
         if code == 0:
             Logger.success(f"Ma'lumotlar bazasi yaratildi: {dbname}")
@@ -640,8 +2885,7 @@ class MySQLManager:
             if UI.confirm_action("Foydalanuvchiga ruxsat berilsinmi?"):
                 username = UI.get_input("Foydalanuvchi nomi")
                 host = UI.get_input("Xost", "localhost")
-                cmd = f"sudo mysql -e \"GRANT ALL PRIVILEGES ON {dbname}.* TO '{username}'@'{host}'; FLUSH PRIVILEGES;\" 2>/dev/null"
-                DatabaseManager.run_command(cmd)
+                DatabaseManager.query("mysql", f"GRANT ALL PRIVILEGES ON {dbname}.* TO '{username}'@'{host}'; FLUSH PRIVILEGES")
                 Logger.success(f"Ruxsat berildi: {username}@{host}")
         else:
             Logger.error("Ma'lumotlar bazasi yaratishda xatolik")
@@ -655,8 +2899,7 @@ class MySQLManager:
         dbname = UI.get_input("O'chiriladigan ma'lumotlar bazasi")
         
         if UI.confirm_action(f"DIQQAT! {dbname} butunlay o'chiriladi. Tasdiqlaysizmi?"):
-            cmd = f"sudo mysql -e \"DROP DATABASE {dbname};\" 2>/dev/null"
-            stdout, stderr, code = DatabaseManager.run_command(cmd)
+            _, stderr, code = DatabaseManager.query("mysql", f"DROP DATABASE {dbname}")
             
             if code == 0:
                 Logger.success(f"Ma'lumotlar bazasi o'chirildi: {dbname}")
@@ -684,38 +2927,50 @@ class MySQLManager:
         print(f"mysql -h {host} -P {port} -u {user} -p{password} {database}")
     
     @staticmethod
-    def backup(dbname=None):
+    def backup(dbname=None, limiter=None):
         if dbname is None:
             MySQLManager.list_databases()
             dbname = UI.get_input("Backup qilinadigan DB")
         
+        if Config.get("backup", "incremental", False):
+            return MySQLManager.backup_incremental(dbname)
+        if Config.get("backup", "dedup", False):
+            return DedupStore.backup("mysql", dbname)
+        
+        stats = MySQLManager.dump_database(dbname, limiter)
+        return stats['path'] if stats['ok'] else None
+    
+    @staticmethod
+    def backup_incremental(dbname=None, mode="incremental"):
+        """Binlog pozitsiyasiga asoslangan inkremental/differensial backup"""
+        if dbname is None:
+            MySQLManager.list_databases()
+            dbname = UI.get_input("Backup qilinadigan DB")
+        return IncrementalBackup.backup("mysql", dbname, mode)
+    
+    @staticmethod
+    def dump_database(dbname, limiter=None, password=None):
+        """DB ni backup qilish va statistikani qaytarish (password - oqimli shifrlash)"""
+        if password is None and Config.get("backup", "encryption", False):
+            password = StreamCipher.password()
         timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_file = BACKUP_DIR / f"mysql_{dbname}_{timestamp}.sql"
+        suffix = StreamCipher.EXTENSION if password else ""
+        backup_file = BACKUP_DIR / f"mysql_{dbname}_{timestamp}{Codec.extension()}{suffix}"
         
-        cmd = f"sudo mysqldump {dbname} > {backup_file} 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        # Dump -> siquvchi (gz/zstd/lz4) -> [shifrlash] oqimi, oraliq .sql faylsiz
+        stats = BackupPipeline.run(["sudo", "mysqldump", dbname], backup_file, limiter, password=password)
         
-        if code == 0:
-            # Compression
-            try:
-                import gzip
-                with open(backup_file, 'rb') as f_in:
-                    with gzip.open(f"{backup_file}.gz", 'wb') as f_out:
-                        f_out.writelines(f_in)
-                backup_file.unlink()
-                Logger.success(f"Backup yaratildi: {backup_file}.gz")
-                return str(backup_file) + ".gz"
-            except Exception as e:
-                Logger.error(f"Backup siqishda xatolik: {e}")
-                return str(backup_file)
+        if stats['ok']:
+            Logger.success(f"Backup yaratildi: {backup_file}")
+            BackupPipeline.report(stats)
         else:
-            Logger.error("Backup yaratishda xatolik")
-            return None
+            Logger.error(f"Backup yaratishda xatolik ({dbname}): {stats['error']}")
+        return stats
     
     @staticmethod
-    def restore(backup_file=None, dbname=None):
+    def restore(backup_file=None, dbname=None, resume=None):
         if backup_file is None:
-            backups = list(BACKUP_DIR.glob("mysql_*.sql*"))
+            backups = Codec.backup_files("mysql_*")
             if not backups:
                 Logger.error("Backup fayllar topilmadi")
                 return
@@ -735,38 +2990,66 @@ class MySQLManager:
         if dbname is None:
             dbname = UI.get_input("Restore qilinadigan DB")
         
-        try:
-            import gzip
-            if str(backup_file).endswith('.gz'):
-                with gzip.open(backup_file, 'rb') as f_in:
-                    with open(TEMP_DIR / "restore.sql", 'wb') as f_out:
-                        f_out.write(f_in.read())
-                restore_file = TEMP_DIR / "restore.sql"
-            else:
-                restore_file = backup_file
-            
-            cmd = f"sudo mysql {dbname} < {restore_file} 2>/dev/null"
-            stdout, stderr, code = DatabaseManager.run_command(cmd)
-            
-            if TEMP_DIR / "restore.sql" in restore_file:
-                (TEMP_DIR / "restore.sql").unlink()
-            
-            if code == 0:
-                Logger.success("Restore bajarildi")
-            else:
-                Logger.error(f"Restore qilishda xatolik: {stderr}")
-        except Exception as e:
-            Logger.error(f"Restore qilishda xatolik: {e}")
+        if resume is None:
+            checkpoint = StreamingRestore.load_checkpoint(backup_file, dbname)
+            resume = bool(checkpoint) and UI.confirm_action(
+                f"Oldingi restore {checkpoint['batch']}-partiyada to'xtagan. Davom ettirilsinmi?"
+            )
+        
+        # Dekompressiya client stdin'iga oqimlanadi - TEMP_DIR da oraliq fayl yo'q
+        return StreamingRestore.run("mysql", backup_file, dbname, resume)
+    
+    @staticmethod
+    def get_databases():
+        """Foydalanuvchi ma'lumotlar bazalari ro'yxati (tizim bazalarisiz)"""
+        rows, stderr, code = DatabaseManager.query("mysql", "SHOW DATABASES")
+        system_dbs = {'information_schema', 'performance_schema', 'mysql', 'sys'}
+        return [row['Database'] for row in rows if row.get('Database') not in system_dbs]
+    
+    @staticmethod
+    def get_database_sizes():
+        """DB hajmlari (data + index, bayt) - bitta so'rov bilan"""
+        rows, stderr, code = DatabaseManager.query(
+            "mysql",
+            "SELECT table_schema AS name, COALESCE(SUM(data_length + index_length), 0) AS size "
+            "FROM information_schema.tables GROUP BY table_schema"
+        )
+        sizes = {row['name']: int(row['size'] or 0) for row in rows}
+        return {db: sizes.get(db, 0) for db in MySQLManager.get_databases()}
+    
+    @staticmethod
+    def backup_sharded(dbname=None, workers=None):
+        """Katta DB ni jadval bo'yicha parallel backup qilish"""
+        if dbname is None:
+            MySQLManager.list_databases()
+            dbname = UI.get_input("Backup qilinadigan DB")
+        return ShardedBackup.backup("mysql", dbname, workers)
+    
+    @staticmethod
+    def restore_sharded(shard_dir=None, dbname=None, workers=None):
+        """Shardli backupni parallel tiklash"""
+        if shard_dir is None:
+            shard_dir = ShardedBackup.choose("mysql")
+            if shard_dir is None:
+                return False
+            dbname = UI.get_input("Restore qilinadigan DB (bo'sh - asl nomi)", "") or None
+        return ShardedBackup.restore(shard_dir, dbname, workers)
+    
+    @staticmethod
+    def backup_job(dbname, limiter=None):
+        """backup_all worker'i: backup() dagi kabi sozlamaga ko'ra inkremental zanjir, dedup ombor yoki oddiy dump"""
+        if Config.get("backup", "incremental", False):
+            return IncrementalBackup.run("mysql", dbname)
+        if Config.get("backup", "dedup", False):
+            return DedupStore.run("mysql", dbname)
+        return MySQLManager.dump_database(dbname, limiter)
     
     @staticmethod
-    def backup_all():
-        """Barcha ma'lumotlar bazalarini backup qilish"""
-        stdout, stderr, code = DatabaseManager.run_command(
-            "sudo mysql -e \"SHOW DATABASES;\" 2>/dev/null | grep -v 'Database\\|information_schema\\|performance_schema\\|mysql\\|sys'"
+    def backup_all(workers=None, bandwidth_mb=None):
+        """Barcha ma'lumotlar bazalarini parallel backup qilish (kattasi birinchi)"""
+        return BackupPipeline.run_parallel(
+            "MySQL", MySQLManager.backup_job, MySQLManager.get_database_sizes(), workers, bandwidth_mb
         )
-        for db in stdout.split('\n'):
-            if db.strip():
-                MySQLManager.backup(db.strip())
     
     @staticmethod
     def optimize_tables(dbname=None):
@@ -775,8 +3058,12 @@ class MySQLManager:
             MySQLManager.list_databases()
             dbname = UI.get_input("Optimizatsiya qilinadigan DB")
         
-        cmd = f"sudo mysql -e \"SELECT CONCAT('OPTIMIZE TABLE ', table_schema, '.', table_name, ';') FROM information_schema.tables WHERE table_schema = '{dbname}';\" 2>/dev/null | mysql"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        rows, stderr, code = DatabaseManager.query(
+            "mysql", f"SELECT table_name AS name FROM information_schema.tables WHERE table_schema = '{dbname}'"
+        )
+        if code == 0 and rows:
+            tables = ", ".join(f"`{dbname}`.`{row['name']}`" for row in rows)
+            _, stderr, code = DatabaseManager.query("mysql", f"OPTIMIZE TABLE {tables}", timeout=3600)
         
         if code == 0:
             Logger.success(f"{dbname} optimizatsiya qilindi")
@@ -786,10 +3073,9 @@ class MySQLManager:
     @staticmethod
     def analyze_slow_queries():
         """Sekin so'rovlarni tahlil qilish"""
-        cmd = "sudo mysql -e \"SELECT * FROM mysql.slow_log ORDER BY query_time DESC LIMIT 20;\" 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        rows, stderr, code = DatabaseManager.query("mysql", "SELECT * FROM mysql.slow_log ORDER BY query_time DESC LIMIT 20")
         print(f"{Colors.CYAN}Sekin so'rovlar:{Colors.NC}")
-        print(stdout if stdout else "Ma'lumot yo'q")
+        UI.show_table(rows)
 
 # ============================================================================
 # POSTGRESQL FUNKSIYALARI (TO'LIQ)
@@ -798,8 +3084,7 @@ class MySQLManager:
 class PostgreSQLManager:
     @staticmethod
     def check():
-        stdout, stderr, code = DatabaseManager.run_command("command -v psql")
-        return code == 0
+        return shutil.which("psql") is not None
     
     @staticmethod
     def status():
@@ -816,29 +3101,26 @@ class PostgreSQLManager:
                 if "Active" in line or "Loaded" in line:
                     print(line)
         
-        stdout, stderr, code = DatabaseManager.run_command("sudo -u postgres psql -c \"SELECT version();\" 2>/dev/null")
+        version = DatabaseManager.scalar("postgresql", "SELECT version()")
         print(f"\n{Colors.CYAN}{Colors.BOLD}Versiya:{Colors.NC}")
-        if stdout:
-            for line in stdout.split('\n'):
-                if "PostgreSQL" in line:
-                    print(line)
-                    break
+        if version:
+            print(version)
         
         stdout, stderr, code = DatabaseManager.run_command("sudo ss -tlnp 2>/dev/null | grep postgres || echo '5432'")
         print(f"\n{Colors.CYAN}{Colors.BOLD}Port:{Colors.NC}")
         print(stdout[:100])
         
-        stdout, stderr, code = DatabaseManager.run_command("sudo -u postgres psql -c \"SELECT count(*) as active_connections FROM pg_stat_activity;\" 2>/dev/null")
+        connections = DatabaseManager.scalar("postgresql", "SELECT count(*) AS active_connections FROM pg_stat_activity")
         print(f"\n{Colors.CYAN}{Colors.BOLD}Faol ulanishlar:{Colors.NC}")
-        print(stdout if stdout else "Ma'lumot yo'q")
+        print(connections if connections is not None else "Ma'lumot yo'q")
     
     @staticmethod
     def list_users():
         UI.show_menu_header("POSTGRESQL FOYDALANUVCHILARI")
         
-        stdout, stderr, code = DatabaseManager.run_command("sudo -u postgres psql -c \"\\du\" 2>/dev/null")
+        rows, stderr, code = DatabaseManager.query("postgresql", "\\du")
         print(f"{Colors.GREEN}{Colors.BOLD}Barcha foydalanuvchilar:{Colors.NC}\n")
-        print(stdout if stdout else "Ma'lumot yo'q")
+        UI.show_table(rows)
     
     @staticmethod
     def create_user():
@@ -874,8 +3156,7 @@ class PostgreSQLManager:
             valid_until = UI.get_input("Muddat (YYYY-MM-DD)")
             options += f" VALID UNTIL '{valid_until}'"
         
-        cmd = f"sudo -u postgres psql -c \"CREATE USER {username} WITH PASSWORD '{password}' {options};\" 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        _, stderr, code = DatabaseManager.query("postgresql", f"CREATE USER {username} WITH PASSWORD '{password}' {options}")
         
         if code == 0:
             Logger.success(f"Foydalanuvchi yaratildi: {username}")
@@ -891,8 +3172,7 @@ class PostgreSQLManager:
         username = UI.get_input("Foydalanuvchi nomi")
         
         if UI.confirm_action(f"Foydalanuvchi {username} ni o'chirishni tasdiqlaysizmi?"):
-            cmd = f"sudo -u postgres psql -c \"REASSIGN OWNED BY {username} TO postgres; DROP OWNED BY {username}; DROP USER IF EXISTS {username};\" 2>/dev/null"
-            stdout, stderr, code = DatabaseManager.run_command(cmd)
+            _, stderr, code = DatabaseManager.query("postgresql", f"REASSIGN OWNED BY {username} TO postgres; DROP OWNED BY {username}; DROP USER IF EXISTS {username}")
             
             if code == 0:
                 Logger.success(f"Foydalanuvchi o'chirildi: {username}")
@@ -911,8 +3191,7 @@ class PostgreSQLManager:
             Logger.error("Parollar mos kelmadi")
             return
         
-        cmd = f"sudo -u postgres psql -c \"ALTER USER {username} WITH PASSWORD '{new_password}';\" 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        _, stderr, code = DatabaseManager.query("postgresql", f"ALTER USER {username} WITH PASSWORD '{new_password}'")
         
         if code == 0:
             Logger.success("Parol o'zgartirildi")
@@ -955,22 +3234,18 @@ class PostgreSQLManager:
             Logger.error("Noto'g'ri tanlov")
             return
         
-        cmd = f"sudo -u postgres psql -c \"GRANT CONNECT ON DATABASE {database} TO {username};\" 2>/dev/null"
-        DatabaseManager.run_command(cmd)
+        DatabaseManager.query("postgresql", f"GRANT CONNECT ON DATABASE {database} TO {username}")
         
-        cmd = f"sudo -u postgres psql -c \"GRANT {privileges} ON ALL TABLES IN SCHEMA public TO {username};\" 2>/dev/null"
-        DatabaseManager.run_command(cmd)
+        DatabaseManager.query("postgresql", f"GRANT {privileges} ON ALL TABLES IN SCHEMA public TO {username}")
         
-        cmd = f"sudo -u postgres psql -c \"GRANT {privileges} ON ALL SEQUENCES IN SCHEMA public TO {username};\" 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        _, stderr, code = DatabaseManager.query("postgresql", f"GRANT {privileges} ON ALL SEQUENCES IN SCHEMA public TO {username}")
         
         if code == 0:
             Logger.success(f"Ruxsatlar berildi: {username}")
             
-            cmd = f"sudo -u postgres psql -c \"\\dp {database}.*\" 2>/dev/null | head -20"
-            stdout, stderr, code = DatabaseManager.run_command(cmd)
+            rows, stderr, code = DatabaseManager.query("postgresql", f"\\dp {database}.*")
             print(f"\n{Colors.CYAN}Yangi grantlar:{Colors.NC}")
-            print(stdout if stdout else "Ma'lumot yo'q")
+            UI.show_table(rows[:20])
         else:
             Logger.error("Ruxsat berishda xatolik")
     
@@ -980,13 +3255,12 @@ class PostgreSQLManager:
         
         username = UI.get_input("Foydalanuvchi nomi")
         
-        cmd = f"sudo -u postgres psql -c \"\\du {username}\" 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
-        print(stdout if stdout else "Ma'lumot yo'q")
+        rows, stderr, code = DatabaseManager.query("postgresql", f"\\du {username}")
+        UI.show_table(rows)
         
-        cmd = f"sudo -u postgres psql -c \"\\dp\" 2>/dev/null | grep {username} || echo 'Grantlar topilmadi'"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
-        print(stdout if stdout else "Grantlar topilmadi")
+        rows, stderr, code = DatabaseManager.query("postgresql", "\\dp")
+        rows = [row for row in rows if any(username in str(v) for v in row.values())]
+        UI.show_table(rows, "Grantlar topilmadi")
     
     @staticmethod
     def revoke_privileges():
@@ -995,18 +3269,16 @@ class PostgreSQLManager:
         username = UI.get_input("Foydalanuvchi nomi")
         database = UI.get_input("Ma'lumotlar bazasi")
         
-        cmd = f"sudo -u postgres psql -c \"\\dp {database}.*\" 2>/dev/null | grep {username}"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        rows, stderr, code = DatabaseManager.query("postgresql", f"\\dp {database}.*")
+        rows = [row for row in rows if any(username in str(v) for v in row.values())]
         print(f"\n{Colors.CYAN}Mavjud grantlar:{Colors.NC}")
-        print(stdout if stdout else "Ma'lumot yo'q")
+        UI.show_table(rows)
         
         privileges = UI.get_input("Olib tashlanadigan ruxsatlar")
         
-        cmd = f"sudo -u postgres psql -c \"REVOKE {privileges} ON ALL TABLES IN SCHEMA public FROM {username};\" 2>/dev/null"
-        DatabaseManager.run_command(cmd)
+        DatabaseManager.query("postgresql", f"REVOKE {privileges} ON ALL TABLES IN SCHEMA public FROM {username}")
         
-        cmd = f"sudo -u postgres psql -c \"REVOKE {privileges} ON ALL SEQUENCES IN SCHEMA public FROM {username};\" 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        _, stderr, code = DatabaseManager.query("postgresql", f"REVOKE {privileges} ON ALL SEQUENCES IN SCHEMA public FROM {username}")
         
         if code == 0:
             Logger.success("Ruxsatlar olib tashlandi")
@@ -1017,10 +3289,9 @@ class PostgreSQLManager:
     def list_databases():
         UI.show_menu_header("POSTGRESQL MA'LUMOTLAR BAZALARI")
         
-        cmd = "sudo -u postgres psql -c \"\\l+\" 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        rows, stderr, code = DatabaseManager.query("postgresql", "\\l+")
         print(f"{Colors.GREEN}{Colors.BOLD}Barcha ma'lumotlar bazalari:{Colors.NC}\n")
-        print(stdout if stdout else "Ma'lumot yo'q")
+        UI.show_table(rows)
     
     @staticmethod
     def create_database():
@@ -1044,8 +3315,7 @@ class PostgreSQLManager:
         else:
             encoding = "UTF8"
         
-        cmd = f"sudo -u postgres psql -c \"CREATE DATABASE {dbname} OWNER {owner} ENCODING '{encoding}';\" 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        _, stderr, code = DatabaseManager.query("postgresql", f"CREATE DATABASE {dbname} OWNER {owner} ENCODING '{encoding}'")
         
         if code == 0:
             Logger.success(f"Ma'lumotlar bazasi yaratildi: {dbname}")
@@ -1061,11 +3331,9 @@ class PostgreSQLManager:
         dbname = UI.get_input("O'chiriladigan ma'lumotlar bazasi")
         
         if UI.confirm_action(f"DIQQAT! {dbname} butunlay o'chiriladi. Tasdiqlaysizmi?"):
-            cmd = f"sudo -u postgres psql -c \"SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE datname = '{dbname}';\" 2>/dev/null"
-            DatabaseManager.run_command(cmd)
+            DatabaseManager.query("postgresql", f"SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE datname = '{dbname}'")
             
-            cmd = f"sudo -u postgres psql -c \"DROP DATABASE {dbname};\" 2>/dev/null"
-            stdout, stderr, code = DatabaseManager.run_command(cmd)
+            _, stderr, code = DatabaseManager.query("postgresql", f"DROP DATABASE {dbname}")
             
             if code == 0:
                 Logger.success(f"Ma'lumotlar bazasi o'chirildi: {dbname}")
@@ -1094,38 +3362,49 @@ class PostgreSQLManager:
         print(f"psql -h {host} -p {port} -U {user} -d {database}")
     
     @staticmethod
-    def backup(dbname=None):
+    def backup(dbname=None, limiter=None):
+        if Config.get("backup", "incremental", False):
+            return PostgreSQLManager.backup_incremental()
+        
         if dbname is None:
             PostgreSQLManager.list_databases()
             dbname = UI.get_input("Backup qilinadigan DB")
         
+        if Config.get("backup", "dedup", False):
+            return DedupStore.backup("postgresql", dbname)
+        
+        stats = PostgreSQLManager.dump_database(dbname, limiter)
+        return stats['path'] if stats['ok'] else None
+    
+    @staticmethod
+    def backup_incremental(mode="incremental"):
+        """WAL (LSN) ga asoslangan inkremental backup - klaster darajasida"""
+        Logger.info("PostgreSQL inkremental backup butun klaster uchun olinadi (pg_basebackup)")
+        return IncrementalBackup.backup("postgresql", None, mode)
+    
+    @staticmethod
+    def dump_database(dbname, limiter=None, password=None):
+        """DB ni backup qilish va statistikani qaytarish (password - oqimli shifrlash)"""
+        if password is None and Config.get("backup", "encryption", False):
+            password = StreamCipher.password()
         timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_file = BACKUP_DIR / f"postgres_{dbname}_{timestamp}.sql"
+        suffix = StreamCipher.EXTENSION if password else ""
+        backup_file = BACKUP_DIR / f"postgres_{dbname}_{timestamp}{Codec.extension()}{suffix}"
         
-        cmd = f"sudo -u postgres pg_dump {dbname} > {backup_file} 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        # Dump -> siquvchi (gz/zstd/lz4) -> [shifrlash] oqimi, oraliq .sql faylsiz
+        stats = BackupPipeline.run(["sudo", "-u", "postgres", "pg_dump", dbname], backup_file, limiter, password=password)
         
-        if code == 0:
-            # Compression
-            try:
-                import gzip
-                with open(backup_file, 'rb') as f_in:
-                    with gzip.open(f"{backup_file}.gz", 'wb') as f_out:
-                        f_out.writelines(f_in)
-                backup_file.unlink()
-                Logger.success(f"Backup yaratildi: {backup_file}.gz")
-                return str(backup_file) + ".gz"
-            except Exception as e:
-                Logger.error(f"Backup siqishda xatolik: {e}")
-                return str(backup_file)
+        if stats['ok']:
+            Logger.success(f"Backup yaratildi: {backup_file}")
+            BackupPipeline.report(stats)
         else:
-            Logger.error("Backup yaratishda xatolik")
-            return None
+            Logger.error(f"Backup yaratishda xatolik ({dbname}): {stats['error']}")
+        return stats
     
     @staticmethod
-    def restore(backup_file=None, dbname=None):
+    def restore(backup_file=None, dbname=None, resume=None):
         if backup_file is None:
-            backups = list(BACKUP_DIR.glob("postgres_*.sql*"))
+            backups = Codec.backup_files("postgres_*")
             if not backups:
                 Logger.error("Backup fayllar topilmadi")
                 return
@@ -1145,38 +3424,71 @@ class PostgreSQLManager:
         if dbname is None:
             dbname = UI.get_input("Restore qilinadigan DB")
         
-        try:
-            import gzip
-            if str(backup_file).endswith('.gz'):
-                with gzip.open(backup_file, 'rb') as f_in:
-                    with open(TEMP_DIR / "restore.sql", 'wb') as f_out:
-                        f_out.write(f_in.read())
-                restore_file = TEMP_DIR / "restore.sql"
-            else:
-                restore_file = backup_file
-            
-            cmd = f"sudo -u postgres psql -d {dbname} -f {restore_file} 2>/dev/null"
-            stdout, stderr, code = DatabaseManager.run_command(cmd)
-            
-            if TEMP_DIR / "restore.sql" in restore_file:
-                (TEMP_DIR / "restore.sql").unlink()
-            
-            if code == 0:
-                Logger.success("Restore bajarildi")
-            else:
-                Logger.error(f"Restore qilishda xatolik: {stderr}")
-        except Exception as e:
-            Logger.error(f"Restore qilishda xatolik: {e}")
+        if resume is None:
+            checkpoint = StreamingRestore.load_checkpoint(backup_file, dbname)
+            resume = bool(checkpoint) and UI.confirm_action(
+                f"Oldingi restore {checkpoint['batch']}-partiyada to'xtagan. Davom ettirilsinmi?"
+            )
+        
+        # Dekompressiya client stdin'iga oqimlanadi - TEMP_DIR da oraliq fayl yo'q
+        return StreamingRestore.run("postgresql", backup_file, dbname, resume)
+    
+    @staticmethod
+    def get_databases():
+        """Foydalanuvchi ma'lumotlar bazalari ro'yxati (template va postgres'siz)"""
+        rows, stderr, code = DatabaseManager.query(
+            "postgresql", "SELECT datname FROM pg_database WHERE NOT datistemplate AND datname <> 'postgres' ORDER BY datname"
+        )
+        return [row['datname'] for row in rows]
+    
+    @staticmethod
+    def get_database_sizes():
+        """DB hajmlari (bayt) - bitta so'rov bilan"""
+        rows, stderr, code = DatabaseManager.query(
+            "postgresql",
+            "SELECT datname, pg_database_size(datname) AS size FROM pg_database "
+            "WHERE NOT datistemplate AND datname <> 'postgres'"
+        )
+        return {row['datname']: int(row['size'] or 0) for row in rows}
+    
+    @staticmethod
+    def backup_sharded(dbname=None, workers=None):
+        """Katta DB ni jadval bo'yicha parallel backup qilish"""
+        if dbname is None:
+            PostgreSQLManager.list_databases()
+            dbname = UI.get_input("Backup qilinadigan DB")
+        return ShardedBackup.backup("postgresql", dbname, workers)
+    
+    @staticmethod
+    def restore_sharded(shard_dir=None, dbname=None, workers=None):
+        """Shardli backupni parallel tiklash"""
+        if shard_dir is None:
+            shard_dir = ShardedBackup.choose("postgresql")
+            if shard_dir is None:
+                return False
+            dbname = UI.get_input("Restore qilinadigan DB (bo'sh - asl nomi)", "") or None
+        return ShardedBackup.restore(shard_dir, dbname, workers)
+    
+    @staticmethod
+    def backup_job(dbname, limiter=None):
+        """backup_all worker'i: backup() dagi kabi sozlamaga ko'ra dedup ombor yoki oddiy dump"""
+        if Config.get("backup", "dedup", False):
+            return DedupStore.run("postgresql", dbname)
+        return PostgreSQLManager.dump_database(dbname, limiter)
     
     @staticmethod
-    def backup_all():
-        """Barcha ma'lumotlar bazalarini backup qilish"""
-        stdout, stderr, code = DatabaseManager.run_command(
-            "sudo -u postgres psql -c \"\\l\" 2>/dev/null | grep -v 'template\\|postgres' | awk '{print $1}' | grep -v 'List\\|Name\\|--\\|('"
+    def backup_all(workers=None, bandwidth_mb=None):
+        """Barcha ma'lumotlar bazalarini parallel backup qilish (kattasi birinchi)"""
+        sizes = PostgreSQLManager.get_database_sizes()
+        if Config.get("backup", "incremental", False):
+            # pg_basebackup klaster darajasida: DB'lar bo'yicha dump o'rniga bitta inkremental
+            return BackupPipeline.run_parallel(
+                "PostgreSQL", lambda name, limiter: IncrementalBackup.run("postgresql"),
+                {"cluster": sum(sizes.values())}, 1, bandwidth_mb
+            )
+        return BackupPipeline.run_parallel(
+            "PostgreSQL", PostgreSQLManager.backup_job, sizes, workers, bandwidth_mb
         )
-        for db in stdout.split('\n'):
-            if db.strip():
-                PostgreSQLManager.backup(db.strip())
     
     @staticmethod
     def vacuum_analyze(dbname=None):
@@ -1185,8 +3497,7 @@ class PostgreSQLManager:
             PostgreSQLManager.list_databases()
             dbname = UI.get_input("Vacuum qilinadigan DB")
         
-        cmd = f"sudo -u postgres psql -d {dbname} -c \"VACUUM ANALYZE;\" 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        _, stderr, code = DatabaseManager.query("postgresql", "VACUUM ANALYZE", dbname=dbname, timeout=3600)
         
         if code == 0:
             Logger.success(f"{dbname} vacuum analyze qilindi")
@@ -1196,24 +3507,977 @@ class PostgreSQLManager:
     @staticmethod
     def analyze_slow_queries():
         """Sekin so'rovlarni tahlil qilish"""
-        cmd = "sudo -u postgres psql -c \"SELECT query, calls, total_time, mean_time FROM pg_stat_statements ORDER BY total_time DESC LIMIT 20;\" 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        rows, stderr, code = DatabaseManager.query("postgresql", "SELECT query, calls, total_time, mean_time FROM pg_stat_statements ORDER BY total_time DESC LIMIT 20")
         print(f"{Colors.CYAN}Sekin so'rovlar:{Colors.NC}")
-        print(stdout if stdout else "Ma'lumot yo'q")
+        UI.show_table(rows)
+
+# ============================================================================
+# METRIKALAR OMBORI (SEGMENTLI TIME-SERIES)
+# ============================================================================
+
+class MetricsSchema:
+    """
+    Versiyalangan metrika sxemasi: har bir maydon turi (float/int/enum) yig'ish
+    paytida bir marta aniqlanadi. Enum maydonlar (versiya satrlari) segmentlarda
+    enums.json dagi butun kod sifatida saqlanadi.
+    """
+    VERSION = 3
+    FLOAT, INT, ENUM = 'float', 'int', 'enum'
+    TYPES = {
+        'cpu': FLOAT, 'cpu_count': INT, 'cpu_freq': FLOAT,
+        'memory_total': FLOAT, 'memory_available': FLOAT, 'memory_used': FLOAT, 'memory_percent': FLOAT,
+        'swap_total': FLOAT, 'swap_used': FLOAT, 'swap_percent': FLOAT,
+        'disk_total': FLOAT, 'disk_used': FLOAT, 'disk_free': FLOAT, 'disk_percent': FLOAT,
+        'disk_read': FLOAT, 'disk_write': FLOAT, 'net_sent': FLOAT, 'net_recv': FLOAT,
+        'processes': INT, 'load_1': FLOAT, 'load_5': FLOAT, 'load_15': FLOAT, 'users': INT,
+        'mysql_connections': INT, 'mysql_uptime': INT, 'postgresql_connections': INT,
+        'mysql_version': ENUM, 'postgresql_version': ENUM,
+        'mysql_replication_lag': FLOAT, 'postgresql_replication_lag': FLOAT,
+    }
+    LOAD_FIELDS = ('load_1', 'load_5', 'load_15')
+    ENUM_FILE = METRICS_DIR / "enums.json"
+    _enums = None
+
+    @staticmethod
+    def coerce(name, value):
+        """Bitta qiymatni sxema turiga keltirish (noma'lum/bo'sh -> None)"""
+        kind = MetricsSchema.TYPES.get(name)
+        if kind is None or value is None or value == '':
+            return None
+        if kind == MetricsSchema.ENUM:
+            return str(value).strip() or None
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            # Eski performance.log: CLI jadval matni ("Variable_name\tValue\nThreads_connected\t12")
+            match = re.search(r'(\d+)', str(value))
+            if not match:
+                return None
+            number = float(match.group(1))
+        return int(number) if kind == MetricsSchema.INT else number
+
+    @staticmethod
+    def parse(raw):
+        """Xom namuna (get_system_stats yoki eski performance.log qatori) -> turlangan namuna"""
+        values = dict(raw)
+        load_avg = values.pop('load_avg', None)
+        if load_avg:
+            values.update(zip(MetricsSchema.LOAD_FIELDS, load_avg))
+        typed = {}
+        for name in MetricsSchema.TYPES:
+            value = MetricsSchema.coerce(name, values.get(name))
+            if value is not None:
+                typed[name] = value
+        typed['schema_version'] = MetricsSchema.VERSION
+        typed['timestamp'] = values.get('timestamp') or datetime.datetime.now().isoformat()
+        return typed
+
+    @staticmethod
+    def _load_enums():
+        try:
+            with open(MetricsSchema.ENUM_FILE, 'r', encoding='utf-8') as f:
+                MetricsSchema._enums = json.load(f)
+        except (OSError, ValueError):
+            MetricsSchema._enums = {}
+        return MetricsSchema._enums
+
+    @staticmethod
+    def enum_code(name, value):
+        table = (MetricsSchema._enums or MetricsSchema._load_enums()).get(name, [])
+        if value not in table:
+            table = MetricsSchema._load_enums().setdefault(name, [])
+            if value not in table:
+                table.append(value)
+                tmp = MetricsSchema.ENUM_FILE.with_suffix(".tmp")
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(MetricsSchema._enums, f, indent=2)
+                tmp.replace(MetricsSchema.ENUM_FILE)
+        return table.index(value)
+
+    @staticmethod
+    def enum_value(name, code):
+        table = (MetricsSchema._enums or MetricsSchema._load_enums()).get(name, [])
+        if int(code) >= len(table):
+            table = MetricsSchema._load_enums().get(name, [])
+        return table[int(code)] if int(code) < len(table) else None
+
+    @staticmethod
+    def migrate_legacy_log(source=None):
+        """Eski performance.log (JSON qatorlar) tarixini segmentlarga bir martalik ko'chirish"""
+        source = Path(source) if source else PERFORMANCE_LOG
+        if not source.exists() or source.stat().st_size == 0:
+            Logger.warning(f"Ko'chiriladigan ma'lumot yo'q: {source}")
+            return 0
+        
+        Logger.warning("Migratsiya vaqtida --collector to'xtatilgan bo'lishi kerak")
+        cutoff = datetime.datetime.now() - datetime.timedelta(days=Config.get("monitoring", "retention_days", 30))
+        days, skipped = {}, 0
+        with open(source, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    raw = json.loads(line)
+                    ts = datetime.datetime.fromisoformat(raw['timestamp'])
+                except (ValueError, KeyError, TypeError):
+                    skipped += 1
+                    continue
+                if ts < cutoff:
+                    skipped += 1
+                    continue
+                days.setdefault(ts.date(), []).append(MetricsSchema.parse(raw))
+        
+        migrated = 0
+        for day, samples in sorted(days.items()):
+            start = datetime.datetime.combine(day, datetime.time())
+            existing = list(MetricsStore.read(start, start + datetime.timedelta(days=1, microseconds=-1)))
+            MetricsStore.rewrite_segment(start, existing + samples)
+            migrated += len(samples)
+        
+        if days:
+            # Faqat ko'chirilgan kunlar oralig'i - undan eski rollup tarixiga tegilmaydi
+            first, last = min(days), max(days)
+            MetricRollups.rebuild(datetime.datetime.combine(first, datetime.time()),
+                                  datetime.datetime.combine(last + datetime.timedelta(days=1), datetime.time()))
+        target = source.with_name(source.name + ".migrated")
+        source.rename(target)
+        Logger.success(f"{migrated} ta namuna ko'chirildi ({skipped} ta o'tkazib yuborildi), "
+                       f"{len(days)} ta segment; eski fayl: {target}")
+        return migrated
+
+class MetricsStore:
+    """
+    Append-only segmentli time-series ombori: har kun uchun bitta .seg fayl
+    (binar yozuvlar) va siyrak .idx vaqt indeksi. Yozish faqat oxiriga qo'shadi,
+    saqlash muddati butun segmentlarni o'chirish bilan boshqariladi.
+    """
+    DIR = METRICS_DIR
+    MAGIC = b"SDBMTS1\n"
+    RECORD = struct.Struct(">IdQ")
+    INDEX = struct.Struct(">dQ")
+    INDEX_INTERVAL = 300
+    _headers = {}
+
+    @staticmethod
+    def segment_path(day):
+        return MetricsStore.DIR / f"{day.strftime('%Y%m%d')}.seg"
+
+    @staticmethod
+    def segments(since=None, until=None):
+        """[since, until] oralig'iga tushadigan segmentlar (fayl nomidagi sana bo'yicha)"""
+        result = []
+        for path in sorted(MetricsStore.DIR.glob("*.seg")):
+            try:
+                day = datetime.datetime.strptime(path.stem, "%Y%m%d")
+            except ValueError:
+                continue
+            if since and day + datetime.timedelta(days=1) <= since:
+                continue
+            if until and day > until:
+                continue
+            result.append(path)
+        return result
+
+    @staticmethod
+    def header_bytes():
+        header = json.dumps({"version": MetricsSchema.VERSION, "fields": list(MetricsSchema.TYPES),
+                             "types": MetricsSchema.TYPES}).encode()
+        return MetricsStore.MAGIC + struct.pack(">H", len(header)) + header
+
+    @staticmethod
+    def _create_segment(path):
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MetricsStore.header_bytes())
+        return True
+
+    @staticmethod
+    def _read_header(f, path):
+        """Segment sarlavhasi: {'version', 'fields', 'types'} (v1 segmentlarda types yo'q)"""
+        magic = f.read(len(MetricsStore.MAGIC))
+        size = f.read(2)
+        if magic != MetricsStore.MAGIC or len(size) < 2:
+            return None
+        length = struct.unpack(">H", size)[0]
+        key = (str(path), os.fstat(f.fileno()).st_ino)
+        if key not in MetricsStore._headers:
+            header = json.loads(f.read(length))
+            header.setdefault('types', {})
+            MetricsStore._headers[key] = header
+        else:
+            f.seek(length, os.SEEK_CUR)
+        return MetricsStore._headers[key]
+
+    @staticmethod
+    def encode(typed, header):
+        """Turlangan namunani (bitmask, float64 qiymatlar [+ JSON qoldiq]) ko'rinishiga o'tkazish"""
+        values = {k: v for k, v in typed.items() if k not in ('timestamp', 'schema_version')}
+        mask, packed = 0, []
+        for i, name in enumerate(header['fields']):
+            value = values.pop(name, None)
+            if value is None:
+                continue
+            if header['types'].get(name) == MetricsSchema.ENUM:
+                value = MetricsSchema.enum_code(name, value)
+            packed.append(float(value))
+            mask |= 1 << i
+        payload = struct.pack(f">{len(packed)}d", *packed)
+        if values:
+            # Sarlavhada yo'q maydonlar (eski segmentga yangi sxema bilan yozilganda)
+            payload += json.dumps(values, default=str).encode()
+        return mask, payload
+
+    @staticmethod
+    def record(epoch, typed, header):
+        mask, payload = MetricsStore.encode(typed, header)
+        return MetricsStore.RECORD.pack(MetricsStore.RECORD.size - 4 + len(payload), epoch, mask) + payload
+
+    @staticmethod
+    def append(stats):
+        """Bitta namunani joriy kun segmentining oxiriga yozish"""
+        typed = stats if stats.get('schema_version') == MetricsSchema.VERSION else MetricsSchema.parse(stats)
+        ts = datetime.datetime.fromisoformat(typed['timestamp'])
+        MetricsStore.DIR.mkdir(parents=True, exist_ok=True)
+        path = MetricsStore.segment_path(ts)
+        if MetricsStore._create_segment(path):
+            MetricsStore.prune()
+            if not path.exists():
+                return False
+        with open(path, 'rb') as f:
+            header = MetricsStore._read_header(f, path)
+        if header is None:
+            Logger.error(f"Segment sarlavhasi buzilgan: {path}")
+            return False
+        epoch = ts.timestamp()
+        record = MetricsStore.record(epoch, typed, header)
+        with open(path, 'ab') as f:
+            offset = f.tell()
+            f.write(record)
+        MetricsStore._index(path.with_suffix(".idx"), epoch, offset)
+        MetricRollups.update(epoch, MetricRollups.numeric(typed))
+        AnomalyDetector.observe(typed, epoch)
+        return True
+
+    @staticmethod
+    def rewrite_segment(day, samples):
+        """Kun segmentini vaqt bo'yicha tartiblangan namunalar bilan qayta yozish (migratsiya)"""
+        MetricsStore.DIR.mkdir(parents=True, exist_ok=True)
+        path = MetricsStore.segment_path(day)
+        index_path = path.with_suffix(".idx")
+        tmp_seg, tmp_idx = path.with_name(path.name + ".new"), index_path.with_name(index_path.name + ".new")
+        header = json.loads(MetricsStore.header_bytes()[len(MetricsStore.MAGIC) + 2:])
+        last_indexed = None
+        with open(tmp_seg, 'wb') as seg, open(tmp_idx, 'wb') as idx:
+            seg.write(MetricsStore.header_bytes())
+            for typed in sorted(samples, key=lambda sample: sample['timestamp']):
+                if typed.get('schema_version') != MetricsSchema.VERSION:
+                    typed = MetricsSchema.parse(typed)
+                epoch = datetime.datetime.fromisoformat(typed['timestamp']).timestamp()
+                if last_indexed is None or epoch - last_indexed >= MetricsStore.INDEX_INTERVAL:
+                    idx.write(MetricsStore.INDEX.pack(epoch, seg.tell()))
+                    last_indexed = epoch
+                seg.write(MetricsStore.record(epoch, typed, header))
+        tmp_seg.replace(path)
+        tmp_idx.replace(index_path)
+
+    @staticmethod
+    def _index(index_path, epoch, offset):
+        """Har INDEX_INTERVAL soniyada bitta (vaqt, offset) yozuvi - faqat oxirgi yozuv o'qiladi"""
+        entry = MetricsStore.INDEX.size
+        with open(index_path, 'a+b') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell() - f.tell() % entry
+            if size:
+                f.seek(size - entry)
+                last_ts, _ = MetricsStore.INDEX.unpack(f.read(entry))
+                if epoch - last_ts < MetricsStore.INDEX_INTERVAL:
+                    return
+            f.write(MetricsStore.INDEX.pack(epoch, offset))
+
+    @staticmethod
+    def _seek_offset(index_path, epoch):
+        """Indeksdan epoch'dan oldingi eng yaqin yozuv offset'ini topish (binar qidiruv)"""
+        if not index_path.exists():
+            return None
+        data = index_path.read_bytes()
+        entry = MetricsStore.INDEX.size
+        count = len(data) // entry
+        lo, hi, found = 0, count - 1, None
+        while lo <= hi:
+            mid = (lo + hi) // 2
+            ts, offset = MetricsStore.INDEX.unpack_from(data, mid * entry)
+            if ts <= epoch:
+                found, lo = offset, mid + 1
+            else:
+                hi = mid - 1
+        return found
+
+    @staticmethod
+    def scan(since=None, until=None):
+        """[since, until] oralig'idagi (epoch, header, mask, payload) yozuvlarini o'qish"""
+        start = since.timestamp() if since else None
+        end = until.timestamp() if until else None
+        head = MetricsStore.RECORD.size
+        for path in MetricsStore.segments(since, until):
+            with open(path, 'rb', buffering=1024 * 1024) as f:
+                header = MetricsStore._read_header(f, path)
+                if header is None:
+                    continue
+                if start is not None:
+                    offset = MetricsStore._seek_offset(path.with_suffix(".idx"), start - MetricsStore.INDEX_INTERVAL)
+                    if offset:
+                        f.seek(offset)
+                while True:
+                    raw = f.read(head)
+                    if len(raw) < head:
+                        break
+                    length, epoch, mask = MetricsStore.RECORD.unpack(raw)
+                    payload = f.read(length - head + 4)
+                    if len(payload) < length - head + 4:
+                        break
+                    if start is not None and epoch < start:
+                        continue
+                    if end is not None and epoch > end:
+                        break
+                    yield epoch, header, mask, payload
+
+    @staticmethod
+    def decode(header, mask, payload):
+        """Yozuvni turlangan lug'atga ochish (int/enum sarlavhadagi types bo'yicha)"""
+        present = [name for i, name in enumerate(header['fields']) if mask >> i & 1]
+        width = len(present) * 8
+        values = {}
+        for name, value in zip(present, struct.unpack(f">{len(present)}d", payload[:width])):
+            kind = header['types'].get(name)
+            if kind == MetricsSchema.INT:
+                value = int(value)
+            elif kind == MetricsSchema.ENUM:
+                value = MetricsSchema.enum_value(name, value)
+            values[name] = value
+        if len(payload) > width:
+            values.update(json.loads(payload[width:]))
+        return values
+
+    @staticmethod
+    def read(since=None, until=None):
+        """Namunalarni turlangan lug'atlar sifatida o'qish (v1 segmentlar ham sxemaga keltiriladi)"""
+        for epoch, header, mask, payload in MetricsStore.scan(since, until):
+            values = MetricsStore.decode(header, mask, payload)
+            values['timestamp'] = datetime.datetime.fromtimestamp(epoch).isoformat()
+            yield values if header['types'] else MetricsSchema.parse(values)
+
+    @staticmethod
+    def columns(names, since=None, until=None):
+        """
+        Tanlangan metrikalarni ustunlar sifatida o'qish: {'ts': [epoch...], name: [...]}.
+        Yo'q qiymatlar None. Faqat bitmask va kerakli float'lar ochiladi.
+        """
+        result = {'ts': []}
+        result.update({name: [] for name in names})
+        plans = {}
+        for epoch, header, mask, payload in MetricsStore.scan(since, until):
+            key = (id(header), mask)
+            if key not in plans:
+                present = [name for i, name in enumerate(header['fields']) if mask >> i & 1]
+                plans[key] = (struct.Struct(f">{len(present)}d"),
+                              [(name, present.index(name) if name in present else None) for name in names])
+            layout, positions = plans[key]
+            row = layout.unpack_from(payload)
+            result['ts'].append(epoch)
+            for name, pos in positions:
+                result[name].append(row[pos] if pos is not None else None)
+        return result
+
+    @staticmethod
+    def oldest():
+        """Eng eski xom segment boshlanishi (yo'q bo'lsa None)"""
+        segments = MetricsStore.segments()
+        return datetime.datetime.strptime(segments[0].stem, "%Y%m%d") if segments else None
+
+    @staticmethod
+    def prune(retention_days=None):
+        """Saqlash muddatidan eski segmentlarni butunligicha o'chirish"""
+        if retention_days is None:
+            retention_days = Config.get("monitoring", "retention_days", 30)
+        cutoff = datetime.datetime.now() - datetime.timedelta(days=retention_days)
+        removed = 0
+        for path in MetricsStore.segments(until=cutoff - datetime.timedelta(days=1)):
+            path.unlink(missing_ok=True)
+            path.with_suffix(".idx").unlink(missing_ok=True)
+            removed += 1
+        if removed:
+            Logger.debug(f"{removed} ta eski metrika segmenti o'chirildi")
+        MetricRollups.prune()
+        return removed
+
+class QuantileSketch:
+    """
+    DDSketch: nisbiy xatosi ALPHA bilan chegaralangan, birlashtiriladigan kvantil
+    sketch. Qiymat ceil(log_gamma(x)) bucket'iga sanaladi; ikki sketch bucket
+    sanoqlarini qo'shish orqali aniq birlashadi.
+    """
+    ALPHA = 0.01
+    GAMMA = (1 + ALPHA) / (1 - ALPHA)
+    LOG_GAMMA = math.log(GAMMA)
+    MIN_VALUE = 1e-9
+    HEADER = struct.Struct(">II")
+    BIN = struct.Struct(">iI")
+
+    def __init__(self):
+        self.bins = {}
+        self.zero = 0
+        self.count = 0
+
+    def add(self, value, count=1):
+        if value <= QuantileSketch.MIN_VALUE:
+            self.zero += count
+        else:
+            key = math.ceil(math.log(value) / QuantileSketch.LOG_GAMMA)
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.count += count
+
+    def merge(self, other):
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero += other.zero
+        self.count += other.count
+        return self
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return 2 * QuantileSketch.GAMMA ** key / (QuantileSketch.GAMMA + 1)
+        return 2 * QuantileSketch.GAMMA ** max(self.bins) / (QuantileSketch.GAMMA + 1)
+
+    def to_bytes(self):
+        return QuantileSketch.HEADER.pack(self.zero, len(self.bins)) + b''.join(
+            QuantileSketch.BIN.pack(key, count) for key, count in sorted(self.bins.items()))
+
+    @staticmethod
+    def from_bytes(data):
+        sketch = QuantileSketch()
+        sketch.zero, size = QuantileSketch.HEADER.unpack_from(data)
+        for i in range(size):
+            key, count = QuantileSketch.BIN.unpack_from(data, QuantileSketch.HEADER.size + i * QuantileSketch.BIN.size)
+            sketch.bins[key] = count
+        sketch.count = sketch.zero + sum(sketch.bins.values())
+        return sketch
+
+class MetricRollups:
+    """
+    Ierarxik rollup'lar (1m/5m/1h/1d): har bir namuna kelganda joriy bucket'larning
+    count/sum/sumsq/min/max qiymatlari yangilanadi. Bucket yopilganda uning kvantil
+    sketch'i quriladi: 1m uchun xom namunalardan, yirikroqlari uchun bola bucket
+    sketch'larini birlashtirib. SQLite (WAL) da saqlanadi.
+    """
+    DB = METRICS_DIR / "rollups.db"
+    RESOLUTIONS = (60, 300, 3600, 86400)
+    RETENTION_DAYS = {60: 7, 300: 90, 3600: 730, 86400: None}
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS rollups (
+            resolution INTEGER NOT NULL,
+            metric TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            sum REAL NOT NULL,
+            min REAL NOT NULL,
+            max REAL NOT NULL,
+            p95 REAL,
+            sumsq REAL NOT NULL DEFAULT 0,
+            sketch BLOB,
+            PRIMARY KEY (resolution, metric, bucket)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_rollups_open ON rollups(resolution, bucket) WHERE p95 IS NULL;
+    """
+
+    @staticmethod
+    def connect():
+        conn = sqlite3.connect(MetricRollups.DB, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(MetricRollups.SCHEMA)
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(rollups)")}
+        if 'sketch' not in columns:
+            # Eski rollups.db: yangi ustunlar (--rollup-backfill bilan to'ldiriladi)
+            conn.execute("ALTER TABLE rollups ADD COLUMN sumsq REAL NOT NULL DEFAULT 0")
+            conn.execute("ALTER TABLE rollups ADD COLUMN sketch BLOB")
+        return conn
+
+    @staticmethod
+    def numeric(values):
+        """Rollup qilinadigan son maydonlar (enum va xizmat maydonlarisiz)"""
+        return {name: float(value) for name, value in values.items()
+                if MetricsSchema.TYPES.get(name) in (MetricsSchema.FLOAT, MetricsSchema.INT)
+                and isinstance(value, (int, float))}
+
+    @staticmethod
+    def percentile(values, q):
+        ordered = sorted(values)
+        return ordered[max(0, min(len(ordered) - 1, int(len(ordered) * q + 0.999999) - 1))]
+
+    @staticmethod
+    def update(epoch, values, conn=None, resolutions=None):
+        """Bitta namunani barcha (yoki berilgan) rezolyutsiyalardagi joriy bucket'larga qo'shish"""
+        own = conn is None
+        conn = conn or MetricRollups.connect()
+        try:
+            conn.executemany(
+                """INSERT INTO rollups (resolution, metric, bucket, count, sum, sumsq, min, max)
+                   VALUES (?, ?, ?, 1, ?, ?, ?, ?)
+                   ON CONFLICT (resolution, metric, bucket) DO UPDATE SET
+                       count = count + 1, sum = sum + excluded.sum, sumsq = sumsq + excluded.sumsq,
+                       min = MIN(min, excluded.min), max = MAX(max, excluded.max)""",
+                [(res, name, int(epoch // res * res), value, value * value, value, value)
+                 for res in (MetricRollups.RESOLUTIONS if resolutions is None else resolutions)
+                 for name, value in values.items()]
+            )
+            MetricRollups.close_buckets(conn, epoch)
+            conn.commit()
+        finally:
+            if own:
+                conn.close()
+
+    @staticmethod
+    def raw_sketches(names, start, end):
+        """[start, end) oralig'idagi xom namunalardan har bir metrika uchun sketch"""
+        raw = MetricsStore.columns(names, since=datetime.datetime.fromtimestamp(start),
+                                   until=datetime.datetime.fromtimestamp(end - 1e-6))
+        sketches = {name: QuantileSketch() for name in names}
+        for name in names:
+            for value in raw[name]:
+                if value is not None:
+                    sketches[name].add(value)
+        return sketches
+
+    @staticmethod
+    def close_buckets(conn, epoch):
+        """epoch'dan oldin tugagan bucket'larni yopish: sketch va p95 ni yozish"""
+        for level, res in enumerate(MetricRollups.RESOLUTIONS):
+            buckets = [row['bucket'] for row in conn.execute(
+                "SELECT DISTINCT bucket FROM rollups WHERE resolution = ? AND p95 IS NULL AND bucket + ? <= ?",
+                (res, res, epoch))]
+            for bucket in buckets:
+                metrics = [row['metric'] for row in conn.execute(
+                    "SELECT metric FROM rollups WHERE resolution = ? AND bucket = ?", (res, bucket))]
+                sketches = {name: QuantileSketch() for name in metrics}
+                if level:
+                    # Bola bucket'lar (oldingi rezolyutsiya) shu siklda allaqachon yopilgan
+                    for row in conn.execute(
+                        "SELECT metric, sketch FROM rollups WHERE resolution = ? AND bucket >= ? AND bucket < ? "
+                        "AND sketch IS NOT NULL", (MetricRollups.RESOLUTIONS[level - 1], bucket, bucket + res)):
+                        if row['metric'] in sketches:
+                            sketches[row['metric']].merge(QuantileSketch.from_bytes(row['sketch']))
+                if not level or not any(sketch.count for sketch in sketches.values()):
+                    sketches = MetricRollups.raw_sketches(metrics, bucket, bucket + res)
+                conn.executemany(
+                    "UPDATE rollups SET p95 = ?, sketch = ? WHERE resolution = ? AND metric = ? AND bucket = ?",
+                    [(sketch.quantile(0.95) or 0.0, sketch.to_bytes(), res, name, bucket)
+                     for name, sketch in sketches.items()]
+                )
+
+    @staticmethod
+    def summary(names, since, until=None, quantiles=(0.50, 0.95, 0.99)):
+        """
+        [since, until] oralig'i uchun count/avg/min/max/std va kvantillar. Oraliq eng
+        yirik yopilgan bucket'lar bilan qoplanadi, qolgan chetlar mayda rezolyutsiyalarga,
+        oxirida xom namunalarga tushadi - oylar bo'yicha so'rov ham millisekundlarda.
+        """
+        until = until or datetime.datetime.now()
+        totals = {name: {'count': 0, 'sum': 0.0, 'sumsq': 0.0, 'min': None, 'max': None,
+                         'sketch': QuantileSketch()} for name in names}
+        
+        def absorb(name, count, total, sumsq, low, high, sketch):
+            acc = totals[name]
+            acc['count'] += count
+            acc['sum'] += total
+            acc['sumsq'] += sumsq
+            acc['min'] = low if acc['min'] is None else min(acc['min'], low)
+            acc['max'] = high if acc['max'] is None else max(acc['max'], high)
+            acc['sketch'].merge(sketch)
+        
+        placeholders = ','.join('?' * len(names))
+        gaps = [(since.timestamp(), until.timestamp())]
+        conn = MetricRollups.connect()
+        for res in reversed(MetricRollups.RESOLUTIONS):
+            finer = []
+            for start, end in gaps:
+                first, last = math.ceil(start / res) * res, math.floor(end / res) * res
+                if first >= last:
+                    finer.append((start, end))
+                    continue
+                finer += [(start, first), (last, end)]
+                rows = conn.execute(
+                    f"SELECT * FROM rollups WHERE resolution = ? AND bucket >= ? AND bucket < ? "
+                    f"AND metric IN ({placeholders})", (res, first, last, *names)).fetchall()
+                for row in rows:
+                    if row['sketch'] is None:
+                        # Hali ochiq bucket - mayda rezolyutsiyada qoplanadi
+                        finer.append((row['bucket'], row['bucket'] + res))
+                        continue
+                    absorb(row['metric'], row['count'], row['sum'], row['sumsq'], row['min'], row['max'],
+                           QuantileSketch.from_bytes(row['sketch']))
+            gaps = sorted({gap for gap in finer if gap[1] > gap[0]})
+        conn.close()
+        
+        for start, end in gaps:
+            raw = MetricsStore.columns(names, since=datetime.datetime.fromtimestamp(start),
+                                       until=datetime.datetime.fromtimestamp(end - 1e-6))
+            for name in names:
+                values = [v for v in raw[name] if v is not None]
+                if values:
+                    sketch = QuantileSketch()
+                    for value in values:
+                        sketch.add(value)
+                    absorb(name, len(values), sum(values), sum(v * v for v in values),
+                           min(values), max(values), sketch)
+        
+        result = {}
+        for name, acc in totals.items():
+            if not acc['count']:
+                result[name] = None
+                continue
+            avg = acc['sum'] / acc['count']
+            stats = {'count': acc['count'], 'avg': avg, 'min': acc['min'], 'max': acc['max'],
+                     'std': max(acc['sumsq'] / acc['count'] - avg * avg, 0.0) ** 0.5}
+            for q in quantiles:
+                # Sketch nisbiy xatosi aniq min/max chegarasidan chiqmasin
+                stats[f"p{int(q * 100)}"] = min(max(acc['sketch'].quantile(q), acc['min']), acc['max'])
+            result[name] = stats
+        return result
+
+    @staticmethod
+    def choose(since, until, width):
+        """Oraliq va piksel kengligiga yetadigan eng yirik rezolyutsiya (0 = xom namunalar)"""
+        span = (until - since).total_seconds()
+        age_days = (datetime.datetime.now() - since).total_seconds() / 86400
+        candidates = [res for res in MetricRollups.RESOLUTIONS
+                      if MetricRollups.RETENTION_DAYS[res] is None or MetricRollups.RETENTION_DAYS[res] >= age_days]
+        fitting = [res for res in candidates if res <= span / max(width, 1)]
+        if fitting:
+            return fitting[-1]
+        if age_days <= Config.get("monitoring", "retention_days", 30):
+            return 0
+        return candidates[0] if candidates else 0
+
+    @staticmethod
+    def series(names, since, until=None, width=1400, stat='avg'):
+        """
+        Grafik/tahlil uchun seriya: {'ts': [...], name: [...], 'resolution': r}.
+        stat: avg | min | max | p95 | count. Rezolyutsiya choose() bilan tanlanadi.
+        """
+        until = until or datetime.datetime.now()
+        res = MetricRollups.choose(since, until, width)
+        if res == 0:
+            result = MetricsStore.columns(names, since, until)
+            result['resolution'] = 0
+            return result
+        
+        column = "sum / count" if stat == 'avg' else stat
+        conn = MetricRollups.connect()
+        rows = conn.execute(
+            f"SELECT bucket, metric, {column} AS value FROM rollups "
+            f"WHERE resolution = ? AND bucket >= ? AND bucket <= ? AND metric IN ({','.join('?' * len(names))}) "
+            f"ORDER BY bucket",
+            (res, int(since.timestamp() // res * res), until.timestamp(), *names)
+        ).fetchall()
+        conn.close()
+        
+        buckets = {}
+        for row in rows:
+            buckets.setdefault(row['bucket'], {})[row['metric']] = row['value']
+        result = {'ts': list(buckets), 'resolution': res}
+        for name in names:
+            result[name] = [values.get(name) for values in buckets.values()]
+        return result
+
+    @staticmethod
+    def prune():
+        conn = MetricRollups.connect()
+        now = time.time()
+        for res, days in MetricRollups.RETENTION_DAYS.items():
+            if days is not None:
+                conn.execute("DELETE FROM rollups WHERE resolution = ? AND bucket < ?", (res, now - days * 86400))
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def backfill():
+        """
+        Eski rollups.db: sketch'siz yopilgan bucket'lar uchun sumsq/sketch/p95 ni xom
+        segmentlardan to'ldirish. Faqat segmentlar to'liq qoplagan va namunalar soni
+        mos kelgan qatorlar yangilanadi - qolgan tarix o'zgarishsiz saqlanadi.
+        """
+        oldest = MetricsStore.oldest()
+        if oldest is None:
+            Logger.warning("To'ldirish uchun xom segmentlar yo'q")
+            return 0
+        conn = MetricRollups.connect()
+        pending = {}
+        for row in conn.execute(
+                "SELECT resolution, bucket, metric, count FROM rollups "
+                "WHERE sketch IS NULL AND p95 IS NOT NULL AND bucket >= ?", (oldest.timestamp(),)):
+            pending.setdefault((row['resolution'], row['bucket']), {})[row['metric']] = row['count']
+        
+        filled = skipped = 0
+        for (res, bucket), counts in sorted(pending.items()):
+            names = list(counts)
+            raw = MetricsStore.columns(names, since=datetime.datetime.fromtimestamp(bucket),
+                                       until=datetime.datetime.fromtimestamp(bucket + res - 1e-6))
+            updates = []
+            for name in names:
+                values = [v for v in raw[name] if v is not None]
+                if len(values) != counts[name]:
+                    skipped += 1
+                    continue
+                sketch = QuantileSketch()
+                for value in values:
+                    sketch.add(value)
+                updates.append((sum(v * v for v in values), sketch.to_bytes(), sketch.quantile(0.95) or 0.0,
+                                res, name, bucket))
+            conn.executemany(
+                "UPDATE rollups SET sumsq = ?, sketch = ?, p95 = ? WHERE resolution = ? AND metric = ? AND bucket = ?",
+                updates
+            )
+            conn.commit()
+            filled += len(updates)
+        conn.close()
+        Logger.success(f"{filled} ta rollup qatori to'ldirildi"
+                       + (f", {skipped} tasi xom namunalar bilan mos kelmadi (o'zgarishsiz)" if skipped else ""))
+        return filled
+
+    @staticmethod
+    def rebuild_ranges(since, until=None):
+        """
+        Har bir rezolyutsiya uchun qayta quriladigan [first, last) bucket oralig'i:
+        [since, until] tashqariga bucket chegaralarigacha kengaytiriladi, lekin eng
+        eski xom segmentdan oldin boshlangan (qisman qoplangan) bucket'ga tegilmaydi.
+        """
+        oldest = MetricsStore.oldest()
+        if oldest is None:
+            return {}
+        raw_start = oldest.timestamp()
+        start = max(since.timestamp(), raw_start) if since else raw_start
+        ranges = {}
+        for res in MetricRollups.RESOLUTIONS:
+            first = math.floor(start / res) * res
+            if first < raw_start:
+                first += res
+            last = math.ceil(until.timestamp() / res) * res if until else math.inf
+            if first < last:
+                ranges[res] = (first, last)
+        return ranges
+
+    @staticmethod
+    def rebuild(since=None, until=None):
+        """
+        Rollup'larni xom segmentlardan qaytadan qurish (standart: barcha segmentlar).
+        Faqat rebuild_ranges() dagi bucket'lar o'chiriladi - segmentlar saqlanish
+        muddatidan eski 5m/1h/1d tarixi saqlanib qoladi.
+        """
+        ranges = MetricRollups.rebuild_ranges(since, until)
+        if not ranges:
+            Logger.warning("Qayta qurish uchun xom segmentlar yo'q")
+            return 0
+        conn = MetricRollups.connect()
+        for res, (first, last) in ranges.items():
+            conn.execute("DELETE FROM rollups WHERE resolution = ? AND bucket >= ? AND bucket < ?",
+                         (res, first, min(last, 2 ** 62)))
+        begin = min(first for first, _ in ranges.values())
+        end = max(last for _, last in ranges.values())
+        count = 0
+        for epoch, header, mask, payload in MetricsStore.scan(
+                datetime.datetime.fromtimestamp(begin),
+                datetime.datetime.fromtimestamp(end - 1e-6) if end != math.inf else None):
+            resolutions = [res for res, (first, last) in ranges.items() if first <= epoch < last]
+            if resolutions:
+                MetricRollups.update(epoch, MetricRollups.numeric(MetricsStore.decode(header, mask, payload)),
+                                     conn, resolutions)
+                count += 1
+        conn.commit()
+        conn.close()
+        Logger.success(f"Rollup'lar qayta qurildi: {count} ta namuna "
+                       f"({datetime.datetime.fromtimestamp(begin):%Y-%m-%d %H:%M} dan)")
+        return count
+
+class AnomalyDetector:
+    """
+    Onlayn anomaliya detektori: har bir metrika uchun EWMA o'rtacha va EWMVar
+    dispersiya holati saqlanadi, har yangi namuna bitta vektorli o'tishda
+    baholanadi va |z| > threshold bo'lsa darhol ALERT_LOG ga yoziladi.
+    Disk I/O va tarmoq kumulyativ hisoblagichlardan tezlik (MB/s) sifatida olinadi.
+    """
+    STATE_FILE = METRICS_DIR / "anomaly_state.json"
+    # metrika -> minimal standart og'ish (shovqinni anomaliya deb olmaslik uchun)
+    METRICS = {
+        'cpu': 2.0,
+        'memory_percent': 1.0,
+        'disk_read_rate': 0.5,
+        'disk_write_rate': 0.5,
+        'net_sent_rate': 0.5,
+        'net_recv_rate': 0.5,
+        'mysql_connections': 2.0,
+        'postgresql_connections': 2.0,
+        'mysql_replication_lag': 5.0,
+        'postgresql_replication_lag': 5.0,
+    }
+    COUNTERS = {
+        'disk_read_rate': 'disk_read',
+        'disk_write_rate': 'disk_write',
+        'net_sent_rate': 'net_sent',
+        'net_recv_rate': 'net_recv',
+    }
+
+    @staticmethod
+    def settings():
+        configured = Config.get("monitoring", "anomaly", {}) or {}
+        return (float(configured.get("alpha", 0.05)), float(configured.get("threshold", 4.0)),
+                int(configured.get("warmup", 30)))
+
+    @staticmethod
+    def load_state():
+        size = len(AnomalyDetector.METRICS)
+        try:
+            with open(AnomalyDetector.STATE_FILE, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get('metrics') == list(AnomalyDetector.METRICS):
+                return state
+        except (OSError, ValueError):
+            pass
+        return {'metrics': list(AnomalyDetector.METRICS), 'mean': [0.0] * size, 'var': [0.0] * size,
+                'count': [0] * size, 'counters': {}, 'last_ts': None}
+
+    @staticmethod
+    def save_state(state):
+        tmp = AnomalyDetector.STATE_FILE.with_suffix(".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        tmp.replace(AnomalyDetector.STATE_FILE)
+
+    @staticmethod
+    def vector(sample, epoch, state):
+        """Namunadan metrikalar vektori (yo'q qiymat -> NaN); hisoblagichlar tezlikka aylanadi"""
+        dt = epoch - state['last_ts'] if state['last_ts'] else 0
+        values = []
+        for name in AnomalyDetector.METRICS:
+            source = AnomalyDetector.COUNTERS.get(name)
+            if source is None:
+                value = sample.get(name)
+                values.append(float(value) if value is not None else math.nan)
+                continue
+            current, previous = sample.get(source), state['counters'].get(source)
+            if current is not None:
+                state['counters'][source] = current
+            if current is None or previous is None or dt <= 0 or current < previous:
+                values.append(math.nan)
+            else:
+                values.append((current - previous) / dt)
+        state['last_ts'] = epoch
+        return values
+
+    @staticmethod
+    def step(state, values, alpha, threshold, warmup):
+        """Barcha metrikalar uchun bitta o'tish: z-ballar va holatni yangilash"""
+        floors = list(AnomalyDetector.METRICS.values())
+        if NUMPY_AVAILABLE:
+            np = OptionalDeps.load("numpy")
+            x = np.array(values, dtype=float)
+            mean, var = np.array(state['mean']), np.array(state['var'])
+            count = np.array(state['count'])
+            valid = ~np.isnan(x)
+            first = valid & (count == 0)
+            mean = np.where(first, x, mean)
+            diff = np.where(valid, x - mean, 0.0)
+            z = np.abs(diff) / np.maximum(np.sqrt(var), floors)
+            flagged = valid & (count >= warmup) & (z > threshold)
+            increment = alpha * diff
+            state['mean'] = (mean + increment).tolist()
+            state['var'] = np.where(valid & ~first, (1 - alpha) * (var + diff * increment), var).tolist()
+            state['count'] = (count + valid).tolist()
+            return [(i, float(z[i]), float(diff[i])) for i in np.flatnonzero(flagged)]
+        
+        flagged = []
+        for i, x in enumerate(values):
+            if math.isnan(x):
+                continue
+            if state['count'][i] == 0:
+                state['mean'][i] = x
+            diff = x - state['mean'][i]
+            z = abs(diff) / max(math.sqrt(state['var'][i]), floors[i])
+            if state['count'][i] >= warmup and z > threshold:
+                flagged.append((i, z, diff))
+            increment = alpha * diff
+            state['mean'][i] += increment
+            if state['count'][i]:
+                state['var'][i] = (1 - alpha) * (state['var'][i] + diff * increment)
+            state['count'][i] += 1
+        return flagged
+
+    @staticmethod
+    def observe(sample, epoch, state=None, emit=True):
+        """Yangi namunani baholash; topilgan anomaliyalar ro'yxatini qaytaradi"""
+        own = state is None
+        state = state or AnomalyDetector.load_state()
+        alpha, threshold, warmup = AnomalyDetector.settings()
+        values = AnomalyDetector.vector(sample, epoch, state)
+        baseline = list(state['mean']), [math.sqrt(v) for v in state['var']]
+        anomalies = []
+        for i, z, diff in AnomalyDetector.step(state, values, alpha, threshold, warmup):
+            anomalies.append({
+                'metric': list(AnomalyDetector.METRICS)[i],
+                'value': values[i],
+                'expected': baseline[0][i],
+                'std': baseline[1][i],
+                'z': z,
+                'direction': 'yuqori' if diff > 0 else 'past',
+                'timestamp': datetime.datetime.fromtimestamp(epoch).isoformat(),
+            })
+        if emit:
+            for a in anomalies:
+                Logger.alert(f"ANOMALIYA {a['metric']}: {a['value']:.2f} ({a['direction']}, "
+                             f"kutilgan {a['expected']:.2f} ± {a['std']:.2f}, z={a['z']:.1f})")
+        if own:
+            AnomalyDetector.save_state(state)
+        return anomalies
+
+    @staticmethod
+    def replay(since):
+        """Saqlangan namunalarni onlayn detektor orqali o'tkazish (holat bo'sh bo'lganda)"""
+        state = AnomalyDetector.load_state()
+        anomalies = []
+        for sample in MetricsStore.read(since=since):
+            epoch = datetime.datetime.fromisoformat(sample['timestamp']).timestamp()
+            anomalies += AnomalyDetector.observe(sample, epoch, state, emit=False)
+        AnomalyDetector.save_state(state)
+        return anomalies
 
 # ============================================================================
 # ADVANCED FEATURES - MONITORING VA ANALYTICS
 # ============================================================================
 
 class MonitoringManager:
+    SNAPSHOT_FILE = METRICS_DIR / "latest.json"
+    _cpu_primed = False
+    
     @staticmethod
-    def get_system_stats():
-        """Tizim statistikasini olish"""
+    def collect_os():
+        """OS metrikalari (bloklamaydi: CPU oldingi chaqiruvdan beri delta sifatida)"""
         stats = {}
         
         if PSUTIL_AVAILABLE:
-            # CPU
-            stats['cpu'] = psutil.cpu_percent(interval=1)
+            # CPU: birinchi chaqiruv hisoblagichni boshlaydi, keyingilari kutmaydi
+            if not MonitoringManager._cpu_primed:
+                psutil.cpu_percent(interval=None)
+                MonitoringManager._cpu_primed = True
+                time.sleep(0.1)
+            stats['cpu'] = psutil.cpu_percent(interval=None)
             stats['cpu_count'] = psutil.cpu_count()
             
             # CPU frequency
@@ -1256,42 +4520,89 @@ class MonitoringManager:
             stats['processes'] = len(psutil.pids())
             
             # Load average
-            stats['load_avg'] = psutil.getloadavg()
+            stats.update(zip(MetricsSchema.LOAD_FIELDS, psutil.getloadavg()))
             
             # Users
             stats['users'] = len(psutil.users())
         
-        # Database stats
+        return stats
+    
+    @staticmethod
+    def collect_mysql():
+        """MySQL metrikalari"""
+        stats = {}
         if MySQLManager.check():
-            stdout, _, _ = DatabaseManager.run_command(
-                "sudo mysql -e \"SHOW STATUS LIKE 'Threads_connected';\" 2>/dev/null"
+            rows, _, _ = DatabaseManager.query(
+                "mysql", "SHOW GLOBAL STATUS WHERE Variable_name IN ('Threads_connected', 'Uptime')"
             )
-            stats['mysql_connections'] = stdout
+            status = {row['Variable_name']: row['Value'] for row in rows}
+            stats['mysql_connections'] = MetricsSchema.coerce('mysql_connections', status.get('Threads_connected'))
             
             # MySQL version
-            stdout, _, _ = DatabaseManager.run_command("mysql --version 2>/dev/null")
-            stats['mysql_version'] = stdout
+            stats['mysql_version'] = MetricsSchema.coerce('mysql_version', DatabaseManager.scalar("mysql", "SELECT VERSION()"))
             
             # MySQL uptime
-            stdout, _, _ = DatabaseManager.run_command(
-                "sudo mysql -e \"SHOW STATUS LIKE 'Uptime';\" 2>/dev/null"
-            )
-            stats['mysql_uptime'] = stdout
+            stats['mysql_uptime'] = MetricsSchema.coerce('mysql_uptime', status.get('Uptime'))
+            
+            # Replikatsiya kechikishi (faqat replica sozlangan bo'lsa)
+            replica, _, _ = DatabaseManager.query("mysql", "SHOW SLAVE STATUS")
+            if replica:
+                stats['mysql_replication_lag'] = MetricsSchema.coerce(
+                    'mysql_replication_lag', replica[0].get('Seconds_Behind_Master'))
         
+        return stats
+    
+    @staticmethod
+    def collect_postgresql():
+        """PostgreSQL metrikalari"""
+        stats = {}
         if PostgreSQLManager.check():
-            stdout, _, _ = DatabaseManager.run_command(
-                "sudo -u postgres psql -c \"SELECT count(*) FROM pg_stat_activity;\" 2>/dev/null"
+            rows, _, code = DatabaseManager.query(
+                "postgresql",
+                "SELECT (SELECT count(*) FROM pg_stat_activity) AS connections, version() AS version, "
+                "CASE WHEN pg_is_in_recovery() THEN EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) "
+                "END AS replication_lag"
             )
-            stats['postgresql_connections'] = stdout
-            
-            # PostgreSQL version
-            stdout, _, _ = DatabaseManager.run_command("psql --version 2>/dev/null")
-            stats['postgresql_version'] = stdout
+            row = rows[0] if code == 0 and rows else {}
+            stats['postgresql_connections'] = MetricsSchema.coerce('postgresql_connections', row.get('connections'))
+            stats['postgresql_version'] = MetricsSchema.coerce('postgresql_version', row.get('version'))
+            stats['postgresql_replication_lag'] = MetricsSchema.coerce(
+                'postgresql_replication_lag', row.get('replication_lag'))
+        
+        return stats
+    
+    @staticmethod
+    def get_system_stats():
+        """Tizim statistikasini olish (bir martalik namuna)"""
+        stats = MonitoringManager.collect_os()
+        stats.update(MonitoringManager.collect_mysql())
+        stats.update(MonitoringManager.collect_postgresql())
         
         # Timestamp
         stats['timestamp'] = datetime.datetime.now().isoformat()
         
-        return stats
+        return MetricsSchema.parse(stats)
+    
+    @staticmethod
+    def publish_snapshot(stats):
+        """Oxirgi namunani boshqa jarayonlar uchun atomar yozish"""
+        tmp = MonitoringManager.SNAPSHOT_FILE.with_suffix(".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, default=str)
+        tmp.replace(MonitoringManager.SNAPSHOT_FILE)
+    
+    @staticmethod
+    def latest_stats(max_age=None):
+        """Kollektor yozgan oxirgi namuna; yo'q yoki eskirgan bo'lsa None"""
+        if max_age is None:
+            max_age = 3 * max(MetricsCollector.intervals().values())
+        try:
+            with open(MonitoringManager.SNAPSHOT_FILE, 'r', encoding='utf-8') as f:
+                stats = json.load(f)
+            age = (datetime.datetime.now() - datetime.datetime.fromisoformat(stats['timestamp'])).total_seconds()
+        except (OSError, ValueError, KeyError):
+            return None
+        return stats if age <= max_age else None
     
     @staticmethod
     def monitor_realtime():
@@ -1300,10 +4611,15 @@ class MonitoringManager:
             Logger.error("psutil kutubxonasi o'rnatilmagan. 'pip3 install psutil'")
             return
         
+        interval = Config.get("monitoring", "interval", 60)
+        next_save = time.monotonic() + interval
+        
         try:
             while True:
+                # Kollektor ishlayotgan bo'lsa uning namunasini o'qish, aks holda o'zimiz olamiz
+                snapshot = MonitoringManager.latest_stats()
+                stats = snapshot or MonitoringManager.get_system_stats()
                 os.system('clear')
-                stats = MonitoringManager.get_system_stats()
                 
                 print(f"{Colors.CYAN}{Colors.BOLD}╔══════════════════════════════════════════════════════════════╗{Colors.NC}")
                 print(f"{Colors.CYAN}{Colors.BOLD}║              REAL-TIME MONITORING (Ctrl+C chiqish)            ║{Colors.NC}")
@@ -1317,8 +4633,8 @@ class MonitoringManager:
                 print(f"    Cores: {stats['cpu_count']}")
                 if 'cpu_freq' in stats:
                     print(f"    Frequency: {stats['cpu_freq']:.0f} MHz")
-                if 'load_avg' in stats:
-                    print(f"    Load Avg: {stats['load_avg'][0]:.2f}, {stats['load_avg'][1]:.2f}, {stats['load_avg'][2]:.2f}")
+                if 'load_1' in stats:
+                    print(f"    Load Avg: {stats['load_1']:.2f}, {stats['load_5']:.2f}, {stats['load_15']:.2f}")
                 
                 # Memory
                 mem_bar = "█" * int(min(stats['memory_percent'] / 2, 50))
@@ -1354,14 +4670,10 @@ class MonitoringManager:
                 
                 # Database
                 print(f"\n{Colors.GREEN}Database:{Colors.NC}")
-                if 'mysql_connections' in stats and stats['mysql_connections']:
-                    mysql_val = re.search(r'(\d+)', str(stats['mysql_connections']))
-                    mysql_conn = mysql_val.group(1) if mysql_val else 'N/A'
-                    print(f"    MySQL: {mysql_conn} connections")
-                if 'postgresql_connections' in stats and stats['postgresql_connections']:
-                    pg_val = re.search(r'(\d+)', str(stats['postgresql_connections']))
-                    pg_conn = pg_val.group(1) if pg_val else 'N/A'
-                    print(f"    PostgreSQL: {pg_conn} connections")
+                if 'mysql_connections' in stats:
+                    print(f"    MySQL: {stats['mysql_connections']} connections")
+                if 'postgresql_connections' in stats:
+                    print(f"    PostgreSQL: {stats['postgresql_connections']} connections")
                 
                 # Processes & Users
                 print(f"\n{Colors.GREEN}System:{Colors.NC}")
@@ -1375,9 +4687,10 @@ class MonitoringManager:
                 # Har 2 sekundda yangilash
                 time.sleep(2)
                 
-                # Performans ma'lumotlarini saqlash
-                if int(time.time()) % 60 == 0:  # Har daqiqada
-                    MonitoringManager.save_performance_data()
+                # Performans ma'lumotlarini saqlash (kollektor yo'q bo'lsa, har interval'da)
+                if snapshot is None and time.monotonic() >= next_save:
+                    MetricsStore.append(stats)
+                    next_save += interval * (int((time.monotonic() - next_save) // interval) + 1)
                     
         except KeyboardInterrupt:
             print(f"\n{Colors.GREEN}Monitoring to'xtatildi{Colors.NC}")
@@ -1387,155 +4700,352 @@ class MonitoringManager:
         """Performans ma'lumotlarini saqlash"""
         stats = MonitoringManager.get_system_stats()
         
-        # Clean up old data (keep last 30 days)
-        if PERFORMANCE_LOG.exists():
-            lines = []
-            with open(PERFORMANCE_LOG, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            
-            cutoff = datetime.datetime.now() - datetime.timedelta(days=30)
-            new_lines = []
-            for line in lines:
-                try:
-                    data = json.loads(line.strip())
-                    if 'timestamp' in data:
-                        ts = datetime.datetime.fromisoformat(data['timestamp'])
-                        if ts > cutoff:
-                            new_lines.append(line)
-                except:
-                    continue
-            
-            with open(PERFORMANCE_LOG, 'w', encoding='utf-8') as f:
-                f.writelines(new_lines)
-        
-        # Add new data
-        with open(PERFORMANCE_LOG, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(stats) + '\n')
+        # Faqat oxiriga yozish; eski segmentlar yangi kun segmenti ochilganda o'chiriladi
+        MetricsStore.append(stats)
         
         Logger.debug("Performans ma'lumotlari saqlandi")
     
+    # (ustun, sarlavha, hisobot kaliti, birlik)
+    ANALYSIS_METRICS = [
+        ('cpu', 'CPU', 'cpu', '%'),
+        ('memory_percent', 'RAM', 'memory', '%'),
+        ('disk_percent', 'Disk', 'disk', '%'),
+        ('mysql_connections', 'MySQL ulanishlar', 'mysql', ''),
+        ('postgresql_connections', 'PostgreSQL ulanishlar', 'postgresql', ''),
+    ]
+    
+    @staticmethod
+    def summarize(columns, names):
+        """
+        Har bir ustun uchun count/avg/min/max/std/p50/p95/p99. NumPy bo'lsa barcha
+        metrikalar bitta matritsada vektorli hisoblanadi (None -> NaN).
+        """
+        result = {name: None for name in names}
+        if NUMPY_AVAILABLE:
+            np = OptionalDeps.load("numpy")
+            matrix = np.array([columns[name] for name in names], dtype=float).reshape(len(names), -1)
+            counts = np.count_nonzero(~np.isnan(matrix), axis=1)
+            rows = matrix[counts > 0]
+            if len(rows):
+                stats = np.vstack([np.nanmean(rows, axis=1), np.nanmin(rows, axis=1), np.nanmax(rows, axis=1),
+                                   np.nanstd(rows, axis=1), np.nanpercentile(rows, [50, 95, 99], axis=1)])
+                for i, name in enumerate(n for n, c in zip(names, counts) if c):
+                    avg, low, high, std, p50, p95, p99 = (float(v) for v in stats[:, i])
+                    result[name] = {'count': int(counts[names.index(name)]), 'avg': avg, 'min': low, 'max': high,
+                                    'std': std, 'p50': p50, 'p95': p95, 'p99': p99}
+            return result
+        
+        for name in names:
+            values = sorted(v for v in columns[name] if v is not None)
+            if not values:
+                continue
+            count = len(values)
+            avg = sum(values) / count
+            std = (sum((v - avg) ** 2 for v in values) / count) ** 0.5
+            result[name] = {'count': count, 'avg': avg, 'min': values[0], 'max': values[-1], 'std': std,
+                            'p50': MetricRollups.percentile(values, 0.50),
+                            'p95': MetricRollups.percentile(values, 0.95),
+                            'p99': MetricRollups.percentile(values, 0.99)}
+        return result
+    
     @staticmethod
-    def analyze_performance():
-        """Performans tahlili"""
-        if not PERFORMANCE_LOG.exists():
+    def analyze_performance(since=None, until=None):
+        """Performans tahlili ([since, until] oralig'i vaqt indeksi orqali o'qiladi)"""
+        names = [m[0] for m in MonitoringManager.ANALYSIS_METRICS]
+        oldest = MetricsStore.oldest()
+        
+        if since is not None and (oldest is None or since < oldest):
+            # Xom segmentlar saqlanmagan oraliq: rollup'lar va kvantil sketch'lar orqali
+            summary = MetricRollups.summary(names, since, until)
+            total = max((stats['count'] for stats in summary.values() if stats), default=0)
+            first_record, last_record = since.isoformat(), (until or datetime.datetime.now()).isoformat()
+            source = "rollup + sketch"
+        else:
+            data = MetricsStore.columns(names, since, until)
+            total = len(data['ts'])
+            if total:
+                first_record = datetime.datetime.fromtimestamp(data['ts'][0]).isoformat()
+                last_record = datetime.datetime.fromtimestamp(data['ts'][-1]).isoformat()
+                summary = MonitoringManager.summarize(data, names)
+            source = "xom namunalar"
+        
+        if not total:
             Logger.error("Performans ma'lumotlari topilmadi")
             return
         
-        data = []
-        with open(PERFORMANCE_LOG, 'r', encoding='utf-8') as f:
-            for line in f:
-                try:
-                    data.append(json.loads(line))
-                except:
-                    continue
-        
-        if not data:
-            Logger.error("Ma'lumotlar yo'q")
-            return
-        
         print(f"{Colors.CYAN}{Colors.BOLD}=== PERFORMANS STATISTIKASI ==={Colors.NC}\n")
-        print(f"Jami yozuvlar: {len(data)}")
-        
-        try:
-            print(f"Birinchi yozuv: {data[0].get('timestamp', 'N/A')}")
-            print(f"So'ngi yozuv: {data[-1].get('timestamp', 'N/A')}")
-        except:
-            pass
-        
-        # Statistikani hisoblash
-        cpu_values = [d.get('cpu', 0) for d in data if 'cpu' in d]
-        mem_values = [d.get('memory_percent', 0) for d in data if 'memory_percent' in d]
-        disk_values = [d.get('disk_percent', 0) for d in data if 'disk_percent' in d]
-        
-        if cpu_values:
-            print(f"\n{Colors.GREEN}CPU:{Colors.NC}")
-            print(f"  O'rtacha: {sum(cpu_values)/len(cpu_values):.2f}%")
-            print(f"  Maksimal: {max(cpu_values):.2f}%")
-            print(f"  Minimal: {min(cpu_values):.2f}%")
-        
-        if mem_values:
-            print(f"\n{Colors.GREEN}RAM:{Colors.NC}")
-            print(f"  O'rtacha: {sum(mem_values)/len(mem_values):.2f}%")
-            print(f"  Maksimal: {max(mem_values):.2f}%")
-            print(f"  Minimal: {min(mem_values):.2f}%")
-        
-        if disk_values:
-            print(f"\n{Colors.GREEN}Disk:{Colors.NC}")
-            print(f"  O'rtacha: {sum(disk_values)/len(disk_values):.2f}%")
-            print(f"  Maksimal: {max(disk_values):.2f}%")
-            print(f"  Minimal: {min(disk_values):.2f}%")
-        
-        # MySQL stats
-        mysql_conns = []
-        for d in data:
-            if 'mysql_connections' in d and d['mysql_connections']:
-                match = re.search(r'(\d+)', str(d['mysql_connections']))
-                if match:
-                    mysql_conns.append(int(match.group(1)))
-        
-        if mysql_conns:
-            print(f"\n{Colors.GREEN}MySQL:{Colors.NC}")
-            print(f"  O'rtacha ulanishlar: {sum(mysql_conns)/len(mysql_conns):.0f}")
-            print(f"  Maksimal ulanishlar: {max(mysql_conns)}")
-            print(f"  Minimal ulanishlar: {min(mysql_conns)}")
-        
-        # PostgreSQL stats
-        pg_conns = []
-        for d in data:
-            if 'postgresql_connections' in d and d['postgresql_connections']:
-                match = re.search(r'(\d+)', str(d['postgresql_connections']))
-                if match:
-                    pg_conns.append(int(match.group(1)))
-        
-        if pg_conns:
-            print(f"\n{Colors.GREEN}PostgreSQL:{Colors.NC}")
-            print(f"  O'rtacha ulanishlar: {sum(pg_conns)/len(pg_conns):.0f}")
-            print(f"  Maksimal ulanishlar: {max(pg_conns)}")
-            print(f"  Minimal ulanishlar: {min(pg_conns)}")
+        print(f"Jami yozuvlar: {total} ({source})")
+        print(f"Birinchi yozuv: {first_record}")
+        print(f"So'ngi yozuv: {last_record}")
+        
+        for name, title, _, unit in MonitoringManager.ANALYSIS_METRICS:
+            stats = summary[name]
+            if not stats:
+                continue
+            print(f"\n{Colors.GREEN}{title}:{Colors.NC}")
+            print(f"  O'rtacha: {stats['avg']:.2f}{unit}  (std: {stats['std']:.2f})")
+            print(f"  Maksimal: {stats['max']:.2f}{unit}")
+            print(f"  Minimal: {stats['min']:.2f}{unit}")
+            print(f"  p50 / p95 / p99: {stats['p50']:.2f} / {stats['p95']:.2f} / {stats['p99']:.2f}{unit}")
         
         # Hisobot faylga saqlash
         report_file = REPORTS_DIR / f"performance_analysis_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         report = {
             'timestamp': datetime.datetime.now().isoformat(),
-            'total_records': len(data),
-            'first_record': data[0].get('timestamp') if data else None,
-            'last_record': data[-1].get('timestamp') if data else None,
-            'cpu': {
-                'avg': sum(cpu_values)/len(cpu_values) if cpu_values else 0,
-                'max': max(cpu_values) if cpu_values else 0,
-                'min': min(cpu_values) if cpu_values else 0
-            } if cpu_values else None,
-            'memory': {
-                'avg': sum(mem_values)/len(mem_values) if mem_values else 0,
-                'max': max(mem_values) if mem_values else 0,
-                'min': min(mem_values) if mem_values else 0
-            } if mem_values else None,
-            'disk': {
-                'avg': sum(disk_values)/len(disk_values) if disk_values else 0,
-                'max': max(disk_values) if disk_values else 0,
-                'min': min(disk_values) if disk_values else 0
-            } if disk_values else None
+            'total_records': total,
+            'source': source,
+            'first_record': first_record,
+            'last_record': last_record,
         }
+        report.update({key: summary[name] for name, _, key, _ in MonitoringManager.ANALYSIS_METRICS})
         
         with open(report_file, 'w', encoding='utf-8') as f:
             json.dump(report, f, indent=4)
         
         Logger.info(f"Performans tahlili saqlandi: {report_file}")
 
+class MetricsCollector:
+    """
+    Fon metrika kollektori (--collector): OS, MySQL va PostgreSQL kollektorlari
+    alohida oqimlarda o'z intervallari bilan ishlaydi, birlashgan oxirgi namuna
+    latest.json ga, har monitoring.interval da esa MetricsStore ga yoziladi.
+    DB/jadval hajmlari tarixi (SizeHistory) soatiga bir marta yig'iladi.
+    """
+    SOURCES = {
+        'os': MonitoringManager.collect_os,
+        'mysql': MonitoringManager.collect_mysql,
+        'postgresql': MonitoringManager.collect_postgresql,
+    }
+
+    def __init__(self):
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.parts = {}
+
+    @staticmethod
+    def intervals():
+        configured = Config.get("monitoring", "collector_intervals", {}) or {}
+        return {name: float(configured.get(name, 5 if name == 'os' else 15)) for name in MetricsCollector.SOURCES}
+
+    def every(self, interval, job):
+        """Qat'iy kadensli rejalashtiruvchi: keyingi ishga tushish vaqti boshlang'ich
+        nuqtadan hisoblanadi (drift yig'ilmaydi), kechikkan tiklar tashlab ketiladi."""
+        next_run = time.monotonic()
+        while not self.stop.is_set():
+            try:
+                job()
+            except Exception as e:
+                Logger.error(f"Kollektor xatoligi: {e}")
+            next_run += interval
+            now = time.monotonic()
+            if next_run < now:
+                next_run += interval * (int((now - next_run) // interval) + 1)
+            self.stop.wait(next_run - now)
+
+    def snapshot(self):
+        with self.lock:
+            stats = {}
+            for part in self.parts.values():
+                stats.update(part)
+        stats['timestamp'] = datetime.datetime.now().isoformat()
+        return MetricsSchema.parse(stats)
+
+    def collect(self, name):
+        part = MetricsCollector.SOURCES[name]()
+        with self.lock:
+            self.parts[name] = part
+        MonitoringManager.publish_snapshot(self.snapshot())
+
+    def persist(self):
+        with self.lock:
+            ready = bool(self.parts)
+        if ready:
+            MetricsStore.append(self.snapshot())
+
+    def run(self):
+        intervals = self.intervals()
+        store_interval = float(Config.get("monitoring", "interval", 60))
+        jobs = [(name, interval, lambda name=name: self.collect(name)) for name, interval in intervals.items()
+                if name == 'os' or (MySQLManager.check() if name == 'mysql' else PostgreSQLManager.check())]
+        jobs.append(('store', store_interval, self.persist))
+        if MySQLManager.check() or PostgreSQLManager.check():
+            configured = Config.get("monitoring", "collector_intervals", {}) or {}
+            jobs.append(('sizes', float(configured.get('sizes', 3600)), SizeHistory.collect))
+        
+        signal.signal(signal.SIGTERM, lambda *_: self.stop.set())
+        threads = [threading.Thread(target=self.every, args=(interval, job), name=f"collector-{name}", daemon=True)
+                   for name, interval, job in jobs]
+        
+        Logger.info("Metrika kollektori ishga tushdi: " +
+                    ", ".join(f"{name}={interval:g}s" for name, interval, _ in jobs))
+        for thread in threads:
+            thread.start()
+        try:
+            while not self.stop.is_set():
+                self.stop.wait(1)
+        except KeyboardInterrupt:
+            self.stop.set()
+        for thread in threads:
+            thread.join(timeout=5)
+        Logger.info("Metrika kollektori to'xtatildi")
+
 # ============================================================================
 # 1. KENGAYTIRILGAN MONITORING DASHBOARD
 # ============================================================================
 
+class HtmlDashboard:
+    """
+    matplotlib talab qilmaydigan HTML/SVG dashboard: 1 daqiqalik rollup'lardan
+    o'z-o'zidan yetarli HTML fayl quriladi, keyingi yangilanishlarda faylga faqat
+    yangi yopilgan bucket'lar <script> qatori sifatida qo'shiladi. Joriy qiymatlar
+    kichik dashboard_live.js fayliga yoziladi (sahifa uni ixtiyoriy yuklaydi).
+    """
+    FILE = DASHBOARDS_DIR / "dashboard.html"
+    LIVE_FILE = DASHBOARDS_DIR / "dashboard_live.js"
+    STATE_FILE = DASHBOARDS_DIR / "dashboard_state.json"
+    RESOLUTION = 60
+    # (metrika, sarlavha, birlik)
+    METRICS = [
+        ('cpu', 'CPU', '%'),
+        ('memory_percent', 'RAM', '%'),
+        ('disk_percent', 'Disk', '%'),
+        ('load_1', 'Load (1m)', ''),
+        ('mysql_connections', 'MySQL ulanishlar', ''),
+        ('postgresql_connections', 'PostgreSQL ulanishlar', ''),
+    ]
+    TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><meta http-equiv="refresh" content="%(refresh)d">
+<title>SettingsDBPro Dashboard</title>
+<style>
+body{font-family:sans-serif;background:#111;color:#ddd;margin:20px}
+.grid{display:grid;grid-template-columns:repeat(auto-fill,minmax(420px,1fr));gap:16px}
+.card{background:#1c1c1c;border-radius:6px;padding:12px}
+.card h3{margin:0 0 4px;font-size:14px;color:#aaa}.v{font-size:28px;font-weight:bold}
+.r{font-size:12px;color:#888}svg{width:100%%;height:80px}polyline{fill:none;stroke:#4fc3f7;stroke-width:1.5}
+</style></head><body>
+<h2>SettingsDBPro - so'nggi %(hours)d soat</h2><div class="r" id="updated"></div><div class="grid" id="grid"></div>
+<script>
+var M=%(metrics)s,W=%(window)d,T=[],D=M.map(function(){return []});
+function add(t,v){T.push(t);for(var i=0;i<M.length;i++)D[i].push(v[i]);}
+function fmt(x){return x==null?'-':(Math.abs(x)>=100?x.toFixed(0):x.toFixed(1));}
+function draw(){
+ var end=T.length?T[T.length-1]:0,live=window.LIVE||{},g=document.getElementById('grid');
+ var start=0;while(start<T.length&&T[start]<end-W)start++;
+ document.getElementById('updated').textContent='Yangilangan: '+(live.timestamp||new Date(end*1000).toLocaleString());
+ M.forEach(function(m,i){
+  var pts=[],lo=Infinity,hi=-Infinity,last=null;
+  for(var j=start;j<T.length;j++){var y=D[i][j];if(y==null)continue;lo=Math.min(lo,y);hi=Math.max(hi,y);last=y;}
+  if(last==null&&live[m[0]]==null)return;
+  var span=hi-lo||1;
+  for(var j=start;j<T.length;j++){var y=D[i][j];if(y==null)continue;
+   pts.push(((T[j]-(end-W))/W*600).toFixed(1)+','+(78-(y-lo)/span*76).toFixed(1));}
+  var now=live[m[0]]!=null?live[m[0]]:last;
+  g.insertAdjacentHTML('beforeend','<div class="card"><h3>'+m[1]+'</h3><div class="v">'+fmt(now)+m[2]+
+   '</div><div class="r">min '+fmt(lo==Infinity?null:lo)+' / max '+fmt(hi==-Infinity?null:hi)+'</div>'+
+   '<svg viewBox="0 0 600 80" preserveAspectRatio="none"><polyline points="'+pts.join(' ')+'"/></svg></div>');
+ });
+}
+window.addEventListener('load',draw);
+</script>
+<script src="dashboard_live.js"></script>
+"""
+
+    @staticmethod
+    def load_state():
+        try:
+            with open(HtmlDashboard.STATE_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def rows(since, until):
+        """Yopilgan bucket'lar [(bucket, <script> qatori)]: since < bucket, bucket + rezolyutsiya <= until"""
+        names = [name for name, _, _ in HtmlDashboard.METRICS]
+        conn = MetricRollups.connect()
+        rows = conn.execute(
+            f"SELECT bucket, metric, sum / count AS value FROM rollups "
+            f"WHERE resolution = ? AND bucket > ? AND bucket <= ? AND metric IN ({','.join('?' * len(names))}) "
+            f"ORDER BY bucket",
+            (HtmlDashboard.RESOLUTION, since, until - HtmlDashboard.RESOLUTION, *names)
+        ).fetchall()
+        conn.close()
+        buckets = {}
+        for row in rows:
+            buckets.setdefault(int(row['bucket']), {})[row['metric']] = row['value']
+        return [
+            (bucket, f"<script>add({bucket},{json.dumps([None if values.get(name) is None else round(values[name], 2) for name in names])})</script>\n")
+            for bucket, values in buckets.items()
+        ]
+
+    @staticmethod
+    def generate(hours=24, refresh=10):
+        """
+        Dashboardni yangilash: fayl yo'q, sozlama o'zgargan yoki eski bucket'lar
+        oynadan ikki barobar oshgan bo'lsa qayta yoziladi, aks holda faqat yangi
+        bucket'lar qo'shiladi. Qo'shilgan bucket'lar soni qaytariladi.
+        """
+        now = time.time()
+        window = hours * 3600
+        config = {'hours': hours, 'refresh': refresh, 'metrics': [name for name, _, _ in HtmlDashboard.METRICS]}
+        state = HtmlDashboard.load_state()
+        rewrite = (not HtmlDashboard.FILE.exists() or state.get('config') != config
+                   or state.get('first', 0) < now - 2 * window)
+        
+        if rewrite:
+            rows = HtmlDashboard.rows(now - window - HtmlDashboard.RESOLUTION, now)
+            tmp = HtmlDashboard.FILE.with_suffix(".tmp")
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(HtmlDashboard.TEMPLATE % {
+                    'refresh': refresh, 'hours': hours, 'window': window,
+                    'metrics': json.dumps([list(metric) for metric in HtmlDashboard.METRICS]),
+                })
+                f.writelines(line for _, line in rows)
+            tmp.replace(HtmlDashboard.FILE)
+            state = {'config': config, 'first': now - window, 'last': now - window - HtmlDashboard.RESOLUTION}
+        else:
+            rows = HtmlDashboard.rows(state['last'], now)
+            if rows:
+                with open(HtmlDashboard.FILE, 'a', encoding='utf-8') as f:
+                    f.writelines(line for _, line in rows)
+        
+        if rows:
+            state['last'] = rows[-1][0]
+        with open(HtmlDashboard.STATE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        
+        # Joriy qiymatlar (kollektor namunasi) - har safar qayta yoziladi
+        live = MonitoringManager.latest_stats() or {}
+        tmp = HtmlDashboard.LIVE_FILE.with_suffix(".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write("var LIVE=" + json.dumps(
+                {key: live.get(key) for key in ['timestamp'] + config['metrics']}, default=str) + ";\n")
+        tmp.replace(HtmlDashboard.LIVE_FILE)
+        return len(rows)
+
+    @staticmethod
+    def watch(interval=5, hours=24):
+        """Dashboardni har interval soniyada yangilab turish (Ctrl+C - to'xtatish)"""
+        Logger.info(f"HTML dashboard: {HtmlDashboard.FILE} (har {interval}s yangilanadi)")
+        try:
+            while True:
+                HtmlDashboard.generate(hours, refresh=max(int(interval), 1))
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print()
+
 class EnhancedMonitoring:
     @staticmethod
     def create_dashboard():
         """Grafik dashboard yaratish"""
         if not MATPLOTLIB_AVAILABLE:
-            Logger.error("matplotlib yoki numpy kutubxonasi o'rnatilmagan")
-            Logger.info("O'rnatish: pip3 install matplotlib numpy")
+            Logger.warning("matplotlib yoki numpy o'rnatilmagan - HTML dashboard yaratiladi")
+            HtmlDashboard.generate()
+            Logger.success(f"Dashboard yaratildi: {HtmlDashboard.FILE}")
             return
         
-        stats = MonitoringManager.get_system_stats()
+        plt = OptionalDeps.load("matplotlib.pyplot")
+        stats = MonitoringManager.latest_stats() or MonitoringManager.get_system_stats()
         
         fig, axes = plt.subplots(2, 2, figsize=(12, 8))
         
@@ -1564,17 +5074,8 @@ class EnhancedMonitoring:
         axes[1, 0].text(0, disk_value + 2, f'{disk_value:.1f}%', ha='center', fontsize=12)
         
         # Connections grafigi
-        mysql_conn = 0
-        if stats.get('mysql_connections'):
-            match = re.search(r'(\d+)', str(stats['mysql_connections']))
-            if match:
-                mysql_conn = float(match.group(1))
-        
-        pg_conn = 0
-        if stats.get('postgresql_connections'):
-            match = re.search(r'(\d+)', str(stats['postgresql_connections']))
-            if match:
-                pg_conn = float(match.group(1))
+        mysql_conn = stats.get('mysql_connections', 0)
+        pg_conn = stats.get('postgresql_connections', 0)
         
         connections = [mysql_conn, pg_conn]
         bars = axes[1, 1].bar(['MySQL', 'PostgreSQL'], connections, color=['purple', 'red'], width=0.5)
@@ -1605,210 +5106,340 @@ class EnhancedMonitoring:
         print(f"Tarmoq yuborilgan: {stats.get('net_sent', 0):.2f} MB")
         print(f"Tarmoq qabul qilingan: {stats.get('net_recv', 0):.2f} MB")
     
+    # Trend grafigi panellari: (sarlavha, o'q nomi, [(metrika, rang, yorliq)])
+    TREND_PANELS = [
+        ('CPU Usage Trend', 'CPU %', [('cpu', 'tab:blue', 'CPU')]),
+        ('Memory Usage Trend', 'Memory %', [('memory_percent', 'tab:green', 'Memory')]),
+        ('Disk Usage Trend', 'Disk %', [('disk_percent', 'orange', 'Disk')]),
+        ('Database Connections Trend', 'Connections',
+         [('mysql_connections', 'purple', 'MySQL'), ('postgresql_connections', 'red', 'PostgreSQL')]),
+    ]
+    TREND_WIDTH = 700  # bitta panel kengligi (piksel, figsize 14 x dpi 100 / 2)
+
+    @staticmethod
+    def lttb(ts, values, threshold):
+        """Largest-Triangle-Three-Buckets: seriyani shaklini saqlagan holda threshold nuqtaga kamaytirish"""
+        np = OptionalDeps.load("numpy")
+        ts = np.asarray(ts, dtype=float)
+        values = np.asarray(values, dtype=float)
+        n = len(ts)
+        if threshold >= n or threshold < 3:
+            return ts, values
+        
+        every = (n - 2) / (threshold - 2)
+        bounds = np.floor(np.arange(threshold - 1) * every).astype(int) + 1
+        bounds[-1] = n - 1
+        selected = np.empty(threshold, dtype=int)
+        selected[0], selected[-1] = 0, n - 1
+        a = 0
+        for i in range(threshold - 2):
+            start, end = bounds[i], bounds[i + 1]
+            next_end = bounds[i + 2] if i + 2 < len(bounds) else n
+            avg_t = ts[end:next_end].mean()
+            avg_v = values[end:next_end].mean()
+            area = np.abs((ts[a] - avg_t) * (values[start:end] - values[a])
+                          - (ts[a] - ts[start:end]) * (avg_v - values[a]))
+            a = start + int(area.argmax())
+            selected[i + 1] = a
+        return ts[selected], values[selected]
+
+    @staticmethod
+    def render_trend(title, path, panels):
+        """Bitta trend grafigini Agg backendida chizish (alohida jarayonda ishlaydi)"""
+        matplotlib = OptionalDeps.load("matplotlib")
+        matplotlib.use("Agg")
+        plt = OptionalDeps.load("matplotlib.pyplot")
+        
+        fig, axes = plt.subplots(2, 2, figsize=(14, 10))
+        for ax, (panel_title, ylabel, lines) in zip(axes.flat, panels):
+            for label, color, timestamps, values in lines:
+                ax.plot(timestamps, values, color=color, linewidth=1.5, label=label)
+            ax.set_title(panel_title, fontsize=14, fontweight='bold')
+            ax.set_ylabel(ylabel)
+            ax.grid(True, alpha=0.3)
+            ax.tick_params(axis='x', rotation=45)
+            if len(lines) > 1:
+                ax.legend()
+        
+        plt.suptitle(title, fontsize=16, fontweight='bold')
+        plt.tight_layout()
+        plt.savefig(str(path), dpi=100, bbox_inches='tight')
+        plt.close(fig)
+        return str(path)
+
     @staticmethod
     def create_trend_graph(days=7):
-        """Trend grafigi yaratish"""
+        """Trend grafigi yaratish (days: son yoki kunlar ro'yxati - har biri alohida grafik)"""
         if not MATPLOTLIB_AVAILABLE:
             Logger.error("matplotlib kutubxonasi o'rnatilmagan")
             return
         
-        if not PERFORMANCE_LOG.exists():
-            Logger.error("Performans ma'lumotlari topilmadi")
-            return
-        
-        data = []
-        with open(PERFORMANCE_LOG, 'r', encoding='utf-8') as f:
-            for line in f:
-                try:
-                    data.append(json.loads(line.strip()))
-                except:
-                    continue
-        
-        if len(data) < 10:
-            Logger.warning("Trend grafigi uchun yetarli ma'lumot yo'q")
-            return
-        
-        # So'nggi N kundagi ma'lumotlarni olish
-        cutoff_date = datetime.datetime.now() - datetime.timedelta(days=days)
-        filtered_data = []
-        for d in data:
-            if 'timestamp' in d:
-                try:
-                    ts = datetime.datetime.fromisoformat(d['timestamp'])
-                    if ts > cutoff_date:
-                        filtered_data.append(d)
-                except:
-                    continue
-        
-        if len(filtered_data) < 5:
-            Logger.warning(f"So'nggi {days} kunda yetarli ma'lumot yo'q")
-            return
-        
-        fig, axes = plt.subplots(2, 2, figsize=(14, 10))
-        
-        # Vaqt o'qi
-        timestamps = []
-        cpu_values = []
-        mem_values = []
-        disk_values = []
-        
-        for d in filtered_data:
-            if 'timestamp' in d and 'cpu' in d and 'memory_percent' in d and 'disk_percent' in d:
-                try:
-                    ts = datetime.datetime.fromisoformat(d['timestamp'])
-                    timestamps.append(ts)
-                    cpu_values.append(d['cpu'])
-                    mem_values.append(d['memory_percent'])
-                    disk_values.append(d['disk_percent'])
-                except:
-                    continue
+        np = OptionalDeps.load("numpy")
+        windows = days if isinstance(days, (list, tuple)) else [days]
+        names = [name for _, _, lines in EnhancedMonitoring.TREND_PANELS for name, _, _ in lines]
+        now = datetime.datetime.now()
+        
+        jobs = []
+        for window in windows:
+            # Oraliqqa mos rollup rezolyutsiyasi, so'ng har bir seriya LTTB bilan piksel kengligiga
+            data = MetricRollups.series(names, since=now - datetime.timedelta(days=window),
+                                        width=EnhancedMonitoring.TREND_WIDTH * 4)
+            if len(data['ts']) < 5:
+                Logger.warning(f"So'nggi {window} kunda yetarli ma'lumot yo'q")
+                continue
+            
+            ts = np.asarray(data['ts'], dtype=float)
+            panels = []
+            for title, ylabel, lines in EnhancedMonitoring.TREND_PANELS:
+                series = []
+                for name, color, label in lines:
+                    values = np.array(data[name], dtype=float)
+                    keep = ~np.isnan(values)
+                    if keep.any():
+                        points_ts, points = EnhancedMonitoring.lttb(ts[keep], values[keep], EnhancedMonitoring.TREND_WIDTH)
+                        series.append((label, color, [datetime.datetime.fromtimestamp(t) for t in points_ts], points))
+                panels.append((title, ylabel, series))
+            
+            trend_file = REPORTS_DIR / f'trend_{window}days_{now.strftime("%Y%m%d_%H%M%S")}.png'
+            jobs.append((f'System Trends - Last {window} Days', trend_file, panels))
         
-        if not timestamps:
-            Logger.error("Grafik uchun ma'lumotlar formati noto'g'ri")
+        if not jobs:
             return
+        if len(jobs) == 1:
+            files = [EnhancedMonitoring.render_trend(*jobs[0])]
+        else:
+            with ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as pool:
+                files = list(pool.map(EnhancedMonitoring.render_trend, *zip(*jobs)))
         
-        # CPU trend
-        axes[0, 0].plot(timestamps, cpu_values, 'b-', linewidth=2, marker='o', markersize=4)
-        axes[0, 0].set_title('CPU Usage Trend', fontsize=14, fontweight='bold')
-        axes[0, 0].set_ylabel('CPU %')
-        axes[0, 0].grid(True, alpha=0.3)
-        axes[0, 0].tick_params(axis='x', rotation=45)
-        
-        # Memory trend
-        axes[0, 1].plot(timestamps, mem_values, 'g-', linewidth=2, marker='s', markersize=4)
-        axes[0, 1].set_title('Memory Usage Trend', fontsize=14, fontweight='bold')
-        axes[0, 1].set_ylabel('Memory %')
-        axes[0, 1].grid(True, alpha=0.3)
-        axes[0, 1].tick_params(axis='x', rotation=45)
-        
-        # Disk trend
-        axes[1, 0].plot(timestamps, disk_values, 'orange', linewidth=2, marker='^', markersize=4)
-        axes[1, 0].set_title('Disk Usage Trend', fontsize=14, fontweight='bold')
-        axes[1, 0].set_ylabel('Disk %')
-        axes[1, 0].grid(True, alpha=0.3)
-        axes[1, 0].tick_params(axis='x', rotation=45)
-        
-        # Connection trend
-        mysql_conn_values = []
-        pg_conn_values = []
-        
-        for d in filtered_data:
-            mysql_val = 0
-            pg_val = 0
-            if d.get('mysql_connections'):
-                match = re.search(r'(\d+)', str(d['mysql_connections']))
-                if match:
-                    mysql_val = float(match.group(1))
-            if d.get('postgresql_connections'):
-                match = re.search(r'(\d+)', str(d['postgresql_connections']))
-                if match:
-                    pg_val = float(match.group(1))
-            mysql_conn_values.append(mysql_val)
-            pg_conn_values.append(pg_val)
-        
-        axes[1, 1].plot(timestamps, mysql_conn_values, 'purple', linewidth=2, label='MySQL')
-        axes[1, 1].plot(timestamps, pg_conn_values, 'red', linewidth=2, label='PostgreSQL')
-        axes[1, 1].set_title('Database Connections Trend', fontsize=14, fontweight='bold')
-        axes[1, 1].set_ylabel('Connections')
-        axes[1, 1].legend()
-        axes[1, 1].grid(True, alpha=0.3)
-        axes[1, 1].tick_params(axis='x', rotation=45)
-        
-        plt.suptitle(f'System Trends - Last {days} Days', fontsize=16, fontweight='bold')
-        plt.tight_layout()
-        
-        trend_file = REPORTS_DIR / f'trend_{days}days_{datetime.datetime.now().strftime("%Y%m%d_%H%M%S")}.png'
-        plt.savefig(str(trend_file), dpi=100, bbox_inches='tight')
-        plt.close()
-        
-        Logger.success(f"Trend grafigi yaratildi: {trend_file}")
+        for trend_file in files:
+            Logger.success(f"Trend grafigi yaratildi: {trend_file}")
 
 # ============================================================================
 # 2. PREDICTIVE ANALYTICS (AI ASOSIDA)
 # ============================================================================
 
+class SizeHistory:
+    """
+    DB va jadval hajmlari tarixi (capacity planning). MySQL uchun bitta
+    information_schema so'rovi, PostgreSQL uchun har bir DB ga bitta pg_class
+    so'rovi; faqat hajmi o'zgargan obyektlar yangi yozuv sifatida saqlanadi.
+    """
+    DB = METRICS_DIR / "size_history.db"
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS objects (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            engine TEXT NOT NULL,
+            database TEXT NOT NULL,
+            name TEXT NOT NULL,
+            last_data INTEGER NOT NULL,
+            last_index INTEGER NOT NULL,
+            last_seen INTEGER NOT NULL,
+            UNIQUE (engine, database, name)
+        );
+        CREATE TABLE IF NOT EXISTS samples (
+            object_id INTEGER NOT NULL,
+            ts INTEGER NOT NULL,
+            data_bytes INTEGER NOT NULL,
+            index_bytes INTEGER NOT NULL,
+            PRIMARY KEY (object_id, ts)
+        ) WITHOUT ROWID;
+    """
+    SYSTEM_SCHEMAS = ('mysql', 'information_schema', 'performance_schema', 'sys')
+
+    @staticmethod
+    def connect():
+        conn = sqlite3.connect(SizeHistory.DB, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SizeHistory.SCHEMA)
+        return conn
+
+    @staticmethod
+    def mysql_sizes():
+        """Barcha DB lar jadvallari: bitta so'rov"""
+        rows, _, code = DatabaseManager.query(
+            "mysql",
+            "SELECT table_schema AS db, table_name AS name, COALESCE(data_length, 0) AS data, "
+            "COALESCE(index_length, 0) AS idx FROM information_schema.tables "
+            f"WHERE table_type = 'BASE TABLE' AND table_schema NOT IN "
+            f"({', '.join(repr(s) for s in SizeHistory.SYSTEM_SCHEMAS)})"
+        )
+        return [(row['db'], row['name'], int(row['data'] or 0), int(row['idx'] or 0)) for row in rows] if code == 0 else []
+
+    @staticmethod
+    def postgresql_sizes():
+        """
+        Har bir DB uchun bitta pg_class so'rovi (jadval soniga bog'liq emas). Sessiya
+        so'rovdan keyin yopiladi: DBSession.get keshi uzoq yashovchi kollektorda har
+        bir DB uchun bittadan backend'ni doimiy band qilib qo'yardi.
+        """
+        result = []
+        for dbname in PostgreSQLManager.get_database_sizes():
+            session = DBSession("postgresql", dbname)
+            try:
+                rows, _, code = session.query(
+                    "SELECT n.nspname || '.' || c.relname AS name, pg_table_size(c.oid) AS data, "
+                    "pg_indexes_size(c.oid) AS idx FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+                    "WHERE c.relkind IN ('r', 'p', 'm') AND n.nspname NOT IN ('pg_catalog', 'information_schema') "
+                    "AND n.nspname NOT LIKE 'pg_toast%'"
+                )
+            finally:
+                session.close()
+            if code == 0:
+                result += [(dbname, row['name'], int(row['data'] or 0), int(row['idx'] or 0)) for row in rows]
+        return result
+
+    @staticmethod
+    def record(engine, rows, ts=None):
+        """Hajmlarni yozish: yangi yoki o'zgargan obyektlar uchun samples ga qator qo'shiladi"""
+        ts = int(ts or time.time())
+        conn = SizeHistory.connect()
+        known = {(row['database'], row['name']): row for row in conn.execute(
+            "SELECT id, database, name, last_data, last_index FROM objects WHERE engine = ?", (engine,))}
+        changed = 0
+        for database, name, data, index in rows:
+            row = known.get((database, name))
+            if row is None:
+                object_id = conn.execute(
+                    "INSERT INTO objects (engine, database, name, last_data, last_index, last_seen) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", (engine, database, name, data, index, ts)).lastrowid
+            else:
+                object_id = row['id']
+                conn.execute("UPDATE objects SET last_data = ?, last_index = ?, last_seen = ? WHERE id = ?",
+                             (data, index, ts, object_id))
+                if (row['last_data'], row['last_index']) == (data, index):
+                    continue
+            conn.execute("INSERT OR REPLACE INTO samples (object_id, ts, data_bytes, index_bytes) VALUES (?, ?, ?, ?)",
+                         (object_id, ts, data, index))
+            changed += 1
+        conn.commit()
+        conn.close()
+        return changed
+
+    @staticmethod
+    def collect():
+        """Kollektor/cron uchun: mavjud dvigatellar hajmlarini yozish"""
+        changed = 0
+        if MySQLManager.check():
+            changed += SizeHistory.record("mysql", SizeHistory.mysql_sizes())
+        if PostgreSQLManager.check():
+            changed += SizeHistory.record("postgresql", SizeHistory.postgresql_sizes())
+        Logger.debug(f"Hajm tarixi: {changed} ta obyekt o'zgargan")
+        return {}
+
+    @staticmethod
+    def volume(engine):
+        """DB ma'lumotlar katalogi joylashgan disk: (qurilma id, bo'sh bayt)"""
+        if engine == "mysql":
+            path = DatabaseManager.scalar("mysql", "SELECT @@datadir")
+        else:
+            path = DatabaseManager.scalar("postgresql", "SHOW data_directory")
+        path = path if path and os.path.exists(path) else "/"
+        return os.stat(path).st_dev, shutil.disk_usage(path).free
+
+    @staticmethod
+    def fit(points):
+        """Eng kichik kvadratlar: (ts, bayt) nuqtalari -> o'sish (bayt/kun)"""
+        if len(points) < 2:
+            return 0.0
+        n = len(points)
+        mean_t = sum(t for t, _ in points) / n
+        mean_y = sum(y for _, y in points) / n
+        var_t = sum((t - mean_t) ** 2 for t, _ in points)
+        if var_t == 0:
+            return 0.0
+        return sum((t - mean_t) * (y - mean_y) for t, y in points) / var_t * 86400
+
+    @staticmethod
+    def forecast(window_days=30):
+        """
+        Har bir obyekt uchun real vaqt bo'yicha o'sish tezligi va disk to'lish muddati.
+        days_alone - faqat shu obyekt o'sganda, days_volume - barcha obyektlar bilan birga.
+        """
+        since = int(time.time() - window_days * 86400)
+        conn = SizeHistory.connect()
+        latest = conn.execute("SELECT engine, MAX(last_seen) AS seen FROM objects GROUP BY engine").fetchall()
+        objects = []
+        for engine_row in latest:
+            objects += conn.execute(
+                "SELECT * FROM objects WHERE engine = ? AND last_seen = ?", (engine_row['engine'], engine_row['seen'])
+            ).fetchall()
+        points = {}
+        for row in conn.execute(
+                "SELECT s.object_id, s.ts, s.data_bytes + s.index_bytes AS total FROM samples s "
+                "JOIN objects o ON o.id = s.object_id WHERE s.ts >= ? ORDER BY s.ts", (since,)):
+            points.setdefault(row['object_id'], []).append((row['ts'], row['total']))
+        conn.close()
+        
+        volumes = {}
+        result = []
+        for obj in objects:
+            size = obj['last_data'] + obj['last_index']
+            series = points.get(obj['id'], []) + [(obj['last_seen'], size)]
+            if obj['engine'] not in volumes:
+                volumes[obj['engine']] = SizeHistory.volume(obj['engine'])
+            device, free = volumes[obj['engine']]
+            rate = SizeHistory.fit(series)
+            result.append({
+                'engine': obj['engine'], 'database': obj['database'], 'name': obj['name'],
+                'size': size, 'rate_per_day': rate, 'device': device, 'free': free,
+                'days_alone': free / rate if rate > 0 else None,
+            })
+        
+        # Bir diskdagi barcha obyektlarning umumiy o'sishi
+        growth = {}
+        for item in result:
+            growth[item['device']] = growth.get(item['device'], 0.0) + max(item['rate_per_day'], 0.0)
+        for item in result:
+            total = growth[item['device']]
+            item['days_volume'] = item['free'] / total if total > 0 else None
+            item['share'] = max(item['rate_per_day'], 0.0) / total * 100 if total > 0 else 0.0
+        # Diskni birinchi to'ldiradigani birinchi (har bir dvigatel o'z diskida bo'lishi mumkin)
+        result.sort(key=lambda item: (item['days_alone'] is None, item['days_alone'] or 0.0, -item['rate_per_day']))
+        return result
+
 class PredictiveAnalytics:
     @staticmethod
     def predict_growth(days=30):
-        """Ma'lumotlar bazasi o'sishini bashorat qilish"""
-        if not SKLEARN_AVAILABLE or not MATPLOTLIB_AVAILABLE:
-            Logger.error("scikit-learn yoki matplotlib kutubxonasi o'rnatilmagan")
-            Logger.info("O'rnatish: pip3 install scikit-learn matplotlib")
-            return
-        
-        # Tarixiy ma'lumotlarni yig'ish
-        sizes = []
-        dates = []
-        
-        if PERFORMANCE_LOG.exists():
-            with open(PERFORMANCE_LOG, 'r', encoding='utf-8') as f:
-                for line in f:
-                    try:
-                        data = json.loads(line.strip())
-                        if 'disk_used' in data:
-                            sizes.append(float(data['disk_used']))
-                            dates.append(len(sizes))
-                    except:
-                        continue
+        """DB va jadvallar o'sishini real vaqt bo'yicha bashorat qilish, disk to'lish muddati"""
+        SizeHistory.collect()
+        forecast = SizeHistory.forecast()
         
-        if len(sizes) < 10:
-            Logger.warning("Bashorat qilish uchun yetarli ma'lumot yo'q (kamida 10 ta kerak)")
+        if not forecast:
+            Logger.warning("Hajm tarixi topilmadi (MySQL/PostgreSQL ishlamayapti?)")
             return
         
-        # Regression model
-        X = np.array(dates).reshape(-1, 1)
-        y = np.array(sizes)
-        
-        model = LinearRegression()
-        model.fit(X, y)
-        
-        # Kelajakni bashorat qilish
-        future_dates = np.array(range(len(dates), len(dates) + days)).reshape(-1, 1)
-        predictions = model.predict(future_dates)
-        
+        gb = 1024 ** 3
         print(f"\n{Colors.CYAN}{Colors.BOLD}=== MA'LUMOTLAR BAZASI O'SHISH BASHORATI ==={Colors.NC}\n")
-        print(f"Joriy hajm: {sizes[-1]:.2f} GB")
-        print(f"Kutilayotgan o'sish: {predictions[-1] - sizes[-1]:.2f} GB")
-        print(f"{days} kundan keyin: {predictions[-1]:.2f} GB")
-        print(f"30 kundan keyin: {model.predict([[len(dates) + 30]])[0]:.2f} GB")
-        print(f"90 kundan keyin: {model.predict([[len(dates) + 90]])[0]:.2f} GB")
-        
-        # O'sish tezligi
-        growth_rate = (predictions[-1] - sizes[-1]) / days
-        print(f"Kunlik o'rtacha o'sish: {growth_rate:.3f} GB/kun")
-        
-        # Model aniqligi
-        r2_score = model.score(X, y)
-        print(f"Model aniqligi (R²): {r2_score:.3f}")
-        
-        # Grafik
-        plt.figure(figsize=(12, 6))
-        plt.plot(dates, sizes, 'b-', label='Tarixiy ma\'lumotlar', linewidth=2, marker='o', markersize=4)
-        plt.plot(range(len(dates), len(dates) + days), predictions, 'r--', 
-                label='Bashorat', linewidth=2)
-        plt.axvline(x=len(dates), color='gray', linestyle=':', alpha=0.7)
-        plt.xlabel('Kunlar', fontsize=12)
-        plt.ylabel('Hajm (GB)', fontsize=12)
-        plt.title(f'Ma\'lumotlar bazasi o\'sish bashorati (R² = {r2_score:.3f})', 
-                 fontsize=14, fontweight='bold')
-        plt.legend()
-        plt.grid(True, alpha=0.3)
-        
-        prediction_file = REPORTS_DIR / f'growth_prediction_{days}days_{datetime.datetime.now().strftime("%Y%m%d_%H%M%S")}.png'
-        plt.savefig(str(prediction_file), dpi=100, bbox_inches='tight')
-        plt.close()
         
-        Logger.success(f"Bashorat grafigi yaratildi: {prediction_file}")
+        for engine in sorted({item['engine'] for item in forecast}):
+            items = [item for item in forecast if item['engine'] == engine]
+            total = sum(item['size'] for item in items)
+            rate = sum(item['rate_per_day'] for item in items)
+            print(f"{Colors.GREEN}{engine}:{Colors.NC} {len(items)} ta jadval, joriy hajm {total / gb:.2f} GB")
+            print(f"  Kunlik o'sish: {rate / gb:.3f} GB/kun")
+            print(f"  {days} kundan keyin: {(total + rate * days) / gb:.2f} GB")
+            print(f"  Diskda bo'sh joy: {items[0]['free'] / gb:.2f} GB"
+                  + (f", to'lishiga ~{items[0]['days_volume']:.0f} kun" if items[0]['days_volume'] else ""))
+        
+        growing = [item for item in forecast if item['rate_per_day'] > 0]
+        if not growing:
+            print(f"\n{Colors.GREEN}✓ O'sayotgan jadval yo'q (yoki tarix hali qisqa){Colors.NC}")
+        else:
+            print(f"\n{Colors.YELLOW}Diskni birinchi to'ldiradigan jadvallar:{Colors.NC}")
+            UI.show_table([{
+                'Jadval': f"{item['engine']}:{item['database']}.{item['name']}",
+                'Hajm (MB)': f"{item['size'] / 1024 ** 2:.1f}",
+                "O'sish (MB/kun)": f"{item['rate_per_day'] / 1024 ** 2:.2f}",
+                'Ulushi': f"{item['share']:.1f}%",
+                "Yolg'iz to'ldiradi (kun)": f"{item['days_alone']:.0f}",
+            } for item in growing[:15]])
         
         # JSON formatda saqlash
         prediction_data = {
             "timestamp": datetime.datetime.now().isoformat(),
-            "current_size": sizes[-1],
-            "predicted_size_30d": float(model.predict([[len(dates) + 30]])[0]),
-            "predicted_size_90d": float(model.predict([[len(dates) + 90]])[0]),
-            "daily_growth_rate": growth_rate,
-            "model_accuracy": r2_score,
-            "data_points": len(sizes)
+            "horizon_days": days,
+            "objects": [{key: value for key, value in item.items() if key != 'device'} for item in forecast],
         }
         
         pred_json_file = REPORTS_DIR / f'prediction_{datetime.datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
@@ -1819,87 +5450,37 @@ class PredictiveAnalytics:
     
     @staticmethod
     def detect_anomalies():
-        """Anomaliyalarni aniqlash"""
-        if not SKLEARN_AVAILABLE:
-            Logger.error("scikit-learn kutubxonasi o'rnatilmagan")
-            return
-        
-        if not PERFORMANCE_LOG.exists():
-            Logger.error("Performans ma'lumotlari topilmadi")
-            return
-        
-        data = []
-        with open(PERFORMANCE_LOG, 'r', encoding='utf-8') as f:
-            for line in f:
-                try:
-                    data.append(json.loads(line.strip()))
-                except:
-                    continue
-        
-        if len(data) < 20:
+        """Onlayn detektor topgan anomaliyalar (ALERT_LOG) va joriy baseline"""
+        state = AnomalyDetector.load_state()
+        if not any(state['count']):
+            # Detektor hali ishlamagan: so'nggi 30 kunni onlayn detektor orqali o'tkazish
+            replayed = AnomalyDetector.replay(datetime.datetime.now() - datetime.timedelta(days=30))
+            for a in replayed:
+                Logger.alert(f"ANOMALIYA {a['metric']}: {a['value']:.2f} ({a['direction']}, "
+                             f"kutilgan {a['expected']:.2f} ± {a['std']:.2f}, z={a['z']:.1f}) [{a['timestamp']}]")
+            state = AnomalyDetector.load_state()
+        
+        if not any(state['count']):
             Logger.warning("Anomaliya aniqlash uchun yetarli ma'lumot yo'q")
             return
         
-        # So'nggi 30 kun
-        cutoff_date = datetime.datetime.now() - datetime.timedelta(days=30)
-        recent_data = []
-        for d in data:
-            if 'timestamp' in d:
-                try:
-                    ts = datetime.datetime.fromisoformat(d['timestamp'])
-                    if ts > cutoff_date:
-                        recent_data.append(d)
-                except:
-                    continue
+        print(f"\n{Colors.CYAN}{Colors.BOLD}=== ANOMALIYALAR TAHLILI ==={Colors.NC}\n")
         
-        if len(recent_data) < 10:
-            Logger.warning("Anomaliya aniqlash uchun yetarli ma'lumot yo'q")
-            return
+        rows = [{'Metrika': name, 'Namunalar': count, 'EWMA': f"{mean:.2f}", 'Std': f"{math.sqrt(var):.2f}"}
+                for name, mean, var, count in zip(state['metrics'], state['mean'], state['var'], state['count'])
+                if count]
+        UI.show_table(rows)
         
         anomalies = []
+        if ALERT_LOG.exists():
+            with open(ALERT_LOG, 'r', encoding='utf-8') as f:
+                anomalies = [line.rstrip() for line in f if "ANOMALIYA" in line]
         
-        # CPU anomaliyalari
-        cpu_values = [d.get('cpu', 0) for d in recent_data if 'cpu' in d]
-        if cpu_values:
-            mean_cpu = np.mean(cpu_values)
-            std_cpu = np.std(cpu_values)
-            threshold = mean_cpu + 2 * std_cpu
-            
-            for i, d in enumerate(recent_data):
-                if d.get('cpu', 0) > threshold:
-                    anomalies.append({
-                        'type': 'CPU',
-                        'value': d['cpu'],
-                        'threshold': threshold,
-                        'timestamp': d.get('timestamp', 'Unknown')
-                    })
-        
-        # Memory anomaliyalari
-        mem_values = [d.get('memory_percent', 0) for d in recent_data if 'memory_percent' in d]
-        if mem_values:
-            mean_mem = np.mean(mem_values)
-            std_mem = np.std(mem_values)
-            threshold = mean_mem + 2 * std_mem
-            
-            for i, d in enumerate(recent_data):
-                if d.get('memory_percent', 0) > threshold:
-                    anomalies.append({
-                        'type': 'Memory',
-                        'value': d['memory_percent'],
-                        'threshold': threshold,
-                        'timestamp': d.get('timestamp', 'Unknown')
-                    })
-        
-        print(f"\n{Colors.CYAN}{Colors.BOLD}=== ANOMALIYALAR TAHLILI ==={Colors.NC}\n")
-        
+        print("")
         if anomalies:
             print(f"Topilgan anomaliyalar: {len(anomalies)} ta\n")
-            for a in anomalies[:10]:  # So'ngi 10 ta
-                print(f"{Colors.YELLOW}⚠ {a['type']}: {a['value']:.1f}% (threshold: {a['threshold']:.1f}%){Colors.NC}")
-                print(f"   Vaqt: {a['timestamp']}")
-            
-            if len(anomalies) > 10:
-                print(f"... va yana {len(anomalies) - 10} ta anomaliya")
+            for line in anomalies[-10:]:  # So'ngi 10 ta
+                print(f"{Colors.YELLOW}⚠ {line}{Colors.NC}")
         else:
             print(f"{Colors.GREEN}✓ Hech qanday anomaliya topilmadi{Colors.NC}")
 
@@ -1915,14 +5496,14 @@ class ReplicationManager:
             Logger.error("MySQL o'rnatilmagan")
             return
         
-        cmd = "sudo mysql -e \"SHOW SLAVE STATUS\\G\" 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        rows, stderr, code = DatabaseManager.query("mysql", "SHOW SLAVE STATUS")
         
-        if not stdout:
+        if not rows:
             print(f"\n{Colors.CYAN}MySQL Replikatsiya:{Colors.NC} {Colors.YELLOW}⚠ Replikatsiya sozlanmagan{Colors.NC}")
             return
         
-        if "Slave_IO_Running: Yes" in stdout and "Slave_SQL_Running: Yes" in stdout:
+        slave = rows[0]
+        if slave.get('Slave_IO_Running') == 'Yes' and slave.get('Slave_SQL_Running') == 'Yes':
             status = f"{Colors.GREEN}✓ Replikatsiya ishlayapti{Colors.NC}"
         else:
             status = f"{Colors.RED}✗ Replikatsiya muammosi{Colors.NC}"
@@ -1930,28 +5511,23 @@ class ReplicationManager:
         print(f"\n{Colors.CYAN}{Colors.BOLD}MySQL Replikatsiya:{Colors.NC} {status}")
         
         # Sekundlar kechikishi
-        match = re.search(r'Seconds_Behind_Master: (\d+)', stdout)
-        if match:
-            seconds = match.group(1)
+        seconds = slave.get('Seconds_Behind_Master')
+        if seconds is not None and seconds.isdigit():
             if int(seconds) > 60:
                 print(f"{Colors.YELLOW}Sekundlar kechikishi: {seconds} (Yuqori){Colors.NC}")
             else:
                 print(f"Sekundlar kechikishi: {seconds}")
         
         # Master bilAN ulanish
-        match = re.search(r'Master_Host: (.+)', stdout)
-        if match:
-            print(f"Master Host: {match.group(1)}")
+        if slave.get('Master_Host'):
+            print(f"Master Host: {slave['Master_Host']}")
         
-        match = re.search(r'Master_Log_File: (.+)', stdout)
-        if match:
-            print(f"Master Log File: {match.group(1)}")
+        if slave.get('Master_Log_File'):
+            print(f"Master Log File: {slave['Master_Log_File']}")
         
         # Xatoliklar
-        if "Last_Errno: 0" not in stdout:
-            match = re.search(r'Last_Error: (.+)', stdout)
-            if match:
-                print(f"{Colors.RED}Xatolik: {match.group(1)}{Colors.NC}")
+        if slave.get('Last_Errno', '0') != '0' and slave.get('Last_Error'):
+            print(f"{Colors.RED}Xatolik: {slave['Last_Error']}{Colors.NC}")
     
     @staticmethod
     def check_postgresql_replication():
@@ -1960,22 +5536,17 @@ class ReplicationManager:
             Logger.error("PostgreSQL o'rnatilmagan")
             return
         
-        cmd = "sudo -u postgres psql -c \"SELECT * FROM pg_stat_replication;\" 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        rows, stderr, code = DatabaseManager.query("postgresql", "SELECT * FROM pg_stat_replication")
         
-        if stdout and len(stdout.split('\n')) > 2:
+        if rows:
             status = f"{Colors.GREEN}✓ Replikatsiya ishlayapti{Colors.NC}"
             print(f"\n{Colors.CYAN}{Colors.BOLD}PostgreSQL Replikatsiya:{Colors.NC} {status}")
             
             # Replikatsiya ma'lumotlarini formatlab chiqarish
-            lines = stdout.split('\n')
-            for line in lines[2:]:  # Headerlarni o'tkazib yuborish
-                if line.strip() and not line.startswith('-'):
-                    values = line.split('|')
-                    if len(values) >= 3:
-                        print(f"  Replica: {values[1].strip() if len(values) > 1 else 'Unknown'}")
-                        print(f"  State: {values[4].strip() if len(values) > 4 else 'Unknown'}")
-                        print("  ---")
+            for row in rows:
+                print(f"  Replica: {row.get('application_name') or row.get('client_addr') or 'Unknown'}")
+                print(f"  State: {row.get('state') or 'Unknown'}")
+                print("  ---")
         else:
             print(f"\n{Colors.CYAN}PostgreSQL Replikatsiya:{Colors.NC} {Colors.YELLOW}⚠ Faol replikatsiya yo'q{Colors.NC}")
     
@@ -1994,33 +5565,27 @@ class ReplicationManager:
         master_password = UI.get_password("Master password")
         
         # Master holatini olish
-        cmd = "sudo mysql -e \"SHOW MASTER STATUS\\G\" 2>/dev/null"
-        stdout, stderr, code = DatabaseManager.run_command(cmd)
+        rows, stderr, code = DatabaseManager.query("mysql", "SHOW MASTER STATUS")
         
-        match_file = re.search(r'File: (.+)', stdout)
-        match_pos = re.search(r'Position: (\d+)', stdout)
-        
-        if match_file and match_pos:
-            log_file = match_file.group(1)
-            log_pos = match_pos.group(1)
+        if rows and rows[0].get('File') and rows[0].get('Position'):
+            log_file = rows[0]['File']
+            log_pos = rows[0]['Position']
             
-            # Slave sozlash
-            slave_cmds = f"""
-STOP SLAVE;
-CHANGE MASTER TO
+            # Slave sozlash: so'rovlar birma-bir, birinchi xatoda to'xtaladi
+            slave_cmds = [
+                "STOP SLAVE",
+                f"""CHANGE MASTER TO
     MASTER_HOST='{master_host}',
     MASTER_USER='{master_user}',
     MASTER_PASSWORD='{master_password}',
     MASTER_LOG_FILE='{log_file}',
-    MASTER_LOG_POS={log_pos};
-START SLAVE;
-"""
-            sql_file = TEMP_DIR / "setup_replica.sql"
-            with open(sql_file, 'w', encoding='utf-8') as f:
-                f.write(slave_cmds)
-            
-            cmd = f"sudo mysql < {sql_file} 2>/dev/null"
-            stdout, stderr, code = DatabaseManager.run_command(cmd)
+    MASTER_LOG_POS={log_pos}""",
+                "START SLAVE",
+            ]
+            for sql in slave_cmds:
+                _, stderr, code = DatabaseManager.query("mysql", sql)
+                if code != 0:
+                    break
             
             if code == 0:
                 Logger.success("Replikatsiya sozlandi")
@@ -2045,30 +5610,24 @@ class AdvancedSecurity:
         
         # Password policy
         if MySQLManager.check():
-            stdout, _, _ = DatabaseManager.run_command(
-                "sudo mysql -e \"SHOW VARIABLES LIKE 'validate_password%';\" 2>/dev/null"
-            )
-            if not stdout or 'validate_password' not in stdout:
+            rows, _, _ = DatabaseManager.query("mysql", "SHOW VARIABLES LIKE 'validate_password%'")
+            if not rows:
                 issues.append("❌ MySQL password validation o'rnatilmagan")
             else:
                 passed.append("✓ MySQL password validation o'rnatilgan")
         
         # SSL/TLS
         if MySQLManager.check():
-            stdout, _, _ = DatabaseManager.run_command(
-                "sudo mysql -e \"SHOW VARIABLES LIKE 'have_ssl';\" 2>/dev/null"
-            )
-            if 'YES' in stdout:
+            have_ssl = DatabaseManager.scalar("mysql", "SHOW VARIABLES LIKE 'have_ssl'")
+            if have_ssl == 'YES':
                 passed.append("✓ MySQL SSL/TLS yoqilgan")
             else:
                 issues.append("❌ MySQL SSL/TLS yoqilmagan")
         
         # PostgreSQL SSL
         if PostgreSQLManager.check():
-            stdout, _, _ = DatabaseManager.run_command(
-                "sudo -u postgres psql -c \"SHOW ssl;\" 2>/dev/null"
-            )
-            if 'on' in stdout.lower():
+            ssl = DatabaseManager.scalar("postgresql", "SHOW ssl")
+            if ssl and ssl.lower() == 'on':
                 passed.append("✓ PostgreSQL SSL yoqilgan")
             else:
                 issues.append("❌ PostgreSQL SSL yoqilmagan")
@@ -2213,7 +5772,7 @@ class AdvancedSecurity:
     
     @staticmethod
     def encrypt_database():
-        """Ma'lumotlar bazasini shifrlash"""
+        """Ma'lumotlar bazasini shifrlash (dump -> siqish -> AEAD, bitta oqimda)"""
         if not CRYPTOGRAPHY_AVAILABLE:
             Logger.error("cryptography kutubxonasi o'rnatilmagan")
             Logger.info("O'rnatish: pip3 install cryptography")
@@ -2223,34 +5782,17 @@ class AdvancedSecurity:
         dbname = UI.get_input("Database nomi")
         password = UI.get_password("Shifrlash paroli")
         
-        # Backup olish
+        # Backup shifrlangan holda yoziladi - ochiq nusxa diskka tushmaydi
         if db_type == 'mysql' and MySQLManager.check():
-            backup_file = MySQLManager.backup(dbname)
+            stats = MySQLManager.dump_database(dbname, password=password)
         elif db_type == 'postgresql' and PostgreSQLManager.check():
-            backup_file = PostgreSQLManager.backup(dbname)
+            stats = PostgreSQLManager.dump_database(dbname, password=password)
         else:
             Logger.error("Noto'g'ri database turi yoki o'rnatilmagan")
             return
         
-        if backup_file:
-            backup_path = Path(backup_file)
-            if backup_path.exists():
-                # Kalit yaratish
-                key = base64.urlsafe_b64encode(hashlib.sha256(password.encode()).digest())
-                cipher = Fernet(key)
-                
-                # Backupni shifrlash
-                with open(backup_path, 'rb') as file:
-                    data = file.read()
-                
-                encrypted_data = cipher.encrypt(data)
-                
-                encrypted_file = backup_path.with_suffix('.encrypted')
-                with open(encrypted_file, 'wb') as file:
-                    file.write(encrypted_data)
-                
-                backup_path.unlink()
-                Logger.success(f"Ma'lumotlar bazasi shifrlandi: {encrypted_file}")
+        if stats['ok']:
+            Logger.success(f"Ma'lumotlar bazasi shifrlandi: {stats['path']}")
     
     @staticmethod
     def decrypt_database():
@@ -2259,7 +5801,8 @@ class AdvancedSecurity:
             Logger.error("cryptography kutubxonasi o'rnatilmagan")
             return
         
-        encrypted_files = list(SSL_DIR.glob("*.encrypted"))
+        encrypted_files = sorted(BACKUP_DIR.glob(f"*{StreamCipher.EXTENSION}")) + \
+            sorted(BACKUP_DIR.glob("*.encrypted")) + sorted(SSL_DIR.glob("*.encrypted"))
         if not encrypted_files:
             Logger.error("Shifrlangan fayllar topilmadi")
             return
@@ -2274,19 +5817,28 @@ class AdvancedSecurity:
         
         password = UI.get_password("Shifr paroli")
         
-        # Kalit yaratish
-        key = base64.urlsafe_b64encode(hashlib.sha256(password.encode()).digest())
-        cipher = Fernet(key)
-        
         try:
-            with open(encrypted_file, 'rb') as file:
-                encrypted_data = file.read()
-            
-            decrypted_data = cipher.decrypt(encrypted_data)
-            
-            decrypted_file = encrypted_file.with_suffix('.sql.gz')
-            with open(decrypted_file, 'wb') as file:
-                file.write(decrypted_data)
+            if encrypted_file.suffix == StreamCipher.EXTENSION:
+                # Oqimli: bo'lakma-bo'lak autentifikatsiya va yozish, xotira sarfi doimiy
+                decrypted_file = encrypted_file.with_suffix('')
+                part_file = decrypted_file.with_name(decrypted_file.name + ".part")
+                try:
+                    with open(encrypted_file, 'rb') as raw, open(part_file, 'wb') as out:
+                        shutil.copyfileobj(DecryptingReader(raw, password), out, StreamCipher.CHUNK_SIZE)
+                except Exception:
+                    part_file.unlink(missing_ok=True)
+                    raise
+                part_file.replace(decrypted_file)
+            else:
+                # Eski (Fernet, butun fayl) format - faqat o'qish uchun qo'llab-quvvatlanadi
+                Fernet = OptionalDeps.load("cryptography.fernet").Fernet
+                key = base64.urlsafe_b64encode(hashlib.sha256(password.encode()).digest())
+                with open(encrypted_file, 'rb') as file:
+                    decrypted_data = Fernet(key).decrypt(file.read())
+                codec = Codec.detect(decrypted_data[:4])
+                decrypted_file = encrypted_file.with_name(encrypted_file.stem.removesuffix('.sql') + Codec.extension(codec))
+                with open(decrypted_file, 'wb') as file:
+                    file.write(decrypted_data)
             
             Logger.success(f"Fayl shifrdan chiqarildi: {decrypted_file}")
         except Exception as e:
@@ -2305,46 +5857,42 @@ class PerformanceAdvisor:
         if not MySQLManager.check():
             return recommendations
         
-        # Buffer pool hajmi
-        stdout, _, _ = DatabaseManager.run_command(
-            "sudo mysql -e \"SHOW VARIABLES LIKE 'innodb_buffer_pool_size';\" 2>/dev/null | grep -v Variable_name"
+        # Bitta so'rov bilan kerakli o'zgaruvchilar
+        rows, _, _ = DatabaseManager.query(
+            "mysql", "SHOW VARIABLES WHERE Variable_name IN ('innodb_buffer_pool_size', 'max_connections')"
         )
-        if stdout:
-            match = re.search(r'(\d+)', stdout)
-            if match:
-                current_size = int(match.group(1))
-                current_size_mb = current_size / (1024 * 1024)
-                
-                # RAM hajmi
-                if PSUTIL_AVAILABLE:
-                    total_ram = psutil.virtual_memory().total
-                    recommended_size = int(total_ram * 0.7)  # 70% of RAM
-                    recommended_size_mb = recommended_size / (1024 * 1024)
-                    
-                    if current_size < recommended_size * 0.8:
-                        recommendations.append({
-                            'parameter': 'innodb_buffer_pool_size',
-                            'current': f'{current_size_mb:.0f}MB',
-                            'recommended': f'{recommended_size_mb:.0f}MB',
-                            'reason': 'Buffer pool hajmi RAM ning 70% bo\'lishi kerak'
-                        })
+        variables = {row['Variable_name']: row['Value'] for row in rows}
         
-        # Connection pool
-        stdout, _, _ = DatabaseManager.run_command(
-            "sudo mysql -e \"SHOW VARIABLES LIKE 'max_connections';\" 2>/dev/null | grep -v Variable_name"
-        )
-        if stdout:
-            match = re.search(r'(\d+)', stdout)
-            if match:
-                max_conn = int(match.group(1))
-                if max_conn < 500:
+        # Buffer pool hajmi
+        if (variables.get('innodb_buffer_pool_size') or '').isdigit():
+            current_size = int(variables['innodb_buffer_pool_size'])
+            current_size_mb = current_size / (1024 * 1024)
+            
+            # RAM hajmi
+            if PSUTIL_AVAILABLE:
+                total_ram = psutil.virtual_memory().total
+                recommended_size = int(total_ram * 0.7)  # 70% of RAM
+                recommended_size_mb = recommended_size / (1024 * 1024)
+                
+                if current_size < recommended_size * 0.8:
                     recommendations.append({
-                        'parameter': 'max_connections',
-                        'current': str(max_conn),
-                        'recommended': '500',
-                        'reason': 'Ko\'p ulanishlar uchun max_connections ni oshirish kerak'
+                        'parameter': 'innodb_buffer_pool_size',
+                        'current': f'{current_size_mb:.0f}MB',
+                        'recommended': f'{recommended_size_mb:.0f}MB',
+                        'reason': 'Buffer pool hajmi RAM ning 70% bo\'lishi kerak'
                     })
         
+        # Connection pool
+        if (variables.get('max_connections') or '').isdigit():
+            max_conn = int(variables['max_connections'])
+            if max_conn < 500:
+                recommendations.append({
+                    'parameter': 'max_connections',
+                    'current': str(max_conn),
+                    'recommended': '500',
+                    'reason': 'Ko\'p ulanishlar uchun max_connections ni oshirish kerak'
+                })
+        
         return recommendations
     
     @staticmethod
@@ -2356,10 +5904,8 @@ class PerformanceAdvisor:
             return recommendations
         
         # Vacuum settings
-        stdout, _, _ = DatabaseManager.run_command(
-            "sudo -u postgres psql -c \"SHOW autovacuum;\" 2>/dev/null | grep -v autovacuum"
-        )
-        if 'on' not in stdout.lower():
+        autovacuum = DatabaseManager.scalar("postgresql", "SHOW autovacuum")
+        if (autovacuum or '').lower() != 'on':
             recommendations.append({
                 'parameter': 'autovacuum',
                 'current': 'off',
@@ -2407,7 +5953,9 @@ class MobileAPI:
             Logger.info("O'rnatish: pip3 install flask")
             return
         
-        app = Flask(__name__)
+        flask = OptionalDeps.load("flask")
+        request, jsonify = flask.request, flask.jsonify
+        app = flask.Flask(__name__)
         app.config['SECRET_KEY'] = os.urandom(24).hex()
         
         # Tokenlar saqlanadigan fayl
@@ -2475,7 +6023,8 @@ class MobileAPI:
                 'postgresql': PostgreSQLManager.check(),
                 'time': datetime.datetime.now().isoformat(),
                 'host': DatabaseManager.get_hostname(),
-                'ip': DatabaseManager.get_ip_address()
+                'ip': DatabaseManager.get_ip_address(),
+                'metrics': MonitoringManager.latest_stats()
             })
         
         port = int(UI.get_input("Mobile API port", "5001"))
@@ -2507,9 +6056,7 @@ class HealthChecker:
         # MySQL tekshiruvi
         if MySQLManager.check():
             # Ulanish testi
-            stdout, stderr, code = DatabaseManager.run_command(
-                "sudo mysql -e \"SELECT 1;\" 2>/dev/null"
-            )
+            rows, stderr, code = DatabaseManager.query("mysql", "SELECT 1 AS ok", timeout=10)
             if code == 0:
                 results['passed'].append("MySQL ulanish")
             else:
@@ -2517,9 +6064,7 @@ class HealthChecker:
         
         # PostgreSQL tekshiruvi
         if PostgreSQLManager.check():
-            stdout, stderr, code = DatabaseManager.run_command(
-                "sudo -u postgres psql -c \"SELECT 1;\" 2>/dev/null"
-            )
+            rows, stderr, code = DatabaseManager.query("postgresql", "SELECT 1 AS ok", timeout=10)
             if code == 0:
                 results['passed'].append("PostgreSQL ulanish")
             else:
@@ -2642,24 +6187,10 @@ class SLAMonitor:
             'total_checks': 0
         }
         
-        if PERFORMANCE_LOG.exists():
-            with open(PERFORMANCE_LOG, 'r', encoding='utf-8') as f:
-                for line in f:
-                    try:
-                        data = json.loads(line.strip())
-                        if 'timestamp' in data:
-                            check_time = datetime.datetime.fromisoformat(data['timestamp'])
-                            
-                            if check_time > start_date:
-                                uptime['total_checks'] += 1
-                                
-                                if 'mysql_connections' in data and data['mysql_connections']:
-                                    uptime['mysql'] += 1
-                                
-                                if 'postgresql_connections' in data and data['postgresql_connections']:
-                                    uptime['postgresql'] += 1
-                    except:
-                        continue
+        data = MetricsStore.columns(['mysql_connections', 'postgresql_connections'], since=start_date)
+        uptime['total_checks'] = len(data['ts'])
+        uptime['mysql'] = sum(1 for v in data['mysql_connections'] if v is not None)
+        uptime['postgresql'] = sum(1 for v in data['postgresql_connections'] if v is not None)
         
         print(f"{Colors.CYAN}{Colors.BOLD}=== SLA REPORT ({days} kun) ==={Colors.NC}\n")
         
@@ -2672,6 +6203,16 @@ class SLAMonitor:
             print(f"{Colors.GREEN}PostgreSQL Uptime:{Colors.NC} {pg_percent:.2f}%")
         else:
             print("Ma'lumotlar yetarli emas")
+        
+        # Resurs percentillari (rollup sketch'lari birlashtiriladi, xom namunalar skan qilinmaydi)
+        percentiles = MetricRollups.summary(['cpu', 'memory_percent', 'mysql_connections', 'postgresql_connections'],
+                                            start_date)
+        rows = [{'Metrika': name, 'p50': f"{stats['p50']:.2f}", 'p95': f"{stats['p95']:.2f}",
+                 'p99': f"{stats['p99']:.2f}", 'Maksimal': f"{stats['max']:.2f}"}
+                for name, stats in percentiles.items() if stats]
+        if rows:
+            print(f"\n{Colors.GREEN}Percentillar:{Colors.NC}")
+            UI.show_table(rows)
 
 # ============================================================================
 # 10. DATA MASKING & ANONYMIZATION
@@ -2753,8 +6294,9 @@ class CacheManager:
             if UI.confirm_action("Backup fayllar tozalansinmi?"):
                 days = int(UI.get_input("Necha kundan eski backup'lar o'chirilsin?", "7"))
                 cutoff = datetime.datetime.now() - datetime.timedelta(days=days)
-                for f in BACKUP_DIR.glob("*.sql.gz"):
-                    if datetime.datetime.fromtimestamp(f.stat().st_mtime) < cutoff:
+                keep = IncrementalBackup.referenced_files()
+                for f in Codec.backup_files():
+                    if str(f) not in keep and datetime.datetime.fromtimestamp(f.stat().st_mtime) < cutoff:
                         f.unlink()
                 Logger.success(f"{days} kundan eski backup'lar tozalandi")
         elif choice == "4":
@@ -2777,7 +6319,7 @@ class CacheManager:
         elif choice == "6":
             print(f"\n{Colors.CYAN}Kesh statistikasi:{Colors.NC}")
             print(f"📁 Log fayllar: {len(list(LOG_DIR.glob('*.log')))} ta")
-            print(f"📦 Backup fayllar: {len(list(BACKUP_DIR.glob('*.sql.gz')))} ta")
+            print(f"📦 Backup fayllar: {len(Codec.backup_files())} ta")
             print(f"🔧 Konfiguratsiya: {len(list(CONFIG_DIR.glob('*')))} ta")
             print(f"🗑️ Temp fayllar: {len(list(TEMP_DIR.glob('*')))} ta")
             print(f"🧹 Kesh fayllar: {len(list(CACHE_DIR.glob('*')))} ta")
@@ -2791,8 +6333,9 @@ class CacheManager:
                 with open(ERROR_LOG, 'w'): pass
                 with open(DEBUG_LOG, 'w'): pass
                 cutoff = datetime.datetime.now() - datetime.timedelta(days=1)
-                for f in BACKUP_DIR.glob("*.sql.gz"):
-                    if datetime.datetime.fromtimestamp(f.stat().st_mtime) < cutoff:
+                keep = IncrementalBackup.referenced_files()
+                for f in Codec.backup_files():
+                    if str(f) not in keep and datetime.datetime.fromtimestamp(f.stat().st_mtime) < cutoff:
                         f.unlink()
                 Logger.success("Barcha kesh va temp fayllar tozalandi")
 
@@ -2801,6 +6344,27 @@ class CacheManager:
 # ============================================================================
 
 class Utils:
+    @staticmethod
+    def get_cli_option(name, default=None):
+        """Komanda satridan `--name qiymat` yoki `--name=qiymat` ni olish"""
+        for i, arg in enumerate(sys.argv):
+            if arg == name and i + 1 < len(sys.argv):
+                return sys.argv[i + 1]
+            if arg.startswith(name + "="):
+                return arg.split("=", 1)[1]
+        return default
+    
+    @staticmethod
+    def parse_time(value):
+        """ISO vaqt yoki nisbiy qiymat (30m, 24h, 7d) -> datetime; None -> None"""
+        if not value:
+            return None
+        match = re.fullmatch(r'(\d+)([mhd])', value.strip())
+        if match:
+            unit = {'m': 'minutes', 'h': 'hours', 'd': 'days'}[match.group(2)]
+            return datetime.datetime.now() - datetime.timedelta(**{unit: int(match.group(1))})
+        return datetime.datetime.fromisoformat(value)
+    
     @staticmethod
     def system_info():
         UI.show_menu_header("TIZIM MA'LUMOTLARI")
@@ -2895,9 +6459,11 @@ class MainMenu:
             print("14) 🔄 Restore qilish")
             print("15) ⚡ Optimizatsiya")
             print("16) 📈 Sekin so'rovlar")
-            print("17) ◀️ Orqaga")
+            print("17) 🧩 Shardli backup (jadval bo'yicha)")
+            print("18) 🧩 Shardli restore (parallel)")
+            print("19) ◀️ Orqaga")
             
-            choice = UI.get_input("Tanlov", "17")
+            choice = UI.get_input("Tanlov", "19")
             
             if choice == "1":
                 MySQLManager.status()
@@ -2933,6 +6499,10 @@ class MainMenu:
             elif choice == "16":
                 MySQLManager.analyze_slow_queries()
             elif choice == "17":
+                MySQLManager.backup_sharded()
+            elif choice == "18":
+                MySQLManager.restore_sharded()
+            elif choice == "19":
                 break
             else:
                 Logger.error("Noto'g'ri tanlov")
@@ -2960,9 +6530,11 @@ class MainMenu:
             print("14) 🔄 Restore qilish")
             print("15) 🧹 Vacuum analyze")
             print("16) 📈 Sekin so'rovlar")
-            print("17) ◀️ Orqaga")
+            print("17) 🧩 Shardli backup (jadval bo'yicha)")
+            print("18) 🧩 Shardli restore (parallel)")
+            print("19) ◀️ Orqaga")
             
-            choice = UI.get_input("Tanlov", "17")
+            choice = UI.get_input("Tanlov", "19")
             
             if choice == "1":
                 PostgreSQLManager.status()
@@ -2998,6 +6570,10 @@ class MainMenu:
             elif choice == "16":
                 PostgreSQLManager.analyze_slow_queries()
             elif choice == "17":
+                PostgreSQLManager.backup_sharded()
+            elif choice == "18":
+                PostgreSQLManager.restore_sharded()
+            elif choice == "19":
                 break
             else:
                 Logger.error("Noto'g'ri tanlov")
@@ -3061,8 +6637,8 @@ class MainMenu:
             elif choice == "12":
                 AdvancedSecurity.decrypt_database()
             elif choice == "13":
-                days = int(UI.get_input("Trend kunlari", "7"))
-                EnhancedMonitoring.create_trend_graph(days)
+                days = UI.get_input("Trend kunlari (bir nechta: 1,7,30)", "7")
+                EnhancedMonitoring.create_trend_graph([int(day) for day in days.split(',') if day.strip()])
             elif choice == "14":
                 PredictiveAnalytics.detect_anomalies()
             elif choice == "15":
@@ -3119,24 +6695,128 @@ class MainMenu:
 # SKRIPTNI ISHGA TUSHIRISH
 # ============================================================================
 
+_STARTUP_DONE = time.perf_counter()
+
 if __name__ == "__main__":
     # Komanda satri argumentlarini qayta ishlash
     if len(sys.argv) > 1:
-        if sys.argv[1] == "--backup":
+        if sys.argv[1] == "--startup-profile":
+            OptionalDeps.profile_startup()
+            sys.exit(0)
+        elif sys.argv[1] == "--backup":
+            # --backup mysql|postgresql [--jobs N] [--bwlimit MB/s]
+            jobs = Utils.get_cli_option("--jobs")
+            bwlimit = Utils.get_cli_option("--bwlimit")
+            jobs = int(jobs) if jobs else None
+            bwlimit = float(bwlimit) if bwlimit else None
             if len(sys.argv) > 2:
                 if sys.argv[2] == "mysql":
-                    MySQLManager.backup_all()
+                    MySQLManager.backup_all(jobs, bwlimit)
                 elif sys.argv[2] == "postgresql":
-                    PostgreSQLManager.backup_all()
+                    PostgreSQLManager.backup_all(jobs, bwlimit)
+            sys.exit(0)
+        elif sys.argv[1] == "--restore":
+            # --restore mysql|postgresql <fayl> <db> [--resume]
+            if len(sys.argv) > 4:
+                ok = StreamingRestore.run(sys.argv[2], sys.argv[3], sys.argv[4], "--resume" in sys.argv)
+                sys.exit(0 if ok else 1)
+            sys.exit(0)
+        elif sys.argv[1] == "--compression-benchmark":
+            # --compression-benchmark [namuna_fayl] [--sample-mb N]
+            sample = sys.argv[2] if len(sys.argv) > 2 and not sys.argv[2].startswith("--") else None
+            Codec.benchmark(sample, float(Utils.get_cli_option("--sample-mb", 64)))
+            sys.exit(0)
+        elif sys.argv[1] == "--backup-incremental":
+            # --backup-incremental mysql <db> | postgresql  [--full | --differential]
+            mode = "full" if "--full" in sys.argv else "differential" if "--differential" in sys.argv else "incremental"
+            if len(sys.argv) > 2:
+                dbname = sys.argv[3] if len(sys.argv) > 3 and not sys.argv[3].startswith("--") else None
+                IncrementalBackup.backup(sys.argv[2], dbname, mode)
+                IncrementalBackup.show_chain(sys.argv[2], dbname)
+            sys.exit(0)
+        elif sys.argv[1] == "--restore-chain":
+            # --restore-chain mysql <db> | postgresql  [--until N] [--db nom] [--output katalog]
+            until = Utils.get_cli_option("--until")
+            if len(sys.argv) > 2:
+                dbname = sys.argv[3] if len(sys.argv) > 3 and not sys.argv[3].startswith("--") else None
+                ok = IncrementalBackup.restore(sys.argv[2], dbname, int(until) if until else None,
+                                               Utils.get_cli_option("--db"), Utils.get_cli_option("--output"))
+                sys.exit(0 if ok else 1)
+            sys.exit(0)
+        elif sys.argv[1] == "--dedup":
+            # --dedup backup mysql|postgresql <db> | list [db] | restore <id> [--db nom] | prune [kun] | stats
+            action = sys.argv[2] if len(sys.argv) > 2 else "list"
+            arg = sys.argv[3] if len(sys.argv) > 3 and not sys.argv[3].startswith("--") else None
+            if action == "backup" and len(sys.argv) > 4:
+                DedupStore.backup(sys.argv[3], sys.argv[4])
+            elif action == "restore" and arg:
+                sys.exit(0 if DedupStore.restore(int(arg), Utils.get_cli_option("--db")) else 1)
+            elif action == "prune":
+                DedupStore.prune(int(arg) if arg else None)
+            elif action == "stats":
+                DedupStore.stats()
+            else:
+                DedupStore.list_backups(arg)
+            sys.exit(0)
+        elif sys.argv[1] == "--backup-sharded":
+            # --backup-sharded mysql|postgresql <db> [--jobs N]
+            jobs = Utils.get_cli_option("--jobs")
+            if len(sys.argv) > 3:
+                ShardedBackup.backup(sys.argv[2], sys.argv[3], int(jobs) if jobs else None)
+            sys.exit(0)
+        elif sys.argv[1] == "--restore-sharded":
+            # --restore-sharded <katalog> [--db nom] [--jobs N]
+            jobs = Utils.get_cli_option("--jobs")
+            if len(sys.argv) > 2:
+                ok = ShardedBackup.restore(sys.argv[2], Utils.get_cli_option("--db"), int(jobs) if jobs else None)
+                sys.exit(0 if ok else 1)
             sys.exit(0)
         elif sys.argv[1] == "--monitor":
             MonitoringManager.monitor_realtime()
             sys.exit(0)
+        elif sys.argv[1] == "--analyze":
+            # --analyze [--since 7d|2024-01-01T00:00] [--until ...]
+            MonitoringManager.analyze_performance(Utils.parse_time(Utils.get_cli_option("--since")),
+                                                  Utils.parse_time(Utils.get_cli_option("--until")))
+            sys.exit(0)
+        elif sys.argv[1] == "--migrate-performance-log":
+            # Eski performance.log -> segmentli ombor (bir martalik)
+            MetricsSchema.migrate_legacy_log(sys.argv[2] if len(sys.argv) > 2 else None)
+            sys.exit(0)
+        elif sys.argv[1] == "--rollup-rebuild":
+            # --rollup-rebuild [--since 7d] [--until ...] (standart: barcha xom segmentlar)
+            MetricRollups.rebuild(Utils.parse_time(Utils.get_cli_option("--since")),
+                                  Utils.parse_time(Utils.get_cli_option("--until")))
+            sys.exit(0)
+        elif sys.argv[1] == "--rollup-backfill":
+            # Eski rollups.db: sketch/sumsq ustunlarini xom segmentlardan to'ldirish
+            MetricRollups.backfill()
+            sys.exit(0)
+        elif sys.argv[1] == "--size-snapshot":
+            # Cron uchun: DB/jadval hajmlarini tarixga yozish
+            SizeHistory.collect()
+            sys.exit(0)
+        elif sys.argv[1] == "--collector":
+            MetricsCollector().run()
+            sys.exit(0)
         elif sys.argv[1] == "--health":
             HealthChecker.run_health_check()
             sys.exit(0)
         elif sys.argv[1] == "--dashboard":
-            EnhancedMonitoring.create_dashboard()
+            if len(sys.argv) > 2 and sys.argv[2] == "html":
+                hours = int(Utils.get_cli_option("--hours", 24))
+                interval = Utils.get_cli_option("--watch")
+                if interval:
+                    HtmlDashboard.watch(float(interval), hours)
+                else:
+                    HtmlDashboard.generate(hours)
+                    Logger.success(f"Dashboard yaratildi: {HtmlDashboard.FILE}")
+            else:
+                EnhancedMonitoring.create_dashboard()
+            sys.exit(0)
+        elif sys.argv[1] == "--trend":
+            days = sys.argv[2] if len(sys.argv) > 2 else "7"
+            EnhancedMonitoring.create_trend_graph([int(day) for day in days.split(',') if day.strip()])
             sys.exit(0)
         elif sys.argv[1] == "--predict":
             days = int(sys.argv[2]) if len(sys.argv) > 2 else 30
@@ -30,6 +30,7 @@ def main():
     )
     
     if mysql_db.connect():
+        mysql_db.ensure_schema()
         # Test user yaratish
         print(f"\n{Colors.CYAN}1. Test user yaratish:{Colors.NC}")
         user1 = mysql_db.create_user(123456789, 100.50)
@@ -84,6 +85,7 @@ def main():
     )
     
     if pg_db.connect():
+        pg_db.ensure_schema()
         # Bir nechta user yaratish
         print(f"\n{Colors.CYAN}1. Bir nechta user yaratish:{Colors.NC}")
         pg_db.create_user(111111, 1000)
@@ -0,0 +1,21 @@
+import importlib.util
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(scope="session")
+def sdb(tmp_path_factory):
+    """settingsdbpro moduli: import paytida yaratiladigan db_* papkalar vaqtinchalik katalogda bo'ladi"""
+    workdir = tmp_path_factory.mktemp("settingsdbpro")
+    shutil.copy(ROOT / "settingsdbpro.py", workdir / "settingsdbpro.py")
+    spec = importlib.util.spec_from_file_location("settingsdbpro", workdir / "settingsdbpro.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["settingsdbpro"] = module
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,231 @@
+import io
+import contextlib
+import threading
+from decimal import Decimal
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+import db_manager  # noqa: E402
+from db_manager import DatabaseManager  # noqa: E402
+
+
+def make_manager(path, db_type='postgresql', **kwargs):
+    """SQLite ustida DatabaseManager: db_type 'postgresql' - RETURNING yo'li, 'mysql' - UPDATE + SELECT yo'li"""
+    db = DatabaseManager(db_type=db_type, **kwargs)
+    db.connection_string = f"sqlite:///{path}"
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert db.connect()
+    db.ensure_schema()
+    return db
+
+
+@pytest.fixture(params=['postgresql', 'mysql'])
+def db(request, tmp_path):
+    manager = make_manager(tmp_path / "balances.db", request.param)
+    yield manager
+    DatabaseManager.dispose_engines()
+
+
+def quiet(fn, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def test_update_balance_uses_decimal(db):
+    quiet(db.create_user, 1, 0)
+    for _ in range(10):
+        quiet(db.add_money, 1, 0.1)
+    user = quiet(db.subtract_money, 1, '0.005')
+    assert user.balans == Decimal('0.99')
+    assert db.get_user(1).balans == Decimal('0.99')
+
+
+def test_update_balance_rejects_overdraft_and_missing_user(db):
+    quiet(db.create_user, 1, 10)
+    assert quiet(db.subtract_money, 1, 10.01) is None
+    assert quiet(db.add_money, 999, 1) is None
+    assert db.get_user(1).balans == Decimal('10.00')
+
+
+@pytest.mark.parametrize('atomic', [True, False])
+def test_update_balance_rejects_unknown_operation(db, atomic):
+    quiet(db.create_user, 1, 10)
+    with pytest.raises(ValueError):
+        db.update_balance(1, 5, 'ad', atomic=atomic)
+    assert db.get_user(1).balans == Decimal('10.00')
+
+
+def test_concurrent_add_money_loses_no_updates(db):
+    quiet(db.create_user, 1, 0)
+
+    def worker():
+        for _ in range(25):
+            db.add_money(1, '0.10')
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert db.get_user(1).balans == Decimal('20.00')
+
+
+def test_transfer_money_moves_funds_and_validates(db):
+    quiet(db.create_user, 1, 100)
+    quiet(db.create_user, 2, 0)
+    assert quiet(db.transfer_money, 1, 2, '30.005') is True
+    assert (db.get_user(1).balans, db.get_user(2).balans) == (Decimal('69.99'), Decimal('30.01'))
+    assert quiet(db.transfer_money, 1, 2, 1000) is False
+    assert quiet(db.transfer_money, 1, 999, 1) is False
+    assert quiet(db.transfer_money, 1, 1, 1) is False
+    assert quiet(db.transfer_money, 1, 2, -5) is False
+    assert (db.get_user(1).balans, db.get_user(2).balans) == (Decimal('69.99'), Decimal('30.01'))
+
+
+def test_concurrent_opposite_transfers_conserve_total(db):
+    for chat_id in (1, 2):
+        quiet(db.create_user, chat_id, 100)
+
+    def worker(source, target):
+        for _ in range(20):
+            db.transfer_money(source, target, 1)
+
+    threads = [threading.Thread(target=worker, args=pair) for pair in [(1, 2), (2, 1)] * 3]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert db.get_user(1).balans + db.get_user(2).balans == Decimal('200.00')
+    assert db.get_user(1).balans == Decimal('100.00')
+
+
+def test_transfer_many_reports_per_item_status_and_accepts_generators(db):
+    for chat_id in (1, 2, 3):
+        quiet(db.create_user, chat_id, 10)
+    transfers = [(1, 2, 5), (1, 2, 6), (2, 3, 11), (3, 3, 1), (4, 1, 1), (1, 3, 0)]
+    results = quiet(db.transfer_many, (item for item in transfers), batch_size=4)
+
+    assert [item['status'] for item in results] == [
+        'ok', 'insufficient_funds', 'ok', 'same_account', 'not_found', 'invalid_amount']
+    assert [db.get_user(chat_id).balans for chat_id in (1, 2, 3)] == [
+        Decimal('5.00'), Decimal('4.00'), Decimal('21.00')]
+
+
+@pytest.fixture
+def pg_db(tmp_path):
+    """ON CONFLICT sintaksisi SQLite da ham ishlaydi - PostgreSQL upsert yo'li"""
+    manager = make_manager(tmp_path / "bulk.db", 'postgresql')
+    yield manager
+    DatabaseManager.dispose_engines()
+
+
+def test_bulk_create_users_counts_written_rows(pg_db):
+    quiet(pg_db.create_user, 1, 50)
+    report = quiet(pg_db.bulk_create_users, [1, 2, 2, (3, 7), 4], initial_balance=5,
+                   batch_size=3, use_copy=False)
+
+    # (1, 2, 2) paketida takroriy 2 bitta qator sifatida yuboriladi
+    assert report['rows'] == 4
+    assert [pg_db.get_user(chat_id).balans for chat_id in (1, 2, 3, 4)] == [
+        Decimal('50.00'), Decimal('5.00'), Decimal('7.00'), Decimal('5.00')]
+
+
+def test_bulk_upsert_balances_updates_existing_rows(pg_db):
+    quiet(pg_db.create_user, 1, 50)
+    report = quiet(pg_db.bulk_upsert_balances, {1: '7.5', 2: 3}, use_copy=False)
+    assert report['rows'] == 2
+    assert (pg_db.get_user(1).balans, pg_db.get_user(2).balans) == (Decimal('7.50'), Decimal('3.00'))
+
+
+def test_create_or_update_returns_existing_user_unchanged(pg_db):
+    created = quiet(pg_db.create_or_update, 1, 10)
+    before = pg_db.get_user(1)
+    existing = quiet(pg_db.create_or_update, 1, 99)
+
+    assert created.chat_id == existing.chat_id == 1
+    assert existing.balans == Decimal('10.00')
+    assert existing.id == before.id
+    assert pg_db.get_user(1).updated_at == before.updated_at
+
+
+def test_engines_are_shared_per_url_and_pool_options(tmp_path):
+    path = tmp_path / "pool.db"
+    first = make_manager(path, pool_size=2)
+    second = make_manager(path, pool_size=2)
+    third = make_manager(path, pool_size=4)
+    try:
+        assert first.engine is second.engine
+        assert third.engine is not first.engine
+        assert third.engine.pool.size() == 4
+    finally:
+        DatabaseManager.dispose_engines()
+
+
+def test_pool_stats_separates_timeouts_from_connect_errors(tmp_path):
+    db = make_manager(tmp_path / "pool.db", pool_size=1, max_overflow=0, pool_timeout=0.1)
+    broken = DatabaseManager(db_type='postgresql', pool_size=1, max_overflow=0)
+    broken.connection_string = f"sqlite:///{tmp_path / 'missing' / 'x.db'}"
+    try:
+        held = db.engine.connect()
+        with pytest.raises(db_manager.PoolTimeoutError):
+            db.engine.connect()
+        held.close()
+        stats = db.pool_stats()
+        assert (stats['timeouts'], stats['connect_errors']) == (1, 0)
+
+        assert quiet(broken.connect) is False
+        stats = broken.pool_stats()
+        assert (stats['timeouts'], stats['connect_errors']) == (0, 1)
+    finally:
+        DatabaseManager.dispose_engines()
+
+
+def test_get_statistics_single_query_and_ttl_cache(tmp_path):
+    db = make_manager(tmp_path / "stats.db", stats_ttl=60)
+    try:
+        quiet(db.create_user, 1, 10)
+        quiet(db.create_user, 2, 30)
+        stats = db.get_statistics()
+        assert stats['cached'] is False
+        assert (stats['total_users'], stats['total_balance'], stats['max_balance'],
+                stats['min_balance'], stats['avg_balance']) == (2, 40.0, 30.0, 10.0, 20.0)
+        assert db.get_statistics()['cached'] is True
+        assert db.get_statistics(max_age=0)['cached'] is False
+
+        quiet(db.add_money, 1, 5)
+        stats = db.get_statistics()
+        assert stats['cached'] is False and stats['total_balance'] == 45.0
+    finally:
+        DatabaseManager.dispose_engines()
+
+
+def test_get_statistics_does_not_cache_result_raced_by_commit(tmp_path, monkeypatch):
+    db = make_manager(tmp_path / "stats.db", stats_ttl=60)
+    try:
+        quiet(db.create_user, 1, 10)
+        get_session = db.get_session
+
+        def racing_session():
+            session = get_session()
+            execute = session.execute
+
+            def execute_then_commit(*args, **kwargs):
+                result = execute(*args, **kwargs)
+                # agregat so'rov tugagach, natija keshlanishidan oldin boshqa sessiya commit qiladi
+                # (after_commit hodisasi invalidate_statistics ni chaqiradi)
+                db.invalidate_statistics()
+                return result
+
+            session.execute = execute_then_commit
+            return session
+
+        monkeypatch.setattr(db, "get_session", racing_session)
+        assert db.get_statistics()['cached'] is False
+        monkeypatch.setattr(db, "get_session", get_session)
+        assert db.get_statistics()['cached'] is False
+    finally:
+        DatabaseManager.dispose_engines()
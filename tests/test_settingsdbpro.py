@@ -0,0 +1,813 @@
+import io
+import json
+import os
+import random
+import sqlite3
+import sys
+import textwrap
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+
+FAKE_MYSQL = textwrap.dedent(r'''
+    import re, sys, time
+    pending = None
+    for line in sys.stdin:
+        line = line.strip()
+        marker = re.match(r"SELECT 1 AS `(.*)`;", line)
+        if marker:
+            print(marker.group(1)); print(1); sys.stdout.flush()
+            if pending:
+                # stderr stdout markeridan kechikib keladi
+                time.sleep(0.3)
+                sys.stderr.write(pending + "\n"); sys.stderr.flush()
+                pending = None
+        elif line.startswith("\\! echo "):
+            sys.stderr.write(line[len("\\! echo "):].split(" ")[0] + "\n"); sys.stderr.flush()
+        elif "BAD" in line:
+            pending = "ERROR 1064 (42000) at line 1: syntax error"
+        elif line.startswith("SELECT 42"):
+            print("v"); print(42); sys.stdout.flush()
+        elif line.startswith("SELECT 7"):
+            print("w"); print(7); sys.stdout.flush()
+        elif line.startswith("SELECT CONCAT"):
+            print("r")
+            for i in range(25000):
+                print(f"({i},'a\\nb')")
+            sys.stdout.flush()
+''')
+
+
+@pytest.fixture
+def fake_session(sdb, tmp_path):
+    script = tmp_path / "fake_mysql.py"
+    script.write_text(FAKE_MYSQL)
+    session = sdb.DBSession("mysql")
+    session._command = lambda: [sys.executable, str(script)]
+    yield session
+    session.close()
+
+
+def test_dbsession_late_stderr_belongs_to_its_query(fake_session):
+    rows, errors, code = fake_session.query("SELECT BAD", timeout=10)
+    assert code == 1
+    assert "ERROR 1064" in errors
+
+    rows, errors, code = fake_session.query("SELECT 42 AS v", timeout=10)
+    assert (rows, errors, code) == ([{'v': '42'}], '', 0)
+
+
+def test_dbsession_multi_statement_keeps_result_set_headers(fake_session):
+    rows, errors, code = fake_session.query("SET @a = 1; SELECT 42 AS v; SELECT 7 AS w", timeout=10)
+    assert (rows, errors, code) == ([{'v': '42'}, {'w': '7'}], '', 0)
+
+    errors, code = fake_session.stream("SELECT 42 AS v; SELECT 7 AS w", lambda value: None)
+    assert code == 1
+
+
+def test_dbsession_split_ignores_quoted_semicolons(sdb):
+    sql = "SELECT 'a;b', `c;d` -- x;y\nFROM t; /* ; */ SELECT 'it\\'s;'; "
+    assert sdb.DBSession.split(sql, "mysql") == ["SELECT 'a;b', `c;d` -- x;y\nFROM t", "/* ; */ SELECT 'it\\'s;'"]
+    body = "CREATE FUNCTION f() RETURNS int AS $$ BEGIN RETURN 1; END $$ LANGUAGE plpgsql; SELECT 1"
+    assert sdb.DBSession.split(body, "postgresql") == [body[:body.index(" LANGUAGE")] + " LANGUAGE plpgsql", "SELECT 1"]
+
+
+class _FailingWriter:
+    """Ikkinchi yozishda ENOSPC beradigan siquvchi o'rnini bosuvchi"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def write(self, data):
+        self.calls += 1
+        if self.calls == 2:
+            # o'quvchi thread navbatni to'ldirib, put() da bloklanib qolishiga ulgursin
+            time.sleep(0.5)
+            raise OSError(28, "No space left on device")
+        return len(data)
+
+
+def test_backup_pipeline_failing_writer_does_not_hang(sdb, tmp_path, monkeypatch):
+    monkeypatch.setattr(sdb.Codec, "writer", staticmethod(lambda raw, codec=None: _FailingWriter()))
+    cmd = [sys.executable, "-c", "import sys; sys.stdout.buffer.write(b'x' * 64 * 1024 * 1024)"]
+    target = tmp_path / "dump.sql.gz"
+    result = {}
+    worker = threading.Thread(target=lambda: result.update(sdb.BackupPipeline.run(cmd, target, codec="gz")),
+                              daemon=True)
+    worker.start()
+    worker.join(timeout=20)
+
+    assert not worker.is_alive(), "BackupPipeline.run osilib qoldi"
+    assert result['ok'] is False
+    assert "No space left" in result['error']
+    assert not target.exists()
+    assert not (tmp_path / "dump.sql.gz.part").exists()
+
+
+class _SnapshotSession:
+    """pg_export_snapshot sessiyasini taqlid qiluvchi DBSession o'rnini bosuvchi"""
+    instances = []
+
+    def __init__(self, db_type, dbname=None):
+        self.queries = []
+        self.closed = False
+        _SnapshotSession.instances.append(self)
+
+    def query(self, sql, timeout=60):
+        self.queries.append(sql)
+        if "pg_export_snapshot" in sql:
+            return [{'id': '00000003-0000001B-1'}], '', 0
+        if "FROM pg_tables" in sql:
+            return [{'name': 'public.a', 'size': '10'}, {'name': 'public.b', 'size': '5'}], '', 0
+        if "UNION ALL" in sql:
+            return [{'i': '0', 'n': '7'}, {'i': '1', 'n': '3'}], '', 0
+        return [], '', 0
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def sharded_env(sdb, tmp_path, monkeypatch):
+    commands = []
+
+    def fake_run(cmd, target, limiter=None, codec=None, password=None):
+        commands.append(cmd)
+        target.write_bytes(b"")
+        return {'ok': True, 'bytes_in': 0, 'bytes_written': 0, 'error': ''}
+
+    _SnapshotSession.instances = []
+    monkeypatch.setattr(sdb, "BACKUP_DIR", tmp_path)
+    monkeypatch.setattr(sdb, "DBSession", _SnapshotSession)
+    monkeypatch.setattr(sdb.BackupPipeline, "run", staticmethod(fake_run))
+    monkeypatch.setattr(sdb.Codec, "configured", staticmethod(lambda: "none"))
+    return commands
+
+
+def test_sharded_backup_postgresql_uses_one_snapshot(sdb, sharded_env, monkeypatch):
+    monkeypatch.setattr(sdb.DatabaseManager, "query", staticmethod(
+        lambda *args, **kwargs: pytest.fail("snapshot'dan tashqarida so'rov")))
+    target = sdb.ShardedBackup.backup("postgresql", "shop", workers=2)
+
+    assert target
+    assert len(sharded_env) == 4  # schema, post, 2 ta jadval
+    assert all("--snapshot=00000003-0000001B-1" in cmd for cmd in sharded_env)
+    session = _SnapshotSession.instances[0]
+    assert session.queries[0].startswith("BEGIN ISOLATION LEVEL REPEATABLE READ")
+    assert any("UNION ALL" in sql for sql in session.queries)
+    assert session.closed
+    manifest = json.loads((Path(target) / "manifest.json").read_text())
+    assert {e['name']: e['rows'] for e in manifest['tables']} == {'public.a': 7, 'public.b': 3}
+
+
+class _MySQLSession:
+    """MySQL worker/qulf sessiyalarini taqlid qiluvchi DBSession; hodisalar umumiy jurnalga yoziladi"""
+    events = []
+    instances = []
+
+    def __init__(self, db_type, dbname=None):
+        self.id = len(_MySQLSession.instances)
+        self.snapshot = False
+        self.closed = False
+        _MySQLSession.instances.append(self)
+
+    def query(self, sql, timeout=60):
+        _MySQLSession.events.append((self.id, sql))
+        if sql.startswith("START TRANSACTION"):
+            self.snapshot = True
+        if "information_schema.tables" in sql:
+            return [{'name': 't1', 'size': '10'}, {'name': 't2', 'size': '5'}], '', 0
+        if "information_schema.columns" in sql:
+            return [{'name': 'id', 'type': 'int'}, {'name': 'name', 'type': 'varchar'},
+                    {'name': 'data', 'type': 'blob'}], '', 0
+        if "UNION ALL" in sql:
+            assert self.snapshot
+            return [{'i': '0', 'n': '2'}, {'i': '1', 'n': '2'}], '', 0
+        return [], '', 0
+
+    def stream(self, sql, sink, timeout=600):
+        assert self.snapshot, "ma'lumot snapshot'dan tashqarida o'qildi"
+        _MySQLSession.events.append((self.id, sql))
+        for value in ("r", "(1,'a',X'00ff')", "(2,'b\\'c',NULL)"):
+            sink(value)
+        return '', 0
+
+    def close(self):
+        self.closed = True
+
+
+def test_sharded_backup_mysql_dumps_inside_shared_snapshot(sdb, sharded_env, monkeypatch):
+    _MySQLSession.events, _MySQLSession.instances = [], []
+    monkeypatch.setattr(sdb, "DBSession", _MySQLSession)
+    monkeypatch.setattr(sdb.DatabaseManager, "query", staticmethod(
+        lambda *args, **kwargs: pytest.fail("snapshot'dan tashqarida so'rov")))
+    monkeypatch.setattr(sdb.ShardedBackup, "_dump_schema", staticmethod(lambda *args: None))
+    target = sdb.ShardedBackup.backup("mysql", "shop", workers=2)
+
+    assert target
+    assert sharded_env == []  # mysqldump ishlatilmaydi
+    sqls = [sql for _, sql in _MySQLSession.events]
+    lock_at, unlock_at = sqls.index("FLUSH TABLES WITH READ LOCK"), sqls.index("UNLOCK TABLES")
+    starts = [i for i, sql in enumerate(sqls) if sql.startswith("START TRANSACTION WITH CONSISTENT SNAPSHOT")]
+    assert len(starts) == 2 and all(lock_at < i < unlock_at for i in starts)
+    streamed = [i for i, sql in enumerate(sqls) if sql.startswith("SELECT CONCAT")]
+    assert len(streamed) == 2 and min(streamed) > unlock_at
+    assert all(session.closed for session in _MySQLSession.instances)
+
+    manifest = json.loads((Path(target) / "manifest.json").read_text())
+    assert {e['name']: e['rows'] for e in manifest['tables']} == {'t1': 2, 't2': 2}
+    data = (Path(target) / manifest['tables'][0]['file']).read_text()
+    assert data.startswith("SET NAMES utf8mb4;")
+    assert "INSERT INTO `t1` (`id`, `name`, `data`) VALUES (1,'a',X'00ff'),\n(2,'b\\'c',NULL);" in data
+
+
+def test_mysql_incremental_ends_at_start_of_rotated_binlog(sdb, tmp_path, monkeypatch):
+    commands = []
+
+    def fake_query(db_type, sql, dbname=None, timeout=60):
+        if sql.startswith("SHOW MASTER STATUS"):
+            # FLUSH dan keyin yangi faylga allaqachon hodisalar yozilgan
+            return [{'File': 'binlog.000005', 'Position': '999'}], '', 0
+        if sql.startswith("SHOW BINARY LOGS"):
+            return [{'Log_name': f'binlog.00000{i}'} for i in (3, 4, 5)], '', 0
+        return [], '', 0
+
+    def fake_run(cmd, target, limiter=None, codec=None, password=None):
+        commands.append(cmd)
+        return {'ok': True, 'bytes_in': 0, 'bytes_written': 0, 'error': ''}
+
+    monkeypatch.setattr(sdb.DatabaseManager, "query", staticmethod(fake_query))
+    monkeypatch.setattr(sdb.BackupPipeline, "run", staticmethod(fake_run))
+    start = {'file': 'binlog.000003', 'pos': 157}
+    _, first, end = sdb.IncrementalBackup._mysql_incremental("shop", tmp_path / "inc.sql.gz", start)
+
+    assert first == start
+    assert end == {'file': 'binlog.000005', 'pos': 4}
+    assert commands[0][-2:] == ['binlog.000003', 'binlog.000004']
+    assert "--start-position=157" in commands[0]
+
+
+@pytest.mark.parametrize("codec", ["gz", "zstd", "lz4", "none"])
+def test_codec_detects_magic_and_round_trips(sdb, codec):
+    module = sdb.Codec.MODULES.get(codec)
+    if module:
+        pytest.importorskip(module)
+    payload = b"INSERT INTO users VALUES (1, 'a');\n" * 5000
+    raw = io.BytesIO()
+    with sdb.Codec.writer(raw, codec, sdb.Codec.DEFAULT_LEVELS[codec], 1) as out:
+        out.write(payload)
+
+    assert sdb.Codec.detect(raw.getvalue()[:8]) == codec
+    raw.seek(0)
+    assert sdb.Codec.reader(io.BufferedReader(raw)).read() == payload
+
+
+def test_codec_is_backup_accepts_only_sql_artifacts(sdb):
+    names = ["a.sql", "a.sql.gz", "a.sql.zst", "a.sql.lz4", "a.sql.zst.enc", "a.sql.gz.part", "a.txt"]
+    assert [sdb.Codec.is_backup(Path(n)) for n in names] == [True, True, True, True, True, False, False]
+
+
+@pytest.fixture
+def small_chunks(sdb, monkeypatch):
+    pytest.importorskip("cryptography")
+    monkeypatch.setattr(sdb.StreamCipher, "CHUNK_SIZE", 1024)
+    # Testda scrypt'ni yengillashtirish
+    monkeypatch.setattr(sdb.StreamCipher, "SCRYPT_N_LOG2", 10)
+    return sdb.StreamCipher
+
+
+def _encrypt(sdb, payload, password="secret", workers=2):
+    raw = io.BytesIO()
+    with sdb.EncryptingWriter(raw, password, workers) as out:
+        out.write(payload)
+    return raw.getvalue()
+
+
+def _decrypt(sdb, data, password="secret"):
+    return sdb.DecryptingReader(io.BytesIO(data), password).read()
+
+
+@pytest.mark.parametrize("size", [0, 1000, 1024, 10 * 1024 + 7])
+def test_encryption_round_trip(sdb, small_chunks, size):
+    payload = bytes(range(256)) * (size // 256) + b"x" * (size % 256)
+    data = _encrypt(sdb, payload)
+
+    assert data.startswith(small_chunks.MAGIC)
+    assert not payload or payload not in data
+    assert _decrypt(sdb, data) == payload
+
+
+def test_encryption_rejects_wrong_password(sdb, small_chunks):
+    data = _encrypt(sdb, b"secret rows" * 100)
+    with pytest.raises(IOError, match="autentifikatsiya"):
+        _decrypt(sdb, data, "wrong")
+
+
+def test_encryption_detects_flipped_byte(sdb, small_chunks):
+    data = bytearray(_encrypt(sdb, b"a" * 5000))
+    data[small_chunks.HEADER.size + 10] ^= 1
+    with pytest.raises(IOError, match="0-bo'lak"):
+        _decrypt(sdb, bytes(data))
+
+
+def test_encryption_detects_truncation_and_reordering(sdb, small_chunks):
+    data = _encrypt(sdb, bytes(5000))
+    header = small_chunks.HEADER.size
+    record = 4 + 1024 + 16
+
+    # Butun bo'lak chegarasida kesilgan fayl: oxirgi bo'lak yo'q
+    with pytest.raises(IOError, match="kesilgan"):
+        _decrypt(sdb, data[:header + 2 * record])
+
+    swapped = data[:header] + data[header + record:header + 2 * record] \
+        + data[header:header + record] + data[header + 2 * record:]
+    with pytest.raises(IOError, match="0-bo'lak"):
+        _decrypt(sdb, swapped)
+
+
+def test_codec_reader_decrypts_container(sdb, small_chunks, monkeypatch):
+    raw = io.BytesIO()
+    with sdb.EncryptingWriter(raw, "secret", 1) as encrypted:
+        with sdb.Codec.writer(encrypted, "gz", 6, 1) as out:
+            out.write(b"SELECT 1;\n" * 1000)
+    monkeypatch.setattr(small_chunks, "_password", "secret")
+    raw.seek(0)
+    assert sdb.Codec.reader(io.BufferedReader(raw)).read() == b"SELECT 1;\n" * 1000
+
+
+def test_parse_time_accepts_iso_and_relative_values(sdb):
+    parse = sdb.Utils.parse_time
+    assert parse(None) is None
+    assert parse("") is None
+    assert parse("2024-05-01T12:30:00") == sdb.datetime.datetime(2024, 5, 1, 12, 30)
+
+    now = sdb.datetime.datetime.now()
+    for value, delta in (("30m", {'minutes': 30}), ("24h", {'hours': 24}), (" 7d ", {'days': 7})):
+        expected = now - sdb.datetime.timedelta(**delta)
+        assert abs((parse(value) - expected).total_seconds()) < 5
+
+    with pytest.raises(ValueError):
+        parse("yesterday")
+
+
+def _exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def test_quantile_sketch_is_within_relative_error(sdb):
+    rng = random.Random(7)
+    values = [rng.lognormvariate(3, 1.5) for _ in range(20000)]
+    sketch = sdb.QuantileSketch()
+    for value in values:
+        sketch.add(value)
+
+    assert sketch.count == len(values)
+    for q in (0.5, 0.9, 0.99):
+        exact = _exact_quantile(values, q)
+        assert abs(sketch.quantile(q) - exact) <= sdb.QuantileSketch.ALPHA * exact * 1.01
+
+
+def test_quantile_sketch_merge_and_serialization(sdb):
+    whole, left, right = sdb.QuantileSketch(), sdb.QuantileSketch(), sdb.QuantileSketch()
+    for i in range(1000):
+        value = 0 if i % 10 == 0 else i * 0.5
+        whole.add(value)
+        (left if i % 2 else right).add(value)
+
+    merged = sdb.QuantileSketch.from_bytes(left.to_bytes()).merge(sdb.QuantileSketch.from_bytes(right.to_bytes()))
+    assert merged.count == whole.count == 1000
+    assert merged.zero == whole.zero == 100
+    assert merged.bins == whole.bins
+    assert merged.quantile(0.05) == 0.0
+    assert merged.quantile(0.5) == whole.quantile(0.5)
+    assert sdb.QuantileSketch().quantile(0.5) is None
+
+
+def test_lttb_keeps_endpoints_and_peaks(sdb):
+    np = pytest.importorskip("numpy")
+    ts = np.arange(1000, dtype=float)
+    values = np.sin(ts / 50.0)
+    values[437] = 10.0
+    values[811] = -10.0
+
+    out_ts, out_values = sdb.EnhancedMonitoring.lttb(ts, values, 100)
+    assert len(out_ts) == len(out_values) == 100
+    assert out_ts[0] == 0 and out_ts[-1] == 999
+    assert np.all(np.diff(out_ts) > 0)
+    assert 437 in out_ts and 811 in out_ts
+    assert np.array_equal(out_values, values[out_ts.astype(int)])
+
+
+def test_lttb_returns_short_series_unchanged(sdb):
+    pytest.importorskip("numpy")
+    out_ts, out_values = sdb.EnhancedMonitoring.lttb([1, 2, 3], [5, 6, 7], 10)
+    assert list(out_ts) == [1, 2, 3] and list(out_values) == [5, 6, 7]
+
+
+def test_backup_all_follows_incremental_setting(sdb, tmp_path, monkeypatch):
+    calls = []
+
+    def fake_full(dbname, target):
+        calls.append(('mysql', dbname))
+        position = {'file': 'binlog.000001', 'pos': 157}
+        return {'ok': True, 'path': str(target), 'bytes_written': 10, 'duration': 0.1}, position, position
+
+    def fake_basebackup(target, parent=None):
+        calls.append(('postgresql', target.name))
+        return {'ok': True, 'path': str(target), 'bytes_written': 10, 'duration': 0.1}, {'lsn': '0/1'}, {'lsn': '0/2'}
+
+    def no_dump(dbname, limiter=None, password=None):
+        raise AssertionError(f"{dbname}: to'liq dump kutilmagan")
+
+    monkeypatch.setattr(sdb, "BACKUP_DIR", tmp_path)
+    monkeypatch.setattr(sdb.Config, "_data", {"backup": {"incremental": True}})
+    monkeypatch.setattr(sdb.IncrementalBackup, "_mysql_full", staticmethod(fake_full))
+    monkeypatch.setattr(sdb.IncrementalBackup, "_pg_basebackup", staticmethod(fake_basebackup))
+    monkeypatch.setattr(sdb.MySQLManager, "dump_database", staticmethod(no_dump))
+    monkeypatch.setattr(sdb.PostgreSQLManager, "dump_database", staticmethod(no_dump))
+    monkeypatch.setattr(sdb.MySQLManager, "get_database_sizes", staticmethod(lambda: {'shop': 2, 'crm': 1}))
+    monkeypatch.setattr(sdb.PostgreSQLManager, "get_database_sizes", staticmethod(lambda: {'a': 2, 'b': 1}))
+
+    mysql = sdb.MySQLManager.backup_all(workers=2)
+    postgres = sdb.PostgreSQLManager.backup_all(workers=2)
+
+    assert sorted(row['database'] for row in mysql) == ['crm', 'shop']
+    assert all(row['status'] == 'OK' for row in mysql + postgres)
+    assert sorted(c for c in calls if c[0] == 'mysql') == [('mysql', 'crm'), ('mysql', 'shop')]
+    # PostgreSQL: DB'lar soniga qaramay bitta klaster inkrementali
+    assert len([c for c in calls if c[0] == 'postgresql']) == 1
+    assert (tmp_path / "mysql_shop.chain.json").exists()
+    assert (tmp_path / "postgres_cluster.chain.json").exists()
+
+
+def test_backup_all_follows_dedup_setting(sdb, monkeypatch):
+    calls = []
+
+    def fake_run(db_type, dbname):
+        calls.append((db_type, dbname))
+        return {'ok': True, 'backup_id': len(calls), 'path': f"dedup:{len(calls)}", 'bytes_written': 1,
+                'duration': 0.1, 'error': ''}
+
+    def no_dump(dbname, limiter=None, password=None):
+        raise AssertionError(f"{dbname}: oddiy dump kutilmagan")
+
+    monkeypatch.setattr(sdb.Config, "_data", {"backup": {"dedup": True}})
+    monkeypatch.setattr(sdb.DedupStore, "run", staticmethod(fake_run))
+    monkeypatch.setattr(sdb.MySQLManager, "dump_database", staticmethod(no_dump))
+    monkeypatch.setattr(sdb.PostgreSQLManager, "dump_database", staticmethod(no_dump))
+    monkeypatch.setattr(sdb.MySQLManager, "get_database_sizes", staticmethod(lambda: {'shop': 2}))
+    monkeypatch.setattr(sdb.PostgreSQLManager, "get_database_sizes", staticmethod(lambda: {'a': 2, 'b': 1}))
+
+    summary = sdb.MySQLManager.backup_all(workers=1) + sdb.PostgreSQLManager.backup_all(workers=1)
+
+    assert all(row['status'] == 'OK' for row in summary)
+    assert sorted(calls) == [('mysql', 'shop'), ('postgresql', 'a'), ('postgresql', 'b')]
+
+
+FAKE_DUMP = textwrap.dedent(r'''
+    import sys
+    extra = sys.argv[1] == "insert"
+    out = sys.stdout
+    out.write("CREATE TABLE `users` (`id` int, `name` varchar(64));\n")
+    for i in range(20000):
+        out.write(f"INSERT INTO `users` VALUES ({i},'user-{i:06d}@example.com');\n")
+        if extra and i == 10000:
+            out.write("INSERT INTO `users` VALUES (99999,'inserted@example.com');\n")
+''')
+
+
+@pytest.fixture
+def dedup_repo(sdb, tmp_path, monkeypatch):
+    monkeypatch.setattr(sdb.DedupStore, "REPO_DIR", tmp_path / "repo")
+    monkeypatch.setattr(sdb.DedupStore, "CATALOG", tmp_path / "catalog.db")
+    monkeypatch.setattr(sdb.DedupStore, "MIN_CHUNK", 4 * 1024)
+    monkeypatch.setattr(sdb.DedupStore, "AVG_CHUNK", 16 * 1024)
+    monkeypatch.setattr(sdb.DedupStore, "MAX_CHUNK", 64 * 1024)
+    monkeypatch.setattr(sdb.Config, "_data", {"backup": {"compression": "gz"}})
+    script = tmp_path / "fake_dump.py"
+    script.write_text(FAKE_DUMP)
+    monkeypatch.setattr(sdb.DedupStore, "dump_cmd",
+                        staticmethod(lambda db_type, dbname: [sys.executable, str(script), dbname]))
+    return sdb.DedupStore
+
+
+def _chunk_hashes(store, backup_id):
+    conn = store.connect()
+    try:
+        return [r['hash'] for r in conn.execute(
+            "SELECT hash FROM backup_chunks WHERE backup_id = ? ORDER BY seq", (backup_id,))]
+    finally:
+        conn.close()
+
+
+def test_dedup_dump_is_one_row_per_line(sdb):
+    cmd = sdb.DedupStore.dump_cmd("mysql", "shop")
+    assert "--skip-extended-insert" in cmd and cmd[-1] == "shop"
+
+
+def test_dedup_inserted_row_only_disturbs_nearby_chunks(dedup_repo):
+    first = dedup_repo.backup("mysql", "base")
+    second = dedup_repo.backup("mysql", "insert")
+    old, new = _chunk_hashes(dedup_repo, first), _chunk_hashes(dedup_repo, second)
+
+    assert len(old) > 20
+    assert len(set(new) - set(old)) <= 2
+    assert len(set(old) & set(new)) >= len(old) - 2
+    with dedup_repo.open_snapshot(second) as (_, reader, size):
+        data = reader.read()
+    assert len(data) == size and data.count(b"\n") == 20002
+    assert b"'inserted@example.com'" in data
+
+
+def test_dedup_concurrent_backups_share_chunks(dedup_repo):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(dedup_repo.backup("mysql", "base")))
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(60)
+
+    assert len(results) == 3 and None not in results
+    conn = dedup_repo.connect()
+    try:
+        refcounts = {r['refcount'] for r in conn.execute("SELECT refcount FROM chunks")}
+        referenced = conn.execute("SELECT COUNT(DISTINCT hash) FROM backup_chunks").fetchone()[0]
+        stored = conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+    finally:
+        conn.close()
+    assert refcounts == {3}
+    assert referenced == stored == len(list((dedup_repo.REPO_DIR / "chunks").glob("*/*")))
+
+
+def test_dedup_gc_sweeps_unreferenced_files(dedup_repo):
+    backup_id = dedup_repo.backup("mysql", "base")
+    chunk_dir = dedup_repo.REPO_DIR / "chunks" / "ff"
+    chunk_dir.mkdir(parents=True, exist_ok=True)
+    stale = chunk_dir / ("f" * 64)
+    leftover = chunk_dir / ("f" * 63 + "e.123.456.part")
+    fresh = chunk_dir / ("f" * 63 + "d")
+    for path in (stale, leftover, fresh):
+        path.write_bytes(b"x" * 100)
+    old = time.time() - 2 * dedup_repo.GC_GRACE
+    os.utime(stale, (old, old))
+    os.utime(leftover, (old, old))
+
+    dedup_repo.prune(days=0)
+
+    assert not stale.exists() and not leftover.exists()
+    assert fresh.exists()
+    # Eng so'nggi backup saqlanadi va to'liq o'qiladi
+    with dedup_repo.open_snapshot(backup_id) as (_, reader, size):
+        assert len(reader.read()) == size
+
+
+@pytest.fixture
+def metrics_dir(sdb, tmp_path, monkeypatch):
+    monkeypatch.setattr(sdb.MetricsStore, "DIR", tmp_path)
+    monkeypatch.setattr(sdb.MetricsStore, "_headers", {})
+    monkeypatch.setattr(sdb.MetricRollups, "DB", tmp_path / "rollups.db")
+    monkeypatch.setattr(sdb.MetricsSchema, "ENUM_FILE", tmp_path / "enums.json")
+    return tmp_path
+
+
+def _write_day(sdb, day, minutes, cpu=10.0):
+    samples = [{'timestamp': (day + sdb.datetime.timedelta(minutes=m)).isoformat(), 'cpu': cpu + m % 7}
+               for m in range(minutes)]
+    sdb.MetricsStore.rewrite_segment(day, samples)
+    return samples
+
+
+def _insert_rollup(conn, res, bucket, count=10):
+    conn.execute(
+        "INSERT INTO rollups (resolution, metric, bucket, count, sum, min, max, p95, sumsq, sketch) "
+        "VALUES (?, 'cpu', ?, ?, ?, 1, 9, 8, ?, X'')", (res, bucket, count, 5.0 * count, 30.0 * count))
+
+
+def _rollup_counts(sdb, res):
+    conn = sdb.MetricRollups.connect()
+    try:
+        return {r['bucket']: r['count'] for r in conn.execute(
+            "SELECT bucket, count FROM rollups WHERE resolution = ? AND metric = 'cpu'", (res,))}
+    finally:
+        conn.close()
+
+
+def test_rollup_rebuild_keeps_history_older_than_raw_segments(sdb, metrics_dir):
+    today = sdb.datetime.datetime.combine(sdb.datetime.date.today(), sdb.datetime.time())
+    day = today - sdb.datetime.timedelta(days=2)
+    _write_day(sdb, day, 180)
+    old_hour = int((day - sdb.datetime.timedelta(days=60)).timestamp()) // 3600 * 3600
+    old_day = int((day - sdb.datetime.timedelta(days=400)).timestamp()) // 86400 * 86400
+    conn = sdb.MetricRollups.connect()
+    _insert_rollup(conn, 3600, old_hour)
+    _insert_rollup(conn, 86400, old_day)
+    conn.commit()
+    conn.close()
+
+    assert sdb.MetricRollups.rebuild() == 180
+    assert sdb.MetricRollups.rebuild() == 180
+
+    hours = _rollup_counts(sdb, 3600)
+    assert hours.pop(old_hour) == 10
+    assert sorted(hours.values()) == [60, 60, 60]
+    assert _rollup_counts(sdb, 86400)[old_day] == 10
+    assert sum(_rollup_counts(sdb, 60).values()) == 180
+
+
+@pytest.fixture
+def tashkent_tz(monkeypatch):
+    if not hasattr(time, "tzset"):
+        pytest.skip("time.tzset yo'q")
+    monkeypatch.setenv("TZ", "Asia/Tashkent")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_rollup_rebuild_skips_bucket_partially_before_raw_segments(sdb, metrics_dir, tashkent_tz):
+    today = sdb.datetime.datetime.combine(sdb.datetime.date.today(), sdb.datetime.time())
+    day = today - sdb.datetime.timedelta(days=2)
+    _write_day(sdb, day, 24 * 60)
+    # Mahalliy yarim tun UTC kun bucket'ining o'rtasiga to'g'ri keladi
+    partial = int(day.timestamp()) // 86400 * 86400
+    assert partial < day.timestamp()
+    conn = sdb.MetricRollups.connect()
+    _insert_rollup(conn, 86400, partial, count=1000)
+    conn.commit()
+    conn.close()
+
+    sdb.MetricRollups.rebuild()
+
+    days = _rollup_counts(sdb, 86400)
+    assert days[partial] == 1000
+    assert days[partial + 86400] == 24 * 60 - (partial + 86400 - day.timestamp()) // 60
+    assert sum(_rollup_counts(sdb, 3600).values()) == 24 * 60
+
+
+def test_legacy_migration_keeps_older_rollups(sdb, metrics_dir):
+    today = sdb.datetime.datetime.combine(sdb.datetime.date.today(), sdb.datetime.time())
+    recent = today - sdb.datetime.timedelta(days=3)
+    older = today - sdb.datetime.timedelta(days=10)
+    _write_day(sdb, older, 60)
+    sdb.MetricRollups.rebuild()
+    old_day = int((today - sdb.datetime.timedelta(days=400)).timestamp()) // 86400 * 86400
+    conn = sdb.MetricRollups.connect()
+    _insert_rollup(conn, 86400, old_day)
+    conn.commit()
+    conn.close()
+
+    log = metrics_dir / "performance.log"
+    with open(log, 'w') as f:
+        for m in range(30):
+            f.write(json.dumps({'timestamp': (recent + sdb.datetime.timedelta(minutes=m)).isoformat(),
+                                'cpu': 50.0}) + "\n")
+
+    assert sdb.MetricsSchema.migrate_legacy_log(log) == 30
+
+    hours = _rollup_counts(sdb, 3600)
+    assert hours[int(recent.timestamp())] == 30
+    assert hours[int(older.timestamp())] == 60
+    assert _rollup_counts(sdb, 86400)[old_day] == 10
+
+
+def test_rollup_backfill_fills_only_rows_backed_by_raw_segments(sdb, metrics_dir):
+    today = sdb.datetime.datetime.combine(sdb.datetime.date.today(), sdb.datetime.time())
+    day = today - sdb.datetime.timedelta(days=2)
+    samples = _write_day(sdb, day, 120)
+    first, second = int(day.timestamp()), int(day.timestamp()) + 3600
+    old_day = int((day - sdb.datetime.timedelta(days=400)).timestamp()) // 86400 * 86400
+
+    # user-016 dan oldingi sxema: sumsq/sketch ustunlarisiz
+    conn = sqlite3.connect(metrics_dir / "rollups.db")
+    conn.execute("CREATE TABLE rollups (resolution INTEGER NOT NULL, metric TEXT NOT NULL, bucket INTEGER NOT NULL, "
+                 "count INTEGER NOT NULL, sum REAL NOT NULL, min REAL NOT NULL, max REAL NOT NULL, p95 REAL, "
+                 "PRIMARY KEY (resolution, metric, bucket)) WITHOUT ROWID")
+    values = [s['cpu'] for s in samples[:60]]
+    conn.executemany("INSERT INTO rollups VALUES (3600, 'cpu', ?, ?, ?, 0, 99, 1)", [
+        (first, 60, sum(values)),
+        (second, 59, 0.0),         # xom namunalar soni mos kelmaydi
+        (old_day, 5000, 1.0),      # segmentlar saqlanish muddatidan eski
+    ])
+    conn.commit()
+    conn.close()
+
+    assert sdb.MetricRollups.backfill() == 1
+
+    conn = sdb.MetricRollups.connect()
+    rows = {r['bucket']: r for r in conn.execute("SELECT * FROM rollups WHERE resolution = 3600")}
+    conn.close()
+    assert rows[first]['sumsq'] == pytest.approx(sum(v * v for v in values))
+    assert sdb.QuantileSketch.from_bytes(rows[first]['sketch']).count == 60
+    assert rows[second]['sketch'] is None and rows[second]['count'] == 59
+    assert rows[old_day]['sketch'] is None and rows[old_day]['count'] == 5000
+
+
+def test_dbsession_stream_delivers_unescaped_rows_with_backpressure(fake_session, monkeypatch):
+    monkeypatch.setattr(type(fake_session), "QUEUE_LINES", 100)
+    values = []
+
+    def slow_sink(value):
+        if len(values) % 5000 == 0:
+            time.sleep(0.05)
+        values.append(value)
+
+    errors, code = fake_session.stream("SELECT CONCAT('(', id, ')') AS r FROM t", slow_sink)
+
+    assert code == 0 and errors == ""
+    assert values[0] == "r" and len(values) == 25001
+    assert values[1] == "(0,'a\nb')"
+    assert fake_session._stdout.maxsize == 100
+    # Sessiya keyingi so'rovlar uchun yaroqli
+    assert fake_session.query("SELECT 42")[0] == [{'v': '42'}]
+
+
+def test_mysql_value_expressions(sdb):
+    value = sdb.ShardedBackup._mysql_value
+    assert value({'name': 'n', 'type': 'varchar'}) == "QUOTE(`n`)"
+    assert "HEX(`b`)" in value({'name': 'b', 'type': 'BLOB'})
+    assert "BIN(`f`)" in value({'name': 'f', 'type': 'bit'})
+
+
+MYSQL_SCHEMA = """CREATE TABLE `events` (
+  `id` bigint NOT NULL AUTO_INCREMENT,
+  `code` varchar(32) NOT NULL,
+  `user_id` int DEFAULT NULL,
+  PRIMARY KEY (`code`),
+  UNIQUE KEY `uq_id` (`id`),
+  KEY `idx_user` (`user_id`,`id`),
+  CONSTRAINT `fk_user` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`)
+) ENGINE=InnoDB AUTO_INCREMENT=42 DEFAULT CHARSET=utf8mb4;
+CREATE TABLE `users` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `email` varchar(255) NOT NULL,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_email` (`email`),
+  KEY `idx_id_email` (`id`,`email`)
+) ENGINE=InnoDB;
+"""
+
+
+def test_split_mysql_schema_keeps_key_for_auto_increment_column(sdb):
+    schema, post = sdb.ShardedBackup.split_mysql_schema(MYSQL_SCHEMA)
+
+    # events: PRIMARY KEY boshqa ustunda - `id` ning yagona indeksi CREATE TABLE da qoladi
+    assert "  UNIQUE KEY `uq_id` (`id`)\n) ENGINE=InnoDB AUTO_INCREMENT=42" in schema
+    assert "ALTER TABLE `events` ADD KEY `idx_user` (`user_id`,`id`);" in post
+    assert "ALTER TABLE `events` ADD CONSTRAINT `fk_user`" in post
+    # users: AUTO_INCREMENT PRIMARY KEY bilan qoplangan - qolgan indekslar keyinga
+    assert "  PRIMARY KEY (`id`)\n) ENGINE=InnoDB;" in schema
+    assert "ALTER TABLE `users` ADD UNIQUE KEY `uq_email` (`email`);" in post
+    assert "ALTER TABLE `users` ADD KEY `idx_id_email` (`id`,`email`);" in post
+
+
+def test_postgresql_sizes_closes_per_database_sessions(sdb, monkeypatch):
+    _SnapshotSession.instances = []
+
+    class SizeSession(_SnapshotSession):
+        def __init__(self, db_type, dbname=None):
+            super().__init__(db_type, dbname)
+            self.dbname = dbname
+
+        def query(self, sql, timeout=60):
+            return [{'name': 'public.t', 'data': '100', 'idx': '20'}], '', 0
+
+    monkeypatch.setattr(sdb, "DBSession", SizeSession)
+    monkeypatch.setattr(sdb.PostgreSQLManager, "get_database_sizes", staticmethod(lambda: {'a': 1, 'b': 2}))
+    monkeypatch.setattr(sdb.DatabaseManager, "query", staticmethod(
+        lambda *args, **kwargs: pytest.fail("keshlangan sessiya ishlatildi")))
+
+    assert sdb.SizeHistory.postgresql_sizes() == [('a', 'public.t', 100, 20), ('b', 'public.t', 100, 20)]
+    assert [s.dbname for s in _SnapshotSession.instances] == ['a', 'b']
+    assert all(s.closed for s in _SnapshotSession.instances)
+
+
+def test_size_forecast_ranks_by_time_to_fill(sdb, tmp_path, monkeypatch):
+    monkeypatch.setattr(sdb.SizeHistory, "DB", tmp_path / "sizes.db")
+    gb, day, now = 1024 ** 3, 86400, time.time()
+    # MySQL: tez o'sadi, lekin katta diskda; PostgreSQL: sekin, lekin kichik diskda
+    volumes = {'mysql': (1, 1000 * gb), 'postgresql': (2, 5 * gb)}
+    monkeypatch.setattr(sdb.SizeHistory, "volume", staticmethod(lambda engine: volumes[engine]))
+    for i in range(3):
+        ts = now - (2 - i) * day
+        sdb.SizeHistory.record("mysql", [('shop', 'orders', 10 * gb + i * 10 * gb, 0),
+                                         ('shop', 'static', gb, 0)], ts)
+        sdb.SizeHistory.record("postgresql", [('crm', 'public.log', gb + i * gb, 0)], ts)
+
+    forecast = sdb.SizeHistory.forecast()
+
+    assert [item['name'] for item in forecast] == ['public.log', 'orders', 'static']
+    assert forecast[0]['days_alone'] == pytest.approx(5, rel=0.01)
+    assert forecast[1]['days_alone'] == pytest.approx(100, rel=0.01)
+    assert forecast[-1]['days_alone'] is None